@@ -4,7 +4,7 @@ from hypercorn.asyncio import serve
 from hypercorn.config import Config
 
 from src.app import create_app
-from src.utils.task_status_db import task_status_db
+from src.utils.task_status_db import ensure_task_status_schema, task_status_db
 
 app, celery_app = create_app()
 
@@ -12,6 +12,7 @@ task_status_db.init_app(app)
 
 with app.app_context():
     task_status_db.create_all()
+    ensure_task_status_schema()
 
 app.app_context().push()
 
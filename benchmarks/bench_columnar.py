@@ -0,0 +1,91 @@
+import argparse
+import sqlite3
+import time
+import tracemalloc
+from dataclasses import fields
+
+from src.models.db_schema import QuestionData
+from src.models.row_batch import ColumnarBatch
+
+
+def build_rows(row_count: int):
+    """`row_count` Question rows of an in-memory table, as sqlite3.Row."""
+    columns = QuestionData.field_names()
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"CREATE TABLE Question ({', '.join(columns)});")
+    conn.executemany(
+        f"INSERT INTO Question VALUES ({', '.join('?' * len(columns))});",
+        [
+            (
+                "2024-01-01",
+                1,
+                idx,
+                2,
+                "bio",
+                f"question {idx}",
+                "A",
+                "Classification",
+                '["A", "B"]',
+            )
+            for idx in range(row_count)
+        ],
+    )
+    return conn.execute("SELECT * FROM Question;").fetchall()
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def allocated_bytes(func) -> int:
+    tracemalloc.start()
+    kept = func()  # noqa: F841, measured while still referenced
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def from_dict_with_fields(data: dict) -> QuestionData:
+    """`BaseSchema.from_dict` before the field names were cached per class."""
+    return QuestionData(
+        **{field.name: data.get(field.name) for field in fields(QuestionData)}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Dataclass rows vs ColumnarBatch for bulk reads"
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    readers = {
+        "dataclass rows": lambda: [QuestionData(**row) for row in rows],
+        "columnar batch": lambda: ColumnarBatch.from_rows(QuestionData, rows),
+    }
+    for name, read in readers.items():
+        seconds = best_of(args.repeat, read)
+        memory = allocated_bytes(read)
+        print(
+            f"{name}: {seconds / args.rows * 1e6:.2f} us/row, {memory / args.rows:.0f} B/row"
+        )
+
+    data = dict(rows[0])
+    before = best_of(args.repeat, lambda: [from_dict_with_fields(data) for _ in rows])
+    after = best_of(args.repeat, lambda: [QuestionData.from_dict(data) for _ in rows])
+    print(
+        f"from_dict: {before / args.rows * 1e6:.2f} -> {after / args.rows * 1e6:.2f} us/call"
+    )
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_columnar [--rows N]
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+STUB_MODEL_ENDPOINT = "http://127.0.0.1:8890/"
+STUB_JUDGE_PORT = 8889
+
+
+def write_config(workdir: Path) -> None:
+    """config.yaml of the repository with every database and the broker in `workdir`.
+
+    The judge is test_model/stub_judge.py, the verdict cache is off so every exam
+    costs the same. The single writer is required by threads, it is on for both
+    pools so only the pool differs.
+    """
+    with open(ROOT / "config.yaml", encoding="utf-8") as f:
+        config = yaml.load(f, Loader=yaml.Loader)
+    database = str(workdir / "example.db")
+    config["sqlite"]["connect_args"]["database"] = database
+    config["sqlite"]["single_writer"].update(
+        {"enabled": True, "address": f"{database}.writer.sock"}
+    )
+    config["database_location"] = database
+    config["result_retention"]["task_status_database"] = str(workdir / "task_status.db")
+    config["model_call_dedup"]["database"] = str(workdir / "model_calls.db")
+    config["judge_config"][
+        "api_endpoint"
+    ] = f"http://127.0.0.1:{STUB_JUDGE_PORT}/v1/chat/completions"
+    config["judge_config"]["verdict_cache"]["enabled"] = False
+    config["celery_config"].update(
+        {
+            "broker": f"sqla+sqlite:///{workdir / 'broker.db'}",
+            "backend": f"db+sqlite:///{workdir / 'celery.db'}",
+        }
+    )
+    with open(workdir / "config.yaml", "w", encoding="utf-8") as f:
+        yaml.dump(config, f, allow_unicode=True)
+
+
+def create_database(workdir: Path, question_count: int) -> None:
+    from drivers.sqlite_driver import SQLiteDriver
+
+    with open(workdir / "config.yaml", encoding="utf-8") as f:
+        SQLiteDriver(yaml.load(f, Loader=yaml.Loader)["sqlite"]).create_all_tables()
+    conn = sqlite3.connect(workdir / "example.db")
+    conn.executemany(
+        """
+        INSERT INTO Question (question_version_id, question_category, question_content,
+            groundtruth_content, groundtruth_set, groundtruth_type, status)
+        VALUES (1, 'bio', ?, 'A', '["A", "B", "C", "D"]', 'Classfication', 1);
+        """,
+        [(f"question {idx}",) for idx in range(question_count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def send_exams(workdir: Path, exams: int) -> int:
+    """Queue `exams` evaluation_pipeline tasks on model_io, returns the first result_id."""
+    from src.celeryflow import tasks
+    from src.celeryflow.question_preparation import prepare_question
+
+    conn = sqlite3.connect(workdir / "example.db")
+    conn.row_factory = sqlite3.Row
+    questions = [
+        prepare_question(dict(row))
+        for row in conn.execute("SELECT * FROM Question ORDER BY question_id;")
+    ]
+    first_result_id = (
+        conn.execute("SELECT coalesce(max(result_id), 0) FROM Result;").fetchone()[0]
+        + 1
+    )
+    conn.executemany(
+        """
+        INSERT INTO Result (model_id, user_id, question_version_id, evaluation_type, status)
+        VALUES (1, 'bench', 1, 'bio', 3);
+        """,
+        [()] * exams,
+    )
+    conn.commit()
+    conn.close()
+
+    for idx in range(exams):
+        # Distinct prompts per exam, nothing is shared between exams
+        data = [
+            dict(question, prompt=f"{question['prompt']} #{idx}")
+            for question in questions
+        ]
+        tasks.evaluation_pipeline.apply_async(
+            args=(
+                {
+                    "model_id": 1,
+                    "model_endpoint": STUB_MODEL_ENDPOINT,
+                    "evaluation_type": "bio",
+                    "result": {"result_id": first_result_id + idx},
+                    "data": data,
+                    "question_count": len(data),
+                    "judge_mode": "immediate",
+                },
+            )
+        )
+    return first_result_id
+
+
+def count_answers(workdir: Path, first_result_id: int) -> tuple:
+    """Answers written and duplicate ResultRecord rows of the exams sent."""
+    conn = sqlite3.connect(workdir / "example.db")
+    answers = conn.execute(
+        "SELECT count(*) FROM ResultRecord WHERE result_id >= ? AND status IN (1, 2);",
+        (first_result_id,),
+    ).fetchone()[0]
+    duplicates = conn.execute(
+        """
+        SELECT count(*) FROM (
+            SELECT result_id, question_id FROM ResultRecord WHERE result_id >= ?
+            GROUP BY result_id, question_id HAVING count(*) > 1
+        );
+        """,
+        (first_result_id,),
+    ).fetchone()[0]
+    conn.close()
+    return answers, duplicates
+
+
+def run_worker(
+    workdir: Path, pool: str, concurrency: int, expected: int, first_id: int
+):
+    """Seconds a model_io worker takes for the queued exams, and their answer counts."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT), str(ROOT / "db")]))
+    env.setdefault("OPENAI_API_KEY", "stub")
+    log = open(workdir / f"worker_{pool}.log", "w")
+    started_at = time.monotonic()
+    worker = subprocess.Popen(
+        [
+            *(sys.executable, "-m", "src.celeryflow.worker_profiles", "model_io"),
+            *(f"--pool={pool}", f"--concurrency={concurrency}", "--loglevel=warning"),
+        ],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=log,
+    )
+    try:
+        while count_answers(workdir, first_id)[0] < expected:
+            if worker.poll() is not None:
+                raise RuntimeError(f"The worker exited, see {log.name}")
+            time.sleep(0.2)
+        return time.monotonic() - started_at, count_answers(workdir, first_id)
+    finally:
+        worker.terminate()
+        worker.wait()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput of the model_io worker with prefork vs threads"
+    )
+    parser.add_argument("--exams", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per answer")
+    parser.add_argument("--pools", nargs="+", default=["prefork:4", "threads:200"])
+    args = parser.parse_args()
+
+    stubs = [
+        subprocess.Popen(
+            [sys.executable, str(ROOT / "test_model" / script)],
+            env=dict(
+                os.environ,
+                STUB_MODEL_LATENCY=str(args.latency),
+                STUB_JUDGE_PORT=str(STUB_JUDGE_PORT),
+            ),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for script in ("stub_model.py", "stub_judge.py")
+    ]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            workdir = Path(workdir)
+            write_config(workdir)
+            # `src` reads config.yaml from the working directory when first imported
+            os.chdir(workdir)
+            sys.path[:0] = [str(ROOT), str(ROOT / "db")]
+            create_database(workdir, args.questions)
+            time.sleep(2)  # stub servers up
+
+            expected = args.exams * args.questions
+            for pool_spec in args.pools:
+                pool, concurrency = pool_spec.split(":")
+                first_id = send_exams(workdir, args.exams)
+                seconds, (answers, duplicates) = run_worker(
+                    workdir, pool, int(concurrency), expected, first_id
+                )
+                print(
+                    f"{pool} -c {concurrency}: {args.exams} exams x {args.questions} "
+                    f"questions in {seconds:.1f} s, {answers / seconds:.1f} answers/s, "
+                    f"{duplicates} duplicate records"
+                )
+    finally:
+        for stub in stubs:
+            stub.terminate()
+            stub.wait()
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_model_io_pool [--exams 200] [--pools prefork:4 threads:200]
+    main()
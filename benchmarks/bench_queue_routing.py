@@ -0,0 +1,129 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from celery import Celery
+from kombu import Queue
+
+# Workers import this module with `celery -A`, the settings travel in the environment
+BENCH_DIR = Path(os.environ.get("BENCH_QUEUE_ROUTING_DIR", tempfile.gettempdir()))
+ROUTED = os.environ.get("BENCH_QUEUE_ROUTING_ROUTED") == "1"
+LONG_TASK_SECONDS = 1.0
+
+# kombu's SQLAlchemy transport, so no RabbitMQ or Redis is needed
+app = Celery("bench_queue_routing", broker=f"sqla+sqlite:///{BENCH_DIR / 'broker.db'}")
+app.conf.update(
+    broker_polling_interval=0.05,
+    task_default_queue="control",
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_queues=[Queue("control"), Queue("model_io"), Queue("finalize")],
+    # Like `worker_queues` in config.yaml: evaluation_pipeline vs record_result
+    task_routes=(
+        {"long": {"queue": "model_io"}, "short": {"queue": "finalize"}}
+        if ROUTED
+        else {}
+    ),
+)
+
+
+@app.task(name="long")
+def long(sent_at: float):
+    time.sleep(LONG_TASK_SECONDS)
+
+
+@app.task(name="short")
+def short(sent_at: float):
+    with open(BENCH_DIR / "waits.txt", "a") as f:
+        f.write(f"{time.time() - sent_at}\n")
+
+
+# (queue, concurrency, prefetch multiplier) of each worker
+WORKERS = {
+    # Every task on one queue, 3 process slots
+    "shared": [("control", 3, 1)],
+    # The slots split as in the worker profiles, finalize prefetches like `control`
+    "routed": [("model_io", 2, 1), ("finalize", 1, 4)],
+}
+
+
+def short_task_waits(setup: str, tasks: int, bench_dir: Path) -> list:
+    """Seconds each short task waited, sent interleaved with as many long tasks."""
+    env = dict(
+        os.environ,
+        BENCH_QUEUE_ROUTING_DIR=str(bench_dir),
+        BENCH_QUEUE_ROUTING_ROUTED="1" if setup == "routed" else "0",
+    )
+    logs = [bench_dir / f"{queue}.log" for queue, _, _ in WORKERS[setup]]
+    workers = [
+        subprocess.Popen(
+            [
+                *(sys.executable, "-m", "celery"),
+                *("-A", "benchmarks.bench_queue_routing", "worker"),
+                *("-Q", queue, "-c", str(concurrency), "-n", f"{queue}@bench"),
+                f"--prefetch-multiplier={prefetch}",
+                *("-P", "prefork", "--loglevel=info", f"--logfile={log}"),
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for (queue, concurrency, prefetch), log in zip(WORKERS[setup], logs)
+    ]
+    try:
+        # Tasks sent before a worker is up would all wait for its start
+        while not all(log.exists() and " ready." in log.read_text() for log in logs):
+            if any(worker.poll() is not None for worker in workers):
+                raise RuntimeError(f"A worker exited, see the logs in {bench_dir}")
+            time.sleep(0.1)
+        # Sent from a process that imports this module with the same settings
+        subprocess.run(
+            [
+                *(sys.executable, "-m", "benchmarks.bench_queue_routing"),
+                *("--send", str(tasks)),
+            ],
+            env=env,
+            check=True,
+        )
+        waits_file = bench_dir / "waits.txt"
+        while not waits_file.exists() or len(waits_file.read_text().split()) < tasks:
+            time.sleep(0.1)
+        return [float(wait) for wait in waits_file.read_text().split()]
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Wait of short tasks behind long ones, shared vs routed queues"
+    )
+    parser.add_argument("--tasks", type=int, default=6)
+    parser.add_argument("--send", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.send:
+        for _ in range(args.send):
+            long.delay(time.time())
+            short.delay(time.time())
+        return
+
+    for setup in WORKERS:
+        with tempfile.TemporaryDirectory() as bench_dir:
+            waits = short_task_waits(setup, args.tasks, Path(bench_dir))
+        print(
+            f"{setup}: short task wait median {statistics.median(waits):.2f} s, "
+            f"max {max(waits):.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_queue_routing [--tasks 6]
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import random
+import time
+
+from kombu.serialization import dumps, loads
+
+from src.celeryflow.question_preparation import prepare_question
+from src.celeryflow.serializer import register_compact_serializer
+from src.utils.load_yaml import yaml_data as CONFIG
+
+WORDS = (
+    "cell membrane protein enzyme gene energy light water carbon acid "
+    "reaction species organism tissue structure function process system"
+).split()
+
+
+def build_test_paper(question_count: int, rng: random.Random) -> dict:
+    """A test paper as it travels down an exam chain, with prepared questions.
+
+    Question texts are drawn from a small vocabulary, so real question banks
+    compress less than this.
+    """
+    questions = [
+        prepare_question(
+            {
+                "question_id": idx,
+                "question_version_id": 1,
+                "question_category": "bio",
+                "question_content": " ".join(rng.choices(WORDS, k=40)) + "?",
+                "groundtruth_content": rng.choice("ABCD"),
+                "groundtruth_type": "Classfication",
+                "groundtruth_set": '["A", "B", "C", "D"]',
+                "status": 1,
+            }
+        )
+        for idx in range(question_count)
+    ]
+    return {
+        "result": {"result_id": 1, "model_id": 1, "status": 3},
+        "model_id": 1,
+        "evaluation_type": "bio",
+        "model_endpoint": "http://examinee.invalid/",
+        "data": questions,
+        "question_count": question_count,
+    }
+
+
+def time_per_call(repeat: int, func) -> float:
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started_at) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Size and speed of the json and compact Celery serializers"
+    )
+    parser.add_argument("--questions", type=int, nargs="+", default=[3, 50, 200])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    register_compact_serializer(CONFIG.get("compact_serializer"))
+    rng = random.Random(0)
+    for question_count in args.questions:
+        test_paper = build_test_paper(question_count, rng)
+        for serializer in ("json", "compact"):
+            content_type, content_encoding, body = dumps(test_paper, serializer)
+            assert loads(body, content_type, content_encoding) == test_paper
+            encode = time_per_call(args.repeat, lambda: dumps(test_paper, serializer))
+            decode = time_per_call(
+                args.repeat, lambda: loads(body, content_type, content_encoding)
+            )
+            print(
+                f"{question_count:4d} questions {serializer:8s} {len(body):8d} B, "
+                f"encode {encode * 1e6:7.1f} us, decode {decode * 1e6:7.1f} us"
+            )
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_serializer [--questions 3 50 200]
+    main()
@@ -106,6 +106,10 @@ class BaseDriver(ABC):
         evaluation_type: TEXT
         result_score: INTEGER
         duration: INTEGER
+        questions_used: INTEGER [questions scored, fewer than the exam when it stopped early]
+        score_lower: REAL [confidence interval of result_score]
+        score_upper: REAL
+        coverage: REAL [percent of the exam's questions completed, below 100 for a partial score]
         created_at: TIMESTAMP
         status: INTEGER
         """
@@ -124,6 +128,10 @@ class BaseDriver(ABC):
                 evaluation_type TEXT,
                 result_score INTEGER,
                 duration INTEGER,  -- 假設是以秒單位
+                questions_used INTEGER,
+                score_lower REAL,
+                score_upper REAL,
+                coverage REAL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 status INTEGER NOT NULL,
                 FOREIGN KEY (model_id) REFERENCES Model(model_id),
@@ -133,6 +141,19 @@ class BaseDriver(ABC):
             """
         )
 
+        # Databases created before the confidence interval and coverage were recorded
+        columns = {row[1] for row in creator.execute("PRAGMA table_info(Result);")}
+        for column, column_type in (
+            ("questions_used", "INTEGER"),
+            ("score_lower", "REAL"),
+            ("score_upper", "REAL"),
+            ("coverage", "REAL"),
+        ):
+            if column not in columns:
+                creator.execute(
+                    f"ALTER TABLE Result ADD COLUMN {column} {column_type};"
+                )
+
     @_enable_create
     def create_person_table(self):
         """
@@ -215,8 +236,10 @@ class BaseDriver(ABC):
         result_id: INTEGER
         question_id: INTEGER
         model_response: TEXT
+        evaluation_response: TEXT ["Correct", "Incorrect", NULL while waiting for the judge]
+        judge_details: TEXT [JSON, verdict and latency of each judge of the ensemble]
         created_at: TIMESTAMP
-        status: INTEGER
+        status: INTEGER [1: judged, 2: waiting for deferred judging, 3: in progress]
         """
 
         logging.info("Create ResponseRecord Table...")
@@ -230,6 +253,8 @@ class BaseDriver(ABC):
                 result_id INTEGER NOT NULL,
                 question_id INTEGER NOT NULL,
                 model_response TEXT,
+                evaluation_response TEXT,
+                judge_details TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 status INTEGER NOT NULL,
                 FOREIGN KEY (result_id) REFERENCES Result(result_id),
@@ -237,6 +262,27 @@ class BaseDriver(ABC):
             );
             """
         )
+        # Tables created before the deferred judging and the judge ensemble
+        columns = {
+            row[1] for row in creator.execute("PRAGMA table_info(ResultRecord);")
+        }
+        for column, column_type in (
+            ("evaluation_response", "TEXT"),
+            ("judge_details", "TEXT"),
+        ):
+            if column not in columns:
+                creator.execute(
+                    f"ALTER TABLE ResultRecord ADD COLUMN {column} {column_type};"
+                )
+        # One checkpoint per question and result, rows written before the
+        # checkpointing (result_id "TBD") are left out
+        creator.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_resultrecord_result_question
+            ON ResultRecord (result_id, question_id)
+            WHERE typeof(result_id) = 'integer' AND status <> 0;
+            """
+        )
 
     @_enable_create
     def create_question_table(self):
@@ -1,6 +1,10 @@
 from celery import Celery
+from celery.schedules import crontab
 from celery.signals import after_setup_logger, after_setup_task_logger
+from flask import has_app_context
 
+from src.celeryflow.serializer import register_compact_serializer
+from src.celeryflow.worker_profiles import build_task_queues, build_task_routes
 from src.utils.load_yaml import yaml_data as CONFIG
 from src.utils.logger import logger
 
@@ -18,10 +22,33 @@ after_setup_logger.connect(setup_logger)
 after_setup_task_logger.connect(setup_logger)
 
 
+def build_beat_schedule() -> dict:
+    beat_schedule = {}
+
+    deferred_config = CONFIG.get("judge_config", {}).get("deferred", {})
+    if deferred_config.get("schedule"):
+        beat_schedule["judge-deferred-responses"] = {
+            "task": "evaluation.tasks.judge_deferred_responses",
+            "schedule": crontab(**deferred_config["schedule"]),
+        }
+
+    retention_config = CONFIG.get("result_retention", {})
+    if retention_config.get("schedule"):
+        beat_schedule["prune-task-results"] = {
+            "task": "evaluation.tasks.prune_task_results",
+            "schedule": crontab(**retention_config["schedule"]),
+        }
+
+    return beat_schedule
+
+
 def create_celery(yaml_data: dict):
     broker = yaml_data.get("broker", None)
     backend = yaml_data.get("backend", None)
 
+    # Must be registered before the config below selects it
+    register_compact_serializer(CONFIG.get("compact_serializer"))
+
     celery = Celery(__name__, broker=broker, backend=backend)
 
     # Celery Config
@@ -30,6 +57,9 @@ def create_celery(yaml_data: dict):
     celery.conf.update(
         imports=("src.celeryflow.tasks",),
         result_extended=True,
+        beat_schedule=build_beat_schedule(),
+        task_routes=build_task_routes(),
+        task_queues=build_task_queues(),
     )
     return celery
 
@@ -42,10 +72,15 @@ def configure_celery(app=None):
 
         class ContextTask(celery.Task):
             def __call__(self, *args, **kwargs):
+                # Thread pools start every task without a context, nested calls reuse it
+                if has_app_context():
+                    return super().__call__(*args, **kwargs)
                 with app.app_context():
-                    return self.run(*args, **kwargs)
+                    return super().__call__(*args, **kwargs)
 
         celery.Task = ContextTask
+        # Tasks with their own base class (e.g. `CeleryBaseTask`) push it from here
+        celery.flask_app = app
         celery.conf.update(app.config)
     return celery
 
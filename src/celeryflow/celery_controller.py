@@ -2,6 +2,14 @@ from src.models.controller import BasicController
 from src.models.db_schema import ResultData, ResultRecordData
 from src.utils.data_handler import IdentityHandler
 
+# ResultRecord.status
+RESPONSE_JUDGED = 1
+RESPONSE_DEFERRED = 2  # waiting for deferred judging
+RESPONSE_IN_PROGRESS = 3  # placeholder, `model_response` is set once the model answered
+
+# Result.status
+RESULT_DEFERRED = 2  # every response collected, waiting for deferred judging
+
 
 class ControllerContext:
     @staticmethod
@@ -36,12 +44,12 @@ def create_evaluation_result(evaluation_result: dict) -> None:
         evaluation_result.update({"result_id": id})
 
 
-def create_response_record(result_id: int) -> ResultRecordData:
+def create_response_record(result_id: int, question_id: int) -> ResultRecordData:
+    """Insert the checkpoint placeholder of one question, see `evaluation_pipeline`."""
     response_record = ResultRecordData(
-        result_record_id=result_id,
-        result_id="TBD",
-        question_id="TBD",
-        model_response="TBD",
+        result_id=result_id,
+        question_id=question_id,
+        status=RESPONSE_IN_PROGRESS,
     )
 
     response_record_controller = ControllerContext.get_response_controller()
@@ -1,11 +1,11 @@
 import asyncio
-from typing import Dict
+from typing import Dict, List, Optional
 
 from celery.result import AsyncResult
 
 from src.celeryflow.data_process import TaskIDExtractor
 from src.utils.logger import logger
-from src.utils.task_status_db import TaskStatus, save_task_chain, task_status_db
+from src.utils.task_status_db import TaskStatus, save_task_chains, task_status_db
 
 TASK_NAMES = [
     "Check API Healthy",
@@ -90,21 +90,27 @@ async def get_task_info(task: AsyncResult, task_name: str, revoke: bool) -> Dict
     return task_info
 
 
+def get_exam_task_ids(exam_result: Dict) -> List[str]:
+    # Exams of a fan-out batch carry their task IDs already, newest first
+    if "task_ids" in exam_result:
+        return exam_result["task_ids"]
+    chain_result = exam_result["chain_result"]
+    if isinstance(chain_result, AsyncResult):
+        return extract_chain_ids(chain_result)
+    return []
+
+
 async def process_exam_result(exam_result: Dict, revoke: bool, root_id: str) -> Dict:
     """Asynchronously process a single exam result, retrieving progress for each subtask."""
     from app_run import celery_app
 
     # Extract topic and chain_result from the exam result
     exam_catogory = exam_result["Categories"]["evaluation_type"]
-    chain_result = exam_result["chain_result"]
 
     # Retrieve all task IDs associated with this exam's chain
-    chain_tasks = []
-    if isinstance(chain_result, AsyncResult):
-        task_ids = extract_chain_ids(chain_result)
-        chain_tasks = [celery_app.AsyncResult(tid) for tid in task_ids]
-
-    save_task_chain(root_id, task_ids)
+    chain_tasks = [
+        celery_app.AsyncResult(tid) for tid in get_exam_task_ids(exam_result)
+    ]
 
     # Gather status of all tasks in the chain concurrently
     task_names = TASK_NAMES
@@ -127,6 +133,34 @@ async def process_exam_result(exam_result: Dict, revoke: bool, root_id: str) ->
     }
 
 
+def get_batch_failure_task_id(summary_task_id: str) -> str:
+    """Task ID of `record_failed_exam_batch`, fixed by the summary task of the batch."""
+    return f"{summary_task_id}-failure"
+
+
+def get_batch_summary(summary_task_id: str) -> Optional[Dict]:
+    """State and summary of a fan-out batch, None while the batch is still running.
+
+    A failed exam fails the chord once every exam is done, the summary then comes
+    from its errback `record_failed_exam_batch` and is None until that one finished.
+    """
+    from app_run import celery_app
+
+    summary_result = celery_app.AsyncResult(summary_task_id)
+    if summary_result.successful():
+        return {"state": "SUCCESS", "summary": summary_result.result}
+    if summary_result.failed():
+        failure_result = celery_app.AsyncResult(
+            get_batch_failure_task_id(summary_task_id)
+        )
+        return {
+            "state": "FAILURE",
+            "error": str(summary_result.result),
+            "summary": (failure_result.result if failure_result.successful() else None),
+        }
+    return None
+
+
 async def get_chain_progress(task_id: str, revoke: bool) -> Dict:
     """Asynchronously retrieve progress information for a task chain by its main task ID."""
 
@@ -136,6 +170,30 @@ async def get_chain_progress(task_id: str, revoke: bool) -> Dict:
 
         main_result = celery_app.AsyncResult(task_id)
         results = main_result.info
+
+        if isinstance(results, dict):
+            # Batches, see `dispatch_exam_batch` and `start_batch_evaluation`
+            summary_task_id = results.get("summary_task_id")
+            batch = get_batch_summary(summary_task_id) if summary_task_id else None
+            if batch is not None:
+                # The status stream stops on SUCCESS and FAILED
+                return {
+                    **batch,
+                    "state": "SUCCESS" if batch["state"] == "SUCCESS" else "FAILED",
+                    "progress": {"total_progress": 100, "exam_catogory": []},
+                }
+            results = results["exams"]
+
+        # Every exam of the request is registered at once, one upsert per poll
+        save_task_chains(
+            {
+                task_id: [
+                    chain_task_id
+                    for result in results
+                    for chain_task_id in get_exam_task_ids(result)
+                ]
+            }
+        )
         # Process each exam result concurrently
         exam_results = await asyncio.gather(
             *[process_exam_result(result, revoke, task_id) for result in results]
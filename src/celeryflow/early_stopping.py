@@ -0,0 +1,192 @@
+import math
+import time
+from statistics import NormalDist
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.utils.load_yaml import yaml_data as CONFIG
+
+ADAPTIVE_EVALUATION_CONFIG = CONFIG.get("adaptive_evaluation", {})
+
+
+def wilson_interval(
+    correct: int, total: int, confidence: float = 0.95
+) -> Tuple[float, float]:
+    """Wilson score interval of the accuracy `correct / total`, as fractions."""
+    if total == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    accuracy = correct / total
+    denominator = 1 + z * z / total
+    center = (accuracy + z * z / (2 * total)) / denominator
+    margin = (
+        z
+        * math.sqrt(accuracy * (1 - accuracy) / total + z * z / (4 * total * total))
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def score_interval(
+    evaluation_response_list: list,
+    confidence: float = ADAPTIVE_EVALUATION_CONFIG.get("confidence", 0.95),
+    correct_str: str = "Correct",
+) -> Dict:
+    """Questions scored and the interval of `result_score`, in the same percent scale."""
+    total = len(evaluation_response_list)
+    correct = sum(content == correct_str for content in evaluation_response_list)
+    lower, upper = wilson_interval(correct, total, confidence)
+    return {
+        "questions_used": total,
+        "score_lower": round(lower * 100, 1),
+        "score_upper": round(upper * 100, 1),
+    }
+
+
+class EarlyStopRule:
+    """Decides when an adaptive exam knows the accuracy of the model well enough.
+
+    Verdicts are fed in the order the (shuffled) questions are scored. Once
+    `min_questions` are scored the rule looks at the Wilson interval every
+    `look_every` questions, and the exam stops when it is narrower than
+    `target_width`, or when it lies entirely below or above `pass_threshold`.
+    Widths and thresholds are in percent, like `result_score`.
+
+    Looking again and again at a fixed 95% interval would stop on a wrong side of
+    the threshold far more often than 5% of the time. The error `1 - confidence`
+    is spent over the looks instead: look k uses `(1 - confidence) * 6 / (pi^2 k^2)`,
+    which sums to `1 - confidence` over any number of looks. The interval widens
+    with every look, so a "precise" stop takes more questions than a fixed-size
+    exam with the same interval width would.
+    """
+
+    def __init__(
+        self,
+        confidence: float = 0.95,
+        target_width: float = 10,
+        pass_threshold: Optional[float] = None,
+        min_questions: int = 30,
+        look_every: int = 10,
+        correct_str: str = "Correct",
+    ):
+        self.confidence = confidence
+        self.target_width = target_width
+        self.pass_threshold = pass_threshold
+        self.min_questions = min_questions
+        self.look_every = look_every
+        self.correct_str = correct_str
+
+        self.total = 0
+        self.correct = 0
+        self.looks = 0
+        self.looked_at = 0  # questions scored at the last look
+        self.stop_reason: Optional[str] = None
+
+    @classmethod
+    def from_test_paper(cls, test_paper: dict) -> Optional["EarlyStopRule"]:
+        """Rule of an exam with `adaptive` set, the options of a dict override the config."""
+        adaptive = test_paper.get("adaptive")
+        if not adaptive:
+            return None
+        options = dict(ADAPTIVE_EVALUATION_CONFIG)
+        if isinstance(adaptive, dict):
+            options.update(adaptive)
+        return cls(
+            confidence=options.get("confidence", 0.95),
+            target_width=options.get("target_width", 10),
+            pass_threshold=options.get("pass_threshold"),
+            min_questions=options.get("min_questions", 30),
+            look_every=options.get("look_every", 10),
+        )
+
+    @property
+    def look_confidence(self) -> float:
+        """Confidence of the interval at the current look, see the class docstring."""
+        look = max(self.looks, 1)
+        return 1 - (1 - self.confidence) * 6 / (math.pi**2 * look * look)
+
+    @property
+    def interval(self) -> Tuple[float, float]:
+        lower, upper = wilson_interval(self.correct, self.total, self.look_confidence)
+        return lower * 100, upper * 100
+
+    @property
+    def should_stop(self) -> bool:
+        return self.stop_reason is not None
+
+    def update(self, verdicts: Iterable[str]) -> bool:
+        """Count new verdicts, return whether the exam can stop."""
+        for verdict in verdicts:
+            self.total += 1
+            self.correct += verdict == self.correct_str
+
+        if (
+            self.stop_reason is None
+            and self.total >= self.min_questions
+            and (self.looks == 0 or self.total - self.looked_at >= self.look_every)
+        ):
+            self.looks += 1
+            self.looked_at = self.total
+            lower, upper = self.interval
+            if upper - lower <= self.target_width:
+                self.stop_reason = "precise"
+            elif self.pass_threshold is not None and upper < self.pass_threshold:
+                self.stop_reason = "below_threshold"
+            elif self.pass_threshold is not None and lower >= self.pass_threshold:
+                self.stop_reason = "above_threshold"
+        return self.should_stop
+
+    def to_dict(self) -> Dict:
+        lower, upper = self.interval
+        return {
+            "questions_scored": self.total,
+            "stop_reason": self.stop_reason,
+            "confidence": self.confidence,
+            "looks": self.looks,
+            "score_lower": round(lower, 1),
+            "score_upper": round(upper, 1),
+        }
+
+
+class TimeBudget:
+    """Wall-clock budget of an exam, checked before each question is handed out.
+
+    The finish time is projected from the pace of the questions completed so far:
+    one more question is allowed only if it, and the questions still in flight,
+    would complete within `seconds` of `started_at`.
+    """
+
+    def __init__(self, seconds: float, started_at: Optional[float] = None):
+        self.seconds = seconds
+        self.started_at = time.time() if started_at is None else started_at
+        self.stop_reason: Optional[str] = None
+
+    @classmethod
+    def from_test_paper(
+        cls,
+        test_paper: dict,
+        started_at: Optional[float] = None,
+        max_seconds: Optional[float] = None,
+    ) -> Optional["TimeBudget"]:
+        """Budget of the exam, capped by `max_seconds` and defaulting to it."""
+        seconds = test_paper.get("time_budget")
+        if max_seconds is not None:
+            seconds = min(seconds, max_seconds) if seconds else max_seconds
+        return cls(seconds, started_at) if seconds else None
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.started_at
+
+    def allows_next(self, completed: int, in_flight: int = 0) -> bool:
+        elapsed = self.elapsed
+        seconds_per_question = elapsed / completed if completed else 0.0
+        if elapsed + seconds_per_question * (in_flight + 1) > self.seconds:
+            self.stop_reason = "time_budget"
+        return self.stop_reason is None
+
+    def to_dict(self) -> Dict:
+        return {
+            "seconds": self.seconds,
+            "elapsed": round(self.elapsed, 1),
+            "stop_reason": self.stop_reason,
+        }
@@ -0,0 +1,535 @@
+import copy
+import json
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from src.utils.answer_normalizer import get_normalizer
+from src.utils.api_client import OpenAIClient
+from src.utils.http_session import CancellableSession
+from src.utils.load_yaml import yaml_data as CONFIG
+from src.utils.logger import logger
+from src.utils.verdict_cache import VerdictCache, get_verdict_cache
+
+JUDGE_CONFIG = CONFIG.get("judge_config", {})
+
+# Bump the versions whenever the prompts below change, cached verdicts are keyed on them.
+JUDGE_PROMPT_VERSION = "semantic-match-v1"
+# Batch mode asks a different prompt, its verdicts are cached apart from single ones
+JUDGE_BATCH_PROMPT_VERSION = "semantic-match-batch-v1"
+JUDGE_VERDICTS = ("Correct", "Incorrect")
+
+
+def build_judge_prompt(model_response: str, groundtruth_content: str) -> str:
+    return (
+        f"RESPOND ONLY 'Correct' or 'Incorrect'."
+        f"Compare if the text content SEMANTICALLY contains or indicates the same answer as the correct answer,"
+        f"even if expressed differently or with additional explanation."
+        f"\n[Text Content]: {model_response}"
+        f"\n[Correct Answer]: {groundtruth_content}"
+        f"\nIf the text clearly indicates or concludes with the same answer, respond 'Correct', "
+        f"even if it includes additional explanation or reasoning."
+    )
+
+
+def build_batch_judge_prompt(pairs: List[Tuple[str, str]]) -> str:
+    items = [
+        {"id": idx, "text_content": model_response, "correct_answer": groundtruth}
+        for idx, (model_response, groundtruth) in enumerate(pairs, start=1)
+    ]
+    return (
+        f"RESPOND ONLY with a JSON array of exactly {len(items)} strings, each 'Correct' or 'Incorrect', "
+        f"one verdict per item and in the same order as the items."
+        f"For each item, compare if the text content SEMANTICALLY contains or indicates the same answer "
+        f"as the correct answer, even if expressed differently or with additional explanation."
+        f"If the text clearly indicates or concludes with the same answer, the verdict is 'Correct', "
+        f"even if it includes additional explanation or reasoning."
+        f"\n[Items]: {json.dumps(items, ensure_ascii=False)}"
+    )
+
+
+def parse_batch_verdicts(
+    judge_output: str, expected_length: int
+) -> Optional[List[str]]:
+    """Return the verdicts of a batch judge reply, or None if the reply is malformed."""
+    # Tolerate markdown code fences and chatter around the array
+    match = re.search(r"\[.*\]", judge_output or "", re.DOTALL)
+    if not match:
+        return None
+
+    try:
+        verdicts = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(verdicts, list) or len(verdicts) != expected_length:
+        return None
+    if any(verdict not in JUDGE_VERDICTS for verdict in verdicts):
+        return None
+    return verdicts
+
+
+def add_counts(target, source) -> None:
+    """Add every field of the dataclass `source` to the same field of `target`."""
+    for field in fields(target):
+        setattr(
+            target,
+            field.name,
+            getattr(target, field.name) + getattr(source, field.name),
+        )
+
+
+@dataclass
+class JudgeStats:
+    """Counts how each verdict of an exam was reached."""
+
+    exact_matches: int = 0
+    rule_based: int = 0
+    cache_hits: int = 0
+    judge_calls: int = 0  # responses the LLM judge had to decide
+    judge_requests: int = (
+        0  # round trips to the judge, lower than judge_calls when batching
+    )
+    malformed_batches: int = 0
+
+    @property
+    def judge_calls_avoided(self) -> float:
+        """Fraction of out-of-set responses resolved without calling the judge."""
+        out_of_set = self.rule_based + self.cache_hits + self.judge_calls
+        if out_of_set == 0:
+            return 0.0
+        return (self.rule_based + self.cache_hits) / out_of_set
+
+    def merge(self, other: "JudgeStats") -> None:
+        """Add the counts of another judge, e.g. one per worker of a staged pipeline."""
+        add_counts(self, other)
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "judge_calls_avoided": self.judge_calls_avoided}
+
+
+class AnswerJudge:
+    """Decide whether an examinee response matches the groundtruth.
+
+    Responses are resolved locally whenever possible: exact matches against the
+    groundtruth set first, then the rule-based answer normalizer. Only ambiguous
+    responses reach the LLM judge, whose verdicts are looked up in and written back
+    to the persistent verdict cache. With `batch_size` above 1, ambiguous responses
+    are sent to the judge together in one request that asks for a JSON array.
+    """
+
+    def __init__(
+        self,
+        api_endpoint: Optional[str] = None,
+        model_name: Optional[str] = None,
+        max_retry: int = 3,
+        batch_size: int = 1,
+        verdict_cache: Optional[VerdictCache] = None,
+        ensemble: Optional["JudgeEnsemble"] = None,
+    ):
+        self.api_endpoint = api_endpoint or JUDGE_CONFIG.get("api_endpoint")
+        self.model_name = model_name or JUDGE_CONFIG.get("model_name", "gpt-4o")
+        self.max_retry = max_retry
+        self.batch_size = max(1, batch_size)
+        self.verdict_cache = verdict_cache
+        # Asked instead of the single judge above, see `JudgeEnsemble`
+        self.ensemble = ensemble
+        self.stats = JudgeStats()
+        # Session of the judge requests, None for the keep-alive one of the thread
+        self.session: Optional[requests.Session] = None
+        self._api_client = None
+
+    @classmethod
+    def from_test_paper(cls, test_paper: dict, max_retry: Optional[int] = None):
+        max_retry = max_retry or JUDGE_CONFIG.get("max_retry", 3)
+        batch_size = test_paper.get(
+            "judge_batch_size", JUDGE_CONFIG.get("batch_size", 1)
+        )
+        return cls(
+            api_endpoint=test_paper.get("evaluation_model_endpoint"),
+            max_retry=max_retry,
+            batch_size=batch_size,
+            verdict_cache=get_verdict_cache(),
+            ensemble=JudgeEnsemble.from_config(
+                JUDGE_CONFIG.get("ensemble", {}),
+                max_retry=max_retry,
+                batch_size=batch_size,
+                verdict_cache=get_verdict_cache(),
+            ),
+        )
+
+    @property
+    def prompt_versions(self) -> Tuple[str, ...]:
+        """Prompt versions whose cached verdicts this judge reuses, in lookup order.
+
+        A batch judge still sends the single-answer prompt for a batch of one, or
+        for the halves of a malformed batch split down to one answer.
+        """
+        if self.batch_size > 1:
+            return JUDGE_BATCH_PROMPT_VERSION, JUDGE_PROMPT_VERSION
+        return (JUDGE_PROMPT_VERSION,)
+
+    @property
+    def api_client(self) -> OpenAIClient:
+        # Creating the client runs a health check request, only pay it on a cache miss
+        if self._api_client is None:
+            self._api_client = OpenAIClient(api_endpoint=self.api_endpoint)
+        return self._api_client
+
+    def for_call(self, session: requests.Session) -> "AnswerJudge":
+        """Copy of this judge for one call running next to others.
+
+        The copy counts its own stats and sends its requests on `session`. Its API
+        client is the one of this judge, created here once.
+        """
+        self._api_client = self.api_client
+        judge = copy.copy(self)
+        judge.stats = JudgeStats()
+        judge.session = session
+        return judge
+
+    def ask_judge(self, model_response: str, groundtruth_content: str) -> str:
+        input_text = build_judge_prompt(model_response, groundtruth_content)
+
+        call_count = 0
+        evaluate_response = None
+        while call_count < self.max_retry and evaluate_response not in JUDGE_VERDICTS:
+            evaluate_response = self.api_client.do_request(
+                input_text=input_text,
+                model_name=self.model_name,
+                session=self.session,
+            )
+            call_count += 1
+            self.stats.judge_requests += 1
+        return evaluate_response
+
+    def ask_judge_batch(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Judge several (response, groundtruth) pairs in one request.
+
+        A malformed reply splits the batch in half and retries each half, down to
+        the single-answer prompt. Returns (verdict, prompt version) per pair, the
+        version of the prompt the verdict was actually given for.
+        """
+        if len(pairs) == 1:
+            return [(self.ask_judge(*pairs[0]), JUDGE_PROMPT_VERSION)]
+
+        judge_output = self.api_client.do_request(
+            input_text=build_batch_judge_prompt(pairs),
+            model_name=self.model_name,
+            session=self.session,
+        )
+        self.stats.judge_requests += 1
+
+        verdicts = parse_batch_verdicts(judge_output, len(pairs))
+        if verdicts is None:
+            self.stats.malformed_batches += 1
+            logger.warning(
+                f"Malformed batch verdicts for {len(pairs)} answers, splitting the batch."
+            )
+            middle = len(pairs) // 2
+            return self.ask_judge_batch(pairs[:middle]) + self.ask_judge_batch(
+                pairs[middle:]
+            )
+        return [(verdict, JUDGE_BATCH_PROMPT_VERSION) for verdict in verdicts]
+
+    def judge_many(
+        self,
+        pairs: List[Tuple[str, str]],
+        judge_details: Optional[List[Dict]] = None,
+    ) -> List[str]:
+        """Judge (response, groundtruth) pairs through the verdict cache and the LLM judge.
+
+        With an ensemble, how each vote went is appended to `judge_details`.
+        """
+        if self.ensemble is not None:
+            # The ensemble's judges keep their own verdict cache entries
+            self.stats.judge_calls += len(pairs)
+            verdicts, details = self.ensemble.judge_many(pairs)
+            if judge_details is not None:
+                judge_details.extend(details)
+            return verdicts
+
+        verdicts: List[Optional[str]] = [None] * len(pairs)
+        cache_misses = []
+
+        for idx, (model_response, groundtruth_content) in enumerate(pairs):
+            if self.verdict_cache:
+                cached_verdict = self.get_cached_verdict(
+                    model_response, groundtruth_content
+                )
+                if cached_verdict is not None:
+                    logger.debug(f"Verdict cache hit: {cached_verdict}")
+                    self.stats.cache_hits += 1
+                    verdicts[idx] = cached_verdict
+                    continue
+            cache_misses.append(idx)
+
+        self.stats.judge_calls += len(cache_misses)
+        for start in range(0, len(cache_misses), self.batch_size):
+            batch = cache_misses[start : start + self.batch_size]
+            batch_verdicts = self.ask_judge_batch([pairs[idx] for idx in batch])
+
+            for idx, (evaluate_response, prompt_version) in zip(batch, batch_verdicts):
+                verdicts[idx] = evaluate_response
+                if self.verdict_cache and evaluate_response in JUDGE_VERDICTS:
+                    model_response, groundtruth_content = pairs[idx]
+                    self.verdict_cache.put(
+                        self.model_name,
+                        prompt_version,
+                        groundtruth_content,
+                        model_response,
+                        evaluate_response,
+                    )
+        return verdicts
+
+    def get_cached_verdict(
+        self, model_response: str, groundtruth_content: str
+    ) -> Optional[str]:
+        for prompt_version in self.prompt_versions:
+            cached_verdict = self.verdict_cache.get(
+                self.model_name, prompt_version, groundtruth_content, model_response
+            )
+            if cached_verdict is not None:
+                return cached_verdict
+        return None
+
+    def judge(
+        self,
+        model_response: str,
+        groundtruth_content: str,
+        judge_details: Optional[List[Dict]] = None,
+    ) -> str:
+        pairs = [(model_response, groundtruth_content)]
+        return self.judge_many(pairs, judge_details)[0]
+
+    def resolve_locally(
+        self,
+        model_response: str,
+        groundtruth_content: str,
+        groundtruth_type: str,
+        groundtruth_set: Iterable[str],
+    ) -> Optional[str]:
+        """Return the verdict if it can be decided without the judge, else None."""
+        if model_response in groundtruth_set:
+            self.stats.exact_matches += 1
+            return (
+                JUDGE_VERDICTS[0]
+                if model_response == groundtruth_content
+                else JUDGE_VERDICTS[1]
+            )
+
+        normalizer = get_normalizer(groundtruth_type, groundtruth_set)
+        is_correct = normalizer.decide(model_response, groundtruth_content)
+        if is_correct is not None:
+            self.stats.rule_based += 1
+            return JUDGE_VERDICTS[0] if is_correct else JUDGE_VERDICTS[1]
+        return None
+
+    def evaluate(
+        self,
+        model_response: str,
+        groundtruth_content: str,
+        groundtruth_type: str,
+        groundtruth_set: Iterable[str],
+        judge_details: Optional[List[Dict]] = None,
+    ) -> str:
+        verdict = self.resolve_locally(
+            model_response, groundtruth_content, groundtruth_type, groundtruth_set
+        )
+        if verdict is not None:
+            return verdict
+        return self.judge(model_response, groundtruth_content, judge_details)
+
+
+@dataclass
+class EnsembleMemberStats:
+    """Votes and latency of one judge of a `JudgeEnsemble`, counted per answer."""
+
+    votes: int = 0  # verdicts received before the ensemble decided
+    agreed: int = 0  # votes equal to the ensemble's verdict
+    cancelled: int = 0  # answers decided without waiting for this judge
+    failed: int = 0  # answers lost to an error of this judge
+    calls: int = 0  # requests that returned, `total_latency` is their sum
+    total_latency: float = 0.0
+    judge_requests: int = 0  # round trips of the calls that returned
+    cache_hits: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            **asdict(self),
+            "agreement": self.agreed / self.votes if self.votes else 0.0,
+            "mean_latency": self.total_latency / self.calls if self.calls else 0.0,
+        }
+
+
+class JudgeEnsemble:
+    """Several LLM judges voting on the answers the rules could not decide.
+
+    Every judge is asked at the same time and a verdict is final as soon as
+    `quorum` judges agree on it. The ensemble then stops waiting: calls not
+    started yet are cancelled, and calls already waiting on their HTTP response
+    are aborted through the `CancellableSession` each judge got for the call.
+    Each call asks a copy of the judge (`AnswerJudge.for_call`), so calls running
+    at the same time never share a judge's stats.
+    """
+
+    def __init__(
+        self,
+        judges: Dict[str, AnswerJudge],
+        quorum: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.judges = judges
+        # A majority of the judges by default
+        self.quorum = min(quorum or len(judges) // 2 + 1, len(judges))
+        self.timeout = timeout
+        self.stats = {name: EnsembleMemberStats() for name in judges}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls,
+        ensemble_config: dict,
+        max_retry: int = 3,
+        batch_size: int = 1,
+        verdict_cache: Optional[VerdictCache] = None,
+    ) -> Optional["JudgeEnsemble"]:
+        """The ensemble of `judge_config.ensemble`, or None when it is disabled."""
+        if not ensemble_config.get("enabled", False):
+            return None
+
+        judges = {
+            judge_config.get("name", judge_config["model_name"]): AnswerJudge(
+                api_endpoint=judge_config.get("api_endpoint"),
+                model_name=judge_config["model_name"],
+                max_retry=max_retry,
+                batch_size=batch_size,
+                verdict_cache=verdict_cache,
+            )
+            for judge_config in ensemble_config.get("judges", [])
+        }
+        if not judges:
+            logger.warning("Judge ensemble enabled without judges, using one judge.")
+            return None
+        return cls(
+            judges,
+            quorum=ensemble_config.get("quorum"),
+            timeout=ensemble_config.get("timeout"),
+        )
+
+    @staticmethod
+    def _ask(
+        judge: AnswerJudge, pairs: List[Tuple[str, str]], session: requests.Session
+    ) -> Tuple[List, float, JudgeStats]:
+        started_at = time.monotonic()
+        call_judge = judge.for_call(session)
+        verdicts = call_judge.judge_many(pairs)
+        return verdicts, time.monotonic() - started_at, call_judge.stats
+
+    def judge_many(self, pairs: List[Tuple[str, str]]) -> Tuple[List[str], List[Dict]]:
+        """Verdicts of (response, groundtruth) pairs, and how the vote on each went."""
+        votes = [Counter() for _ in pairs]
+        verdicts: List[Optional[str]] = [None] * len(pairs)
+        # judge name -> (verdicts, latency, stats), or None if the judge failed
+        replies: Dict[str, Optional[Tuple[List, float, JudgeStats]]] = {}
+
+        sessions = {name: CancellableSession() for name in self.judges}
+        executor = ThreadPoolExecutor(
+            max_workers=len(self.judges), thread_name_prefix="judge-ensemble"
+        )
+        futures = {
+            executor.submit(self._ask, judge, pairs, sessions[name]): name
+            for name, judge in self.judges.items()
+        }
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                name = futures[future]
+                try:
+                    replies[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Ensemble judge {name} failed: {e}")
+                    replies[name] = None
+                    continue
+
+                for idx, verdict in enumerate(replies[name][0]):
+                    if verdicts[idx] is None and verdict in JUDGE_VERDICTS:
+                        votes[idx][verdict] += 1
+                        if votes[idx][verdict] >= self.quorum:
+                            verdicts[idx] = verdict
+                if all(verdict is not None for verdict in verdicts):
+                    break
+        except FuturesTimeoutError:
+            logger.warning(f"Judge ensemble timed out after {self.timeout}s.")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Aborts the requests of the judges still waiting on a response
+            for session in sessions.values():
+                session.cancel()
+
+        for idx, vote in enumerate(votes):
+            if verdicts[idx] is None:
+                # No quorum: a strict majority of the votes received, else undecided
+                ranked = vote.most_common(2)
+                if ranked and (len(ranked) == 1 or ranked[0][1] > ranked[1][1]):
+                    verdicts[idx] = ranked[0][0]
+                else:
+                    verdicts[idx] = ""
+
+        return verdicts, self._record_votes(verdicts, replies)
+
+    def _record_votes(
+        self,
+        verdicts: List[str],
+        replies: Dict[str, Optional[Tuple[List, float, JudgeStats]]],
+    ) -> List[Dict]:
+        details = [
+            {"verdict": verdict, "quorum": self.quorum, "judges": {}}
+            for verdict in verdicts
+        ]
+        with self._stats_lock:
+            for name, member_stats in self.stats.items():
+                if name not in replies:
+                    member_stats.cancelled += len(verdicts)
+                    for answer_details in details:
+                        answer_details["judges"][name] = {"status": "cancelled"}
+                    continue
+                if replies[name] is None:
+                    member_stats.failed += len(verdicts)
+                    for answer_details in details:
+                        answer_details["judges"][name] = {"status": "failed"}
+                    continue
+
+                judge_verdicts, latency, judge_stats = replies[name]
+                member_stats.calls += 1
+                member_stats.total_latency += latency
+                member_stats.judge_requests += judge_stats.judge_requests
+                member_stats.cache_hits += judge_stats.cache_hits
+                for answer_details, verdict in zip(details, judge_verdicts):
+                    agreed = verdict == answer_details["verdict"]
+                    member_stats.votes += 1
+                    member_stats.agreed += agreed
+                    answer_details["judges"][name] = {
+                        "verdict": verdict,
+                        "latency": round(latency, 3),
+                        "agreed": agreed,
+                    }
+        return details
+
+    def merge_stats(self, other: "JudgeEnsemble") -> None:
+        with self._stats_lock:
+            for name, member_stats in other.stats.items():
+                add_counts(
+                    self.stats.setdefault(name, EnsembleMemberStats()), member_stats
+                )
+
+    def stats_dict(self) -> Dict[str, Dict]:
+        with self._stats_lock:
+            return {name: stats.to_dict() for name, stats in self.stats.items()}
@@ -0,0 +1,119 @@
+import ast
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional
+
+from src.utils.answer_normalizer import (
+    CLASSIFICATION_TYPES,
+    MULTIPLE_CHOICE_SEPARATOR,
+    MULTIPLE_CHOICE_TYPES,
+)
+from src.utils.load_yaml import yaml_data as CONFIG
+from src.utils.logger import logger
+
+CLASSIFICATION_PROMPT = (
+    "Please answer the following **single-choice question**, "
+    "and strictly adhere to the [Response Format]:\nQuestion: {question}"
+    "\n[Response Format]\nYour response must be one of the options in the following set, "
+    "and the answer text must match the option exactly. For example, answer: {example}. "
+    "Do not generate any extra symbols. Do not generate any extra characters."
+)
+MULTIPLE_CHOICE_PROMPT = (
+    "Please answer the following **multiple-choice question**, "
+    "and strictly adhere to the [Response Format]:\nQuestion: {question}"
+    "\n[Response Format]\nYour response must be one or more options from the following set, "
+    'with each selected option separated by a "/". The answer text must match the options '
+    "exactly. For example, answer: {example}. Do not generate any extra symbols. "
+    "Do not generate any extra characters."
+)
+
+
+def parse_groundtruth_set(groundtruth_set: str) -> List[str]:
+    """Parse the stored option set without evaluating it as code."""
+    if isinstance(groundtruth_set, (list, tuple, set)):
+        return list(groundtruth_set)
+    try:
+        options = json.loads(groundtruth_set)
+    except (TypeError, json.JSONDecodeError):
+        # Rows written as Python literals, e.g. "{'A', 'B'}"
+        options = ast.literal_eval(groundtruth_set)
+    return [str(option) for option in options]
+
+
+def render_prompt(
+    question_content: str, groundtruth_type: str, groundtruth_options: List[str]
+) -> str:
+    if groundtruth_type in CLASSIFICATION_TYPES and groundtruth_options:
+        return CLASSIFICATION_PROMPT.format(
+            question=question_content, example=groundtruth_options[0]
+        )
+    if groundtruth_type in MULTIPLE_CHOICE_TYPES and len(groundtruth_options) > 1:
+        return MULTIPLE_CHOICE_PROMPT.format(
+            question=question_content,
+            example=MULTIPLE_CHOICE_SEPARATOR.join(groundtruth_options[:2]),
+        )
+    return question_content
+
+
+def prepare_question(question: dict) -> dict:
+    """Attach the parsed option list and the rendered examinee prompt to a question."""
+    groundtruth_options = parse_groundtruth_set(question["groundtruth_set"])
+    return {
+        **question,
+        "groundtruth_options": groundtruth_options,
+        "prompt": render_prompt(
+            question["question_content"],
+            question["groundtruth_type"],
+            groundtruth_options,
+        ),
+    }
+
+
+class PreparedQuestionCache:
+    """LRU cache of prepared question sets, shared by every exam on the same version."""
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_prepare(
+        self, key: Hashable, load_questions: Callable[[], List[dict]]
+    ) -> List[dict]:
+        with self._lock:
+            prepared_questions = self._items.get(key)
+            if prepared_questions is not None:
+                self._items.move_to_end(key)
+                logger.debug(f"Prepared question cache hit: {key}")
+
+        if prepared_questions is None:
+            # Loaded outside the lock, other threads keep serving cached versions
+            prepared_questions = [
+                prepare_question(question) for question in load_questions()
+            ]
+            # Empty results are not cached, the bank may not be imported yet
+            if not prepared_questions:
+                return []
+            with self._lock:
+                self._items[key] = prepared_questions
+                if len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+
+        # Copies, so per-exam changes never leak into the shared entry
+        return [dict(question) for question in prepared_questions]
+
+
+_prepared_question_cache: Optional[PreparedQuestionCache] = None
+_prepared_question_cache_lock = threading.Lock()
+
+
+def get_prepared_question_cache() -> PreparedQuestionCache:
+    global _prepared_question_cache
+
+    with _prepared_question_cache_lock:
+        if _prepared_question_cache is None:
+            _prepared_question_cache = PreparedQuestionCache(
+                max_size=CONFIG.get("prepared_question_cache_size", 32)
+            )
+    return _prepared_question_cache
@@ -0,0 +1,88 @@
+import zlib
+from typing import Any
+
+from kombu.serialization import register
+from kombu.utils import json as kombu_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to kombu's json
+    orjson = None
+
+COMPACT_SERIALIZER_NAME = "compact"
+COMPACT_CONTENT_TYPE = "application/x-compact-json"
+
+# First byte of every payload, tells the decoder whether the body is compressed
+RAW_HEADER = b"j"
+ZLIB_HEADER = b"z"
+
+# Types orjson would serialize on its own are handed to kombu's encoder instead, so
+# they keep kombu's `__type__` markers and decode back to the same type
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+    _kombu_default = kombu_json.JSONEncoder().default
+
+
+def _dumps_json(data: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_kombu_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which orjson refuses
+            pass
+    return kombu_json.dumps(data).encode("utf-8")
+
+
+def _loads_json(body: bytes) -> Any:
+    # Markers need kombu's object hook, everything else takes the fast path
+    if orjson is not None and b'"__type__"' not in body:
+        return orjson.loads(body)
+    return kombu_json.loads(body)
+
+
+class CompactSerializer:
+    """JSON (orjson when available) with zlib compression above a size threshold.
+
+    Chains pass whole `test_paper` dicts from task to task, so most payloads are
+    large and repetitive (the same prompt templates on every question).
+    """
+
+    def __init__(self, compress_threshold: int = 4096, compress_level: int = 6):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def dumps(self, data: Any) -> bytes:
+        body = _dumps_json(data)
+        if len(body) >= self.compress_threshold:
+            return ZLIB_HEADER + zlib.compress(body, self.compress_level)
+        return RAW_HEADER + body
+
+    def loads(self, payload: bytes) -> Any:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        header, body = payload[:1], payload[1:]
+        if header == ZLIB_HEADER:
+            body = zlib.decompress(body)
+        elif header != RAW_HEADER:
+            raise ValueError(
+                f"Unknown {COMPACT_SERIALIZER_NAME} payload header {header!r}"
+            )
+        return _loads_json(body)
+
+
+def register_compact_serializer(config: dict = None) -> CompactSerializer:
+    """Register the serializer with kombu, select it with `task_serializer: compact`."""
+    serializer = CompactSerializer(**(config or {}))
+    register(
+        COMPACT_SERIALIZER_NAME,
+        serializer.dumps,
+        serializer.loads,
+        content_type=COMPACT_CONTENT_TYPE,
+        content_encoding="binary",
+    )
+    return serializer
@@ -0,0 +1,226 @@
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# End of the input of a stage, every worker of the stage receives one
+_END = object()
+
+
+@dataclass
+class StageStats:
+    """Where the workers of one stage spent the run."""
+
+    workers: int = 0
+    items: int = 0
+    busy_seconds: float = 0.0  # running the handler
+    blocked_seconds: float = 0.0  # waiting for room in the next stage's queue
+    utilization: float = 0.0  # busy_seconds / (workers * run time)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class PipelineStage:
+    """One step of a `StagedPipeline`, run by `workers` threads.
+
+    `handler` takes one item and returns what the next stage receives. With a
+    `batch_size` it takes a list of up to `batch_size` items that were waiting
+    together instead, and returns one output per item.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        workers: int = 1,
+        batch_size: Optional[int] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.batch_size = batch_size and max(1, batch_size)
+
+
+class StagedPipeline:
+    """Runs items through stages connected by bounded queues.
+
+    All stages work at the same time, e.g. question k+1 is asked while question k
+    is judged and question k-1 is written. A full queue blocks the stage feeding
+    it, so a slow stage holds back the stages before it instead of letting items
+    pile up in memory.
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        queue_size: int = 8,
+        poll_interval: float = 0.05,
+    ):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.stats = {stage.name: StageStats(workers=stage.workers) for stage in stages}
+        self.elapsed = 0.0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def run(self, items: Iterable) -> Iterator:
+        """Feed `items` to the first stage, yield the outputs of the last one.
+
+        Items are read and outputs yielded in the calling thread, in the order they
+        complete. The first exception raised by a handler stops every stage and is
+        raised again here.
+        """
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        # Unbounded, the calling thread empties it between two items it feeds
+        outputs = queue.Queue()
+        queues.append(outputs)
+        remaining = [stage.workers for stage in self.stages]
+
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(index, queues, remaining),
+                name=f"{stage.name}-{worker}",
+                daemon=True,
+            )
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in self._feed(items):
+                while not self._put(queues[0], item):
+                    if self._stop.is_set():
+                        break
+                    yield from self._drain(outputs)
+                yield from self._drain(outputs)
+
+            while True:
+                output = outputs.get()
+                if output is _END:
+                    break
+                yield output
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._finish(time.monotonic() - started_at)
+
+        if self._error is not None:
+            raise self._error
+
+    def stage_stats(self) -> Dict[str, Dict]:
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    def _feed(self, items: Iterable) -> Iterator:
+        for item in items:
+            if self._stop.is_set():
+                break
+            yield item
+        for _ in range(self.stages[0].workers):
+            yield _END
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        # Gives up after one poll interval, so callers can check `_stop` in between
+        try:
+            target.put(item, timeout=self.poll_interval)
+            return True
+        except queue.Full:
+            return False
+
+    def _drain(self, outputs: queue.Queue) -> Iterator:
+        while True:
+            try:
+                output = outputs.get_nowait()
+            except queue.Empty:
+                return
+            if output is _END:
+                # Only sent once every stage is done, keep it for `run`
+                outputs.put(_END)
+                return
+            yield output
+
+    def _take(self, inbox: queue.Queue, batch_size: int) -> Optional[List]:
+        """Wait for one item, then take whatever else is queued, up to `batch_size`."""
+        while True:
+            if self._stop.is_set():
+                return None
+            try:
+                item = inbox.get(timeout=self.poll_interval)
+                break
+            except queue.Empty:
+                continue
+        if item is _END:
+            return None
+
+        batch = [item]
+        while len(batch) < batch_size:
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                # Belongs to the worker that will find the queue empty next
+                inbox.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self, index: int, queues: List[queue.Queue], remaining: List[int]):
+        stage = self.stages[index]
+        inbox, outbox = queues[index], queues[index + 1]
+        stats = self.stats[stage.name]
+
+        try:
+            while (batch := self._take(inbox, stage.batch_size or 1)) is not None:
+                busy_from = time.monotonic()
+                if stage.batch_size:
+                    results = stage.handler(batch)
+                else:
+                    results = [stage.handler(batch[0])]
+
+                blocked_from = time.monotonic()
+                for result in results:
+                    while not self._put(outbox, result):
+                        if self._stop.is_set():
+                            return
+                done_at = time.monotonic()
+
+                with self._lock:
+                    stats.items += len(batch)
+                    stats.busy_seconds += blocked_from - busy_from
+                    stats.blocked_seconds += done_at - blocked_from
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._stop.set()
+        finally:
+            with self._lock:
+                remaining[index] -= 1
+                last_worker = remaining[index] == 0
+            # The last worker out closes the next stage, the outputs get a single end
+            if last_worker:
+                next_workers = (
+                    self.stages[index + 1].workers
+                    if index + 1 < len(self.stages)
+                    else 1
+                )
+                for _ in range(next_workers):
+                    # The outputs are unbounded, `run` always gets its end
+                    while not self._put(outbox, _END) and not self._stop.is_set():
+                        pass
+
+    def _finish(self, elapsed: float) -> None:
+        self.elapsed = elapsed
+        for stats in self.stats.values():
+            if elapsed > 0:
+                stats.utilization = stats.busy_seconds / (stats.workers * elapsed)
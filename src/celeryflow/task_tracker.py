@@ -1,6 +1,7 @@
 from typing import Dict, Optional
 
 from celery import Task
+from flask import has_app_context
 
 from src.celeryflow.data_process import DataFrameSerializer
 from src.utils.logger import logger
@@ -41,7 +42,8 @@ class TaskProgressTracker:
             description = meta.get("description", "")
             current = meta.get("current", 0)
             total = meta.get("total", 0)
-            self.execution_time = meta.get("execution_time", 0)
+            # Local, the task instance is shared by every thread of a threads pool
+            execution_time = meta.get("execution_time", 0)
 
             logger.info("Task Progress Update:")
             logger.info(f"└── Chain ID: {getattr(self, 'chain_id', 'N/A')}")
@@ -49,7 +51,7 @@ class TaskProgressTracker:
             logger.info(f"    ├── Task ID: {self.request.id}")
             logger.info(f"    ├── State: {state}")
             logger.info(f"    ├── Progress: {progress:.1f}%")
-            logger.info(f"    ├── Execution Time: {self.execution_time}")
+            logger.info(f"    ├── Execution Time: {execution_time}")
             logger.info(f"    └── Current/Total: {current}/{total}")
 
             logger.info(f"Task Progress: {progress}% - {description}")
@@ -147,22 +149,18 @@ class TaskChainTracker:
     of tasks, maintaining chain context across task boundaries.
     """
 
-    def __init__(self):
-        self._chain_id = None
-
     @property
     def chain_id(self) -> Optional[str]:
         """Get the chain identifier for the current task execution.
 
+        Read from the request on every call: the task instance outlives the
+        request, and with a threads pool it serves several requests at once.
+
         Returns:
             str: Chain ID from request headers if available
         """
-        if not hasattr(self, "_chain_id"):
-            self._chain_id = None
-        if self._chain_id is None:
-            headers = getattr(self.request, "headers", {}) or {}
-            self._chain_id = headers.get("chain_id")
-        return self._chain_id
+        headers = getattr(self.request, "headers", {}) or {}
+        return headers.get("chain_id")
 
 
 class CeleryBaseTask(Task, TaskProgressTracker, TaskChainTracker, DataFrameSerializer):
@@ -174,9 +172,7 @@ class CeleryBaseTask(Task, TaskProgressTracker, TaskChainTracker, DataFrameSeria
     def __init__(self):
         Task.__init__(self)
         TaskProgressTracker.__init__(self)
-        TaskChainTracker.__init__(self)
         DataFrameSerializer.__init__(self)
-        self._chain_id = None
         self._state = None
 
     def __call__(self, *args, **kwargs):
@@ -184,7 +180,13 @@ class CeleryBaseTask(Task, TaskProgressTracker, TaskChainTracker, DataFrameSeria
         if not hasattr(self, "_initialized"):
             self.__init__()
             self._initialized = True
-        return super().__call__(*args, **kwargs)
+
+        # Same app context handling as `ContextTask`, which this base class replaces
+        flask_app = getattr(self.app, "flask_app", None)
+        if flask_app is None or has_app_context():
+            return super().__call__(*args, **kwargs)
+        with flask_app.app_context():
+            return super().__call__(*args, **kwargs)
 
     # Add required progress tracking methods
     def start_task(self, total: int, description: str = None):
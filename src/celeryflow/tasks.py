@@ -1,20 +1,66 @@
-from typing import Dict, List, Optional
+import json
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import requests
-from celery import chain
+from celery import chain, chord, group, uuid
 
 from src.celeryflow import celery_app
 from src.celeryflow.celery_controller import (
+    RESPONSE_DEFERRED,
+    RESPONSE_IN_PROGRESS,
+    RESPONSE_JUDGED,
+    RESULT_DEFERRED,
     ControllerContext,
     create_evaluation_result,
     create_response_record,
 )
-from src.celeryflow.task_decorator import with_progress
+from src.celeryflow.chain_monitor import extract_chain_ids, get_batch_failure_task_id
+from src.celeryflow.early_stopping import (
+    ADAPTIVE_EVALUATION_CONFIG,
+    EarlyStopRule,
+    TimeBudget,
+    score_interval,
+)
+from src.celeryflow.judge import (
+    JUDGE_CONFIG,
+    JUDGE_VERDICTS,
+    AnswerJudge,
+    JudgeEnsemble,
+)
+from src.celeryflow.question_preparation import (
+    get_prepared_question_cache,
+    parse_groundtruth_set,
+    prepare_question,
+)
+from src.celeryflow.staged_pipeline import PipelineStage, StagedPipeline
+from src.celeryflow.task_decorator import (
+    PauseController,
+    ProgressMonitor,
+    with_progress,
+)
 from src.celeryflow.task_tracker import CeleryBaseTask
-from src.models.controller import EvaluationController
-from src.models.db_schema import QuestionData, ResultData
-from src.utils.api_client import OpenAIClient
+from src.models.controller import BasicController, EvaluationController
+from src.models.db_schema import ResultData, ResultRecordData
+from src.models.repository import ResultRepositroy
+from src.utils.http_session import REQUEST_TIMEOUT, get_http_session
+from src.utils.load_yaml import yaml_data as CONFIG
 from src.utils.logger import logger
+from src.utils.retention import run_retention
+from src.utils.single_flight import get_model_call_single_flight
+from src.utils.verdict_cache import get_verdict_cache
+
+DEFERRED_JUDGE_MODE = "deferred"
+DEFERRED_JUDGE_CONFIG = JUDGE_CONFIG.get("deferred", {})
+QUESTION_STREAMING_CONFIG = CONFIG.get("question_streaming", {})
+RESULT_RETENTION_CONFIG = CONFIG.get("result_retention", {})
+EVALUATION_DISPATCH_CONFIG = CONFIG.get("evaluation_dispatch", {})
+BATCH_EVALUATION_CONFIG = CONFIG.get("batch_evaluation", {})
+STAGED_PIPELINE_CONFIG = CONFIG.get("staged_pipeline", {})
+# Seconds left to hand the questions scored so far over to `record_result`
+TIME_LIMIT_MARGIN = 300
 
 
 @celery_app.task(bind=True, name="template.check_health", base=CeleryBaseTask)
@@ -26,7 +72,7 @@ def check_health(
 
     logger.info(f"Checking health for API: {api_health_endpoints}")
     try:
-        response = requests.get(api_health_endpoints)
+        response = get_http_session().get(api_health_endpoints, timeout=REQUEST_TIMEOUT)
         is_healthy = response.status_code == requests.codes.ok
         if is_healthy:
             logger.info("API health check!")
@@ -43,97 +89,327 @@ def check_health(
 def get_question_dataset(self, test_paper: dict) -> List[dict]:
     logger.info("Get Question dataset for Evaluation.")
 
+    question_set = get_question_set(test_paper)
+    test_paper["result"]["question_version_id"] = question_set["question_version_id"]
+
+    evaluation_result_controller = ControllerContext.get_evaluation_controller()
+    evaluation_result_controller.update_data(
+        request_data=ResultData.from_dict(test_paper["result"])
+    )
+
+    test_paper.update(question_set)
+    return test_paper
+
+
+def get_question_set(exam: dict) -> Dict:
+    """Sampled and prepared questions of an exam (`evaluation_type`, `version`, `sampling`)."""
     controller = EvaluationController()
 
     question_version_id = controller.get_question_version_id(
-        evaluation_type=test_paper["evaluation_type"],
-        question_version=test_paper["version"],
+        evaluation_type=exam["evaluation_type"],
+        question_version=exam["version"],
     )
 
-    question_data: List[QuestionData] = controller.get_question(
-        question_version_id=question_version_id,
-        question_category=test_paper["evaluation_type"],
-    )
+    # Only the sampled rows leave SQLite, see `ResultRepositroy.get_question`
+    sampling = exam.get("sampling", {})
 
-    test_paper["result"]["question_version_id"] = question_version_id
+    question_query = {
+        "question_version_id": question_version_id,
+        "question_category": exam["evaluation_type"],
+        **sampling,
+    }
+    question_count = controller.count_question(**question_query)
+    question_set = {"question_version_id": question_version_id}
 
-    evaluation_result_controller = ControllerContext.get_evaluation_controller()
-    evaluation_result_controller.update_data(
-        request_data=ResultData.from_dict(test_paper["result"])
-    )
+    if question_count > QUESTION_STREAMING_CONFIG.get("threshold", 1000):
+        # Too large to pass through the broker (or the cache), the pipeline
+        # streams the questions straight from SQLite instead
+        logger.info(f"Streaming {question_count} questions for evaluation.")
+        question_data_list: List[dict] = []
+        question_set["question_stream"] = question_query
+    else:
+        # Parsed and rendered once per question version, then reused by every exam on it
+        question_data_list = get_prepared_question_cache().get_or_prepare(
+            key=(
+                question_version_id,
+                exam["evaluation_type"],
+                *sorted(sampling.items()),
+            ),
+            load_questions=lambda: controller.get_question(
+                **question_query, columnar=True
+            ).to_dicts(),
+        )
+        question_count = len(question_data_list)
 
-    test_paper.update({"data": []})
-    question_data_list = []
-    for each_question in question_data:
-        temp_dict = each_question.__dict__
-        temp_dict.update({"question_version_id": question_version_id})
-        question_data_list.append(temp_dict)
+    question_set.update({"data": question_data_list, "question_count": question_count})
+    return question_set
 
-    test_paper.update({"data": question_data_list})
-    return test_paper
+
+def iter_exam_questions(test_paper: dict) -> Iterator[dict]:
+    """Yield the prepared questions of an exam, streamed from SQLite if it is large."""
+    question_query = test_paper.get("question_stream")
+    if not question_query:
+        yield from test_paper.get("data", [])
+        return
+
+    controller = EvaluationController()
+    for question in controller.iter_question(
+        **question_query,
+        chunk_size=QUESTION_STREAMING_CONFIG.get("chunk_size", 500),
+    ):
+        yield prepare_question(question.__dict__)
 
 
 @celery_app.task(
     bind=True,
     name="evaluation.tasks.evaluation_pipeline",
     base=CeleryBaseTask,
+    # Enforced by prefork only, the exam's time budget ends `TIME_LIMIT_MARGIN` earlier
     time_limit=3600,
+    # Redelivered if the worker dies mid-exam, the checkpoints make that safe
+    acks_late=True,
+    reject_on_worker_lost=True,
 )
-@with_progress("evaluation_pipeline")
 def evaluation_pipeline(self, test_paper: dict):
     logger.info(
         f"Processing evaluation for examinee model ID: {test_paper['model_id']}..."
     )
 
-    # 陷阱：要用with_progress紀錄for loop內的內容要return something
     response_record_controller = ControllerContext.get_response_controller()
+    judge = AnswerJudge.from_test_paper(test_paper)
     wait_for_human = False
-    question_data = test_paper.get("data")
     evaluation_response_list = []
-    for each_question in question_data:
-        response_record = create_response_record(test_paper["result"]["result_id"])
+    deferred_judging = test_paper.get("judge_mode") == DEFERRED_JUDGE_MODE
 
-        response_record.question_id = each_question["question_id"]
+    # The whole exam is driven here instead of through `with_progress`, so one judge
+    # (and its statistics) covers every question of the exam
+    monitor = ProgressMonitor(
+        self,
+        test_paper.get("question_count", len(test_paper.get("data", []))),
+        "evaluation_pipeline",
+    )
+    pause_controller = PauseController(self.request.id)
 
-        # 2. Call Student Model
-        model_response = call_model(
-            each_question=each_question,
-            model_endpoint=test_paper["model_endpoint"],
-        )
-        response_record.model_response = model_response
-        logger.debug(f"Answer set: {each_question['groundtruth_set']}")
-        logger.debug(f"Student Response: {model_response}")
-        logger.debug(f"Answer: {each_question['groundtruth_content']}")
-
-        # 3. Call Evaluation Method (Teacher or Rule-Based)
-        evaluation_response = do_evaluate(
-            each_question=each_question,
-            model_response=model_response,
-            test_paper=test_paper,
+    # Ambiguous answers waiting for a judge batch: (response_record, question, response)
+    pending_judgement: List[Tuple[ResultRecordData, dict, str]] = []
+
+    # A redelivered task (e.g. after a worker crash) resumes from the checkpoints
+    # of the previous delivery instead of asking the model and the judge again
+    result_id = test_paper["result"]["result_id"]
+    checkpoints = ResultRepositroy.from_config(CONFIG).get_response_checkpoints(
+        result_id
+    )
+    if checkpoints:
+        logger.info(f"Resuming result {result_id}: {len(checkpoints)} checkpoints.")
+
+    questions = iter_exam_questions(test_paper)
+    stop_rule = EarlyStopRule.from_test_paper(test_paper)
+    if stop_rule and deferred_judging:
+        logger.warning("Adaptive exams need immediate judging, asking every question.")
+        stop_rule = None
+    if stop_rule:
+        if not test_paper.get("question_stream"):
+            # Every prefix of a shuffled exam is a random sample, so the interval holds
+            # wherever the exam stops. Seeded by the result, a redelivery asks the same order.
+            questions = iter(
+                random.Random(result_id).sample(
+                    test_paper["data"], len(test_paper["data"])
+                )
+            )
+
+    # Stops taking new questions once they would not complete within the budget. The
+    # threads pool never enforces `time_limit`, so every exam gets a budget below it
+    time_budget = TimeBudget.from_test_paper(
+        test_paper,
+        started_at=monitor.start_time,
+        max_seconds=self.time_limit - TIME_LIMIT_MARGIN,
+    )
+    if stop_rule or time_budget:
+        questions = iter_until_stopped(
+            questions, evaluation_response_list, monitor, stop_rule, time_budget
         )
-        response_record.model_response = evaluation_response
-        evaluation_response_list.append(evaluation_response)
 
-        response_record.status = 1
-        response_record_controller.update_data(request_data=response_record)
+    stage_stats = None
+    if STAGED_PIPELINE_CONFIG.get("enabled", False):
+        # Questions are asked, judged and written at the same time, see `StagedEvaluation`
+        staged_evaluation = StagedEvaluation(test_paper, checkpoints, deferred_judging)
+        pipeline = staged_evaluation.build_pipeline(judge.batch_size)
+        # Questions already asked when the stop rule is met are still judged and counted
+        for work in pipeline.run(iter_unpaused(questions, pause_controller)):
+            if work.evaluation_response is not None:
+                evaluation_response_list.append(work.evaluation_response)
+            monitor.update()
+
+        for worker_judge in staged_evaluation.worker_judges:
+            judge.stats.merge(worker_judge.stats)
+            if judge.ensemble and worker_judge.ensemble:
+                judge.ensemble.merge_stats(worker_judge.ensemble)
+        stage_stats = pipeline.stage_stats()
+        for stage_name, stats in stage_stats.items():
+            logger.info(
+                f"Stage {stage_name}: {stats['items']} questions, {stats['workers']} workers, "
+                f"utilization {stats['utilization']:.1%}, blocked {stats['blocked_seconds']:.1f}s"
+            )
+    else:
+        for each_question in questions:
+            with pause_controller.pause_check():
+                response_record = checkpoints.get(each_question["question_id"])
+
+                if response_record and response_record.status != RESPONSE_IN_PROGRESS:
+                    # Already judged, or handed over to deferred judging
+                    if response_record.status == RESPONSE_JUDGED:
+                        evaluation_response_list.append(
+                            response_record.evaluation_response
+                        )
+                    monitor.update()
+                    continue
+
+                if response_record is None:
+                    response_record = create_response_record(
+                        result_id, each_question["question_id"]
+                    )
+
+                # 2. Call Student Model, unless the previous delivery got the answer
+                model_response = response_record.model_response
+                if model_response is None:
+                    model_response = call_model(
+                        each_question=each_question,
+                        model_endpoint=test_paper["model_endpoint"],
+                    )
+                    response_record.model_response = model_response
+                    response_record_controller.update_data(request_data=response_record)
+                logger.debug(f"Answer set: {each_question['groundtruth_set']}")
+                logger.debug(f"Student Response: {model_response}")
+                logger.debug(f"Answer: {each_question['groundtruth_content']}")
+
+                # 3. Call Evaluation Method (Rule-Based first, Teacher when ambiguous)
+                judge_details: List[Dict] = []
+                if deferred_judging:
+                    # Judged later, in bulk, by `judge_deferred_responses`
+                    evaluation_response = None
+                elif judge.batch_size > 1:
+                    evaluation_response = judge.resolve_locally(
+                        model_response=model_response,
+                        **get_answer_key(each_question),
+                    )
+                else:
+                    evaluation_response = do_evaluate(
+                        each_question=each_question,
+                        model_response=model_response,
+                        test_paper=test_paper,
+                        judge=judge,
+                        judge_details=judge_details,
+                    )
+
+                if deferred_judging:
+                    defer_evaluation_response(
+                        response_record_controller, response_record
+                    )
+                elif evaluation_response is None:
+                    pending_judgement.append(
+                        (response_record, each_question, model_response)
+                    )
+                else:
+                    save_evaluation_response(
+                        response_record_controller,
+                        response_record,
+                        evaluation_response,
+                        judge_details=judge_details[0] if judge_details else None,
+                    )
+                    evaluation_response_list.append(evaluation_response)
+
+                if len(pending_judgement) >= judge.batch_size:
+                    evaluation_response_list.extend(
+                        judge_pending_responses(
+                            pending_judgement,
+                            test_paper,
+                            judge,
+                            response_record_controller,
+                        )
+                    )
+                    pending_judgement = []
+
+            monitor.update()
+
+        if pending_judgement:
+            evaluation_response_list.extend(
+                judge_pending_responses(
+                    pending_judgement, test_paper, judge, response_record_controller
+                )
+            )
 
     test_paper.update(
         {
             "wait_for_human": wait_for_human,
+            "evaluation_response_list": evaluation_response_list,
+            "duration": monitor.execution_time,
+            "judge_stats": judge.stats.to_dict(),
+            "stage_stats": stage_stats,
+            # Share of the exam's questions completed, below 1 when it stopped early
+            "coverage": (monitor.current / monitor.total) if monitor.total else 1.0,
+            "time_limited": bool(time_budget and time_budget.stop_reason),
         }
     )
+    if stop_rule:
+        # Verdicts of the questions asked before the stop, or of the last question
+        stop_rule.update(evaluation_response_list[stop_rule.total :])
+        test_paper["early_stopping"] = stop_rule.to_dict()
+        logger.info(
+            f"Adaptive exam scored {len(evaluation_response_list)} of {test_paper.get('question_count')} "
+            f"questions, stop reason: {stop_rule.stop_reason}"
+        )
+    if judge.ensemble:
+        test_paper["judge_stats"]["ensemble"] = judge.ensemble.stats_dict()
+        logger.info(f"Judge ensemble stats: {test_paper['judge_stats']['ensemble']}")
     logger.info("Finished Evaluation！")
+    logger.info(
+        f"Judge calls avoided: {judge.stats.judge_calls_avoided:.1%} ({judge.stats.to_dict()})"
+    )
+    if verdict_cache := get_verdict_cache():
+        logger.info(f"Judge verdict cache stats: {verdict_cache.stats()}")
+    if single_flight := get_model_call_single_flight():
+        logger.info(f"Model call dedup stats: {single_flight.stats()}")
 
-    return evaluation_response_list
+    return test_paper
 
 
 @celery_app.task(bind=True, base=CeleryBaseTask)
 def record_result(self, test_paper):
     wait_for_human = test_paper.get("wait_for_human")
+
+    if test_paper.get("judge_mode") == DEFERRED_JUDGE_MODE:
+        # Score is written once `judge_deferred_responses` has judged every response
+        test_paper["result"]["status"] = RESULT_DEFERRED
+        test_paper["result"]["duration"] = test_paper.get("duration")
+        test_paper["result"]["coverage"] = get_coverage(test_paper)
+        evaluation_result_controller = ControllerContext.get_evaluation_controller()
+        evaluation_result_controller.update_data(
+            request_data=ResultData.from_dict(test_paper["result"])
+        )
+        logger.info("Responses collected, waiting for deferred judging.")
+        # A drain that ran during the exam may already have judged every response
+        finalize_deferred_result(
+            ResultRepositroy.from_config(CONFIG), test_paper["result"]["result_id"]
+        )
+        return get_exam_outcome(test_paper)
+
     evaluation_response_list = test_paper["evaluation_response_list"]
     score = compute_score(evaluation_response_list)
 
-    test_paper["result"]["evaluation_score"] = score
+    test_paper["result"]["result_score"] = score
+    test_paper["result"].update(
+        score_interval(
+            evaluation_response_list,
+            confidence=test_paper.get("early_stopping", {}).get(
+                "confidence", ADAPTIVE_EVALUATION_CONFIG.get("confidence", 0.95)
+            ),
+        )
+    )
+    if test_paper.get("duration") is not None:
+        test_paper["result"]["duration"] = test_paper["duration"]
+    # Papers finalized by deferred judging keep the coverage stored with the responses
+    if test_paper.get("coverage") is not None:
+        test_paper["result"]["coverage"] = get_coverage(test_paper)
     if wait_for_human:
         test_paper["result"]["status"] = 4
     else:
@@ -143,12 +419,152 @@ def record_result(self, test_paper):
     evaluation_result_controller.update_data(
         request_data=ResultData.from_dict(test_paper["result"])
     )
-    logger.info(f"Final Score: {score}")
+    logger.info(
+        f"Final Score: {score} [{test_paper['result']['score_lower']}, {test_paper['result']['score_upper']}] "
+        f"over {test_paper['result']['questions_used']} questions"
+    )
+    if test_paper.get("time_limited"):
+        logger.warning(
+            f"Partial score, the time budget ran out at {test_paper['result']['coverage']}% of the exam."
+        )
+    if judge_stats := test_paper.get("judge_stats"):
+        logger.info(
+            f"Judge calls avoided: {judge_stats['judge_calls_avoided']:.1%} of out-of-set responses"
+        )
+
+    return get_exam_outcome(test_paper)
+
+
+def get_coverage(test_paper: dict) -> Optional[float]:
+    """Percent of the exam's questions completed, recorded next to a partial score."""
+    coverage = test_paper.get("coverage")
+    return None if coverage is None else round(coverage * 100, 1)
+
+
+def get_exam_outcome(test_paper: dict) -> Dict:
+    """Compact outcome of one exam, the part of it a batch summary keeps."""
+    result = test_paper["result"]
+    return {
+        "result_id": result["result_id"],
+        # Papers finalized by deferred judging only carry their Result row
+        "model_id": result.get("model_id", test_paper.get("model_id")),
+        "evaluation_type": result.get(
+            "evaluation_type", test_paper.get("evaluation_type")
+        ),
+        "score": result.get("result_score"),
+        "score_interval": [result.get("score_lower"), result.get("score_upper")],
+        "questions_used": result.get("questions_used"),
+        "coverage": result.get("coverage"),
+        "time_limited": test_paper.get("time_limited", False),
+        "duration": result.get("duration"),
+        "status": result.get("status"),
+    }
+
+
+def finalize_deferred_result(repository: ResultRepositroy, result_id: int) -> bool:
+    """Score a deferred Result through `record_result` once every response is judged.
+
+    Only Results whose exam finished collecting responses are finalized. A drain
+    that judges an exam still in progress leaves it to the exam's own `record_result`.
+    """
+    result_data = repository.get_result_by_id(result_id)
+    if not result_data or result_data[0].status != RESULT_DEFERRED:
+        return False
+    if repository.count_pending_response_records(result_id) > 0:
+        return False
+    record_result.delay(
+        {
+            "result": result_data[0].__dict__,
+            "evaluation_response_list": repository.get_result_verdicts(result_id),
+        }
+    )
+    return True
+
+
+@celery_app.task(
+    bind=True,
+    name="evaluation.tasks.judge_deferred_responses",
+    base=CeleryBaseTask,
+    rate_limit=DEFERRED_JUDGE_CONFIG.get("rate_limit"),
+)
+def judge_deferred_responses(self, drain_size: Optional[int] = None) -> Dict:
+    """Drain response records collected in deferred mode and judge them in bulk.
+
+    Results whose responses are all judged are finalized through `record_result`.
+    """
+    drain_size = drain_size or DEFERRED_JUDGE_CONFIG.get("drain_size", 500)
+    repository = ResultRepositroy.from_config(CONFIG)
+    max_retry = JUDGE_CONFIG.get("max_retry", 3)
+    batch_size = DEFERRED_JUDGE_CONFIG.get("batch_size", 20)
+    judge = AnswerJudge(
+        api_endpoint=JUDGE_CONFIG.get("api_endpoint"),
+        max_retry=max_retry,
+        batch_size=batch_size,
+        verdict_cache=get_verdict_cache(),
+        ensemble=JudgeEnsemble.from_config(
+            JUDGE_CONFIG.get("ensemble", {}),
+            max_retry=max_retry,
+            batch_size=batch_size,
+            verdict_cache=get_verdict_cache(),
+        ),
+    )
+
+    pending_records = repository.get_pending_response_records(limit=drain_size)
+    logger.info(f"Judging {len(pending_records)} deferred responses...")
+
+    # (result_record_id, evaluation_response, judge_details)
+    verdicts: List[Tuple[int, str, Optional[str]]] = []
+    ambiguous_records = []
+    for record in pending_records:
+        evaluation_response = judge.resolve_locally(
+            model_response=record["model_response"], **get_answer_key(record)
+        )
+        if evaluation_response is None:
+            ambiguous_records.append(record)
+        else:
+            verdicts.append((record["result_record_id"], evaluation_response, None))
+
+    judge_details: List[Optional[Dict]] = []
+    judged_responses = do_evaluate_batch(
+        [(record, record["model_response"]) for record in ambiguous_records],
+        test_paper={},
+        judge=judge,
+        judge_details=judge_details,
+    )
+    for record, evaluation_response, details in zip(
+        ambiguous_records, judged_responses, judge_details
+    ):
+        # Leave failed judge calls pending so the next drain retries them
+        if evaluation_response in JUDGE_VERDICTS:
+            verdicts.append(
+                (
+                    record["result_record_id"],
+                    evaluation_response,
+                    json.dumps(details) if details else None,
+                )
+            )
 
-    return {"result_id": test_paper["result"]["result_id"]}
+    repository.update_response_verdicts(verdicts)
+
+    finalized_result_ids = [
+        result_id
+        for result_id in sorted({record["result_id"] for record in pending_records})
+        if finalize_deferred_result(repository, result_id)
+    ]
+
+    logger.info(
+        f"Deferred judging stored {len(verdicts)} verdicts, finalized results: {finalized_result_ids}"
+    )
+    return {
+        "judged": len(verdicts),
+        "finalized_result_ids": finalized_result_ids,
+        "judge_stats": judge.stats.to_dict(),
+    }
 
 
 def compute_score(content_list: list, correct_str="Correct"):
+    if not content_list:
+        return 0
     correct_count = 0
     for content in content_list:
         if content == correct_str:
@@ -157,108 +573,348 @@ def compute_score(content_list: list, correct_str="Correct"):
 
 
 def call_model(each_question: dict, model_endpoint: str):
-    question = each_question["question_content"]
-
-    if each_question["groundtruth_type"] == "Classification":
-        ex_ans = list(eval(each_question["groundtruth_set"]))[0]
-        question_prefix = "Please answer the following **single-choice question**, \
-                           and strictly adhere to the [Response Format]:\nQuestion: "
-        question_postfix = f"\n[Response Format]\nYour response must be one of the \
-                           options in the following set, and the answer text must \
-                           match the option exactly. For example, answer: {ex_ans}. \
-                           Do not generate any extra symbols. Do not generate any extra characters."
-        question = question_prefix + question + question_postfix
-
-    elif each_question["groundtruth_type"] == "MultipleChoice":
-        tmp = list(eval(each_question["groundtruth_type"]))
-        ex_ans = tmp[0] + "/" + tmp[1]
-        question_prefix = "Please answer the following **multiple-choice question**, \
-                           and strictly adhere to the [Response Format]:\nQuestion: "
-        question_postfix = f'\n[Response Format]\nYour response must be one or more \
-                            options from the following set, with each selected option \
-                            separated by a "/". The answer text must match the options \
-                            exactly. For example, answer: {ex_ans}. Do not generate any \
-                            extra symbols. Do not generate any extra characters.'
-        question = question_prefix + question + question_postfix
-
-    response = requests.post(
+    # Questions from `get_question_dataset` carry the prompt rendered at preparation
+    question = each_question.get("prompt") or prepare_question(each_question)["prompt"]
+
+    # Overlapping exams on the same endpoint wait for one call instead of repeating it
+    if single_flight := get_model_call_single_flight():
+        return single_flight.do(
+            model_endpoint, question, lambda: request_model(model_endpoint, question)
+        )
+    return request_model(model_endpoint, question)
+
+
+def request_model(model_endpoint: str, question: str):
+    response = get_http_session().post(
         model_endpoint,
         json={"input": question},
+        timeout=REQUEST_TIMEOUT,
     )
     return response.json()["output"]
 
 
+def get_answer_key(each_question: dict) -> dict:
+    groundtruth_options = each_question.get("groundtruth_options")
+    if groundtruth_options is None:
+        groundtruth_options = parse_groundtruth_set(each_question["groundtruth_set"])
+
+    return {
+        "groundtruth_content": each_question["groundtruth_content"],
+        "groundtruth_type": each_question["groundtruth_type"],
+        "groundtruth_set": groundtruth_options,
+    }
+
+
 def do_evaluate(
-    each_question: dict, model_response: str, test_paper: dict, max_retry=3
+    each_question: dict,
+    model_response: str,
+    test_paper: dict,
+    max_retry=3,
+    judge: Optional[AnswerJudge] = None,
+    judge_details: Optional[List[Dict]] = None,
 ):
+    """Verdict of one answer. With a judge ensemble (`judge_config.ensemble`) the
+    judges are asked concurrently and the details of their vote are appended to
+    `judge_details`, for `ResultRecord.judge_details`.
+    """
+    try:
+        judge = judge or AnswerJudge.from_test_paper(test_paper, max_retry)
+        return judge.evaluate(
+            model_response=model_response,
+            judge_details=judge_details,
+            **get_answer_key(each_question),
+        )
+    except Exception as e:
+        logger.error(f"Error in do_evaluate: {e}")
+        return ""
+
+
+def do_evaluate_batch(
+    questions_and_responses: List[Tuple[dict, str]],
+    test_paper: dict,
+    judge: Optional[AnswerJudge] = None,
+    judge_details: Optional[List[Optional[Dict]]] = None,
+) -> List[str]:
+    """Send answers the rules could not decide to the judge, `batch_size` per request.
+
+    `judge_details` receives one entry per answer, None without a judge ensemble.
+    """
+    details: List[Dict] = []
     try:
-        groundtruth_set = eval(each_question["groundtruth_set"])
-        groundtruth_content = each_question["groundtruth_content"]
-        if model_response not in groundtruth_set:
-            api_client = OpenAIClient(
-                api_endpoint=test_paper["evaluation_model_endpoint"]
+        judge = judge or AnswerJudge.from_test_paper(test_paper)
+        evaluation_responses = judge.judge_many(
+            [
+                (model_response, each_question["groundtruth_content"])
+                for each_question, model_response in questions_and_responses
+            ],
+            judge_details=details,
+        )
+    except Exception as e:
+        logger.error(f"Error in do_evaluate_batch: {e}")
+        evaluation_responses = [""] * len(questions_and_responses)
+
+    if judge_details is not None:
+        if len(details) != len(evaluation_responses):
+            details = [None] * len(evaluation_responses)
+        judge_details.extend(details)
+    return evaluation_responses
+
+
+def save_evaluation_response(
+    response_record_controller: BasicController,
+    response_record: ResultRecordData,
+    evaluation_response: str,
+    judge_details: Optional[Dict] = None,
+) -> None:
+    response_record.evaluation_response = evaluation_response
+    if judge_details:
+        response_record.judge_details = json.dumps(judge_details)
+    response_record.status = RESPONSE_JUDGED
+    response_record_controller.update_data(request_data=response_record)
+
+
+def defer_evaluation_response(
+    response_record_controller: BasicController,
+    response_record: ResultRecordData,
+) -> None:
+    response_record.status = RESPONSE_DEFERRED  # 等待離線評分
+    response_record_controller.update_data(request_data=response_record)
+
+
+def judge_pending_responses(
+    pending_judgement: List[Tuple[ResultRecordData, dict, str]],
+    test_paper: dict,
+    judge: AnswerJudge,
+    response_record_controller: BasicController,
+) -> List[str]:
+    judge_details: List[Optional[Dict]] = []
+    evaluation_responses = do_evaluate_batch(
+        [
+            (each_question, model_response)
+            for _, each_question, model_response in pending_judgement
+        ],
+        test_paper=test_paper,
+        judge=judge,
+        judge_details=judge_details,
+    )
+    for (response_record, _, _), evaluation_response, details in zip(
+        pending_judgement, evaluation_responses, judge_details
+    ):
+        save_evaluation_response(
+            response_record_controller,
+            response_record,
+            evaluation_response,
+            judge_details=details,
+        )
+    return evaluation_responses
+
+
+def iter_until_stopped(
+    questions: Iterator[dict],
+    evaluation_response_list: List[str],
+    monitor: ProgressMonitor,
+    stop_rule: Optional[EarlyStopRule] = None,
+    time_budget: Optional[TimeBudget] = None,
+) -> Iterator[dict]:
+    """Hand out questions until the stop rule is met or the time budget runs out."""
+    handed_out = 0
+    for each_question in questions:
+        if stop_rule and stop_rule.update(evaluation_response_list[stop_rule.total :]):
+            return
+        # Questions handed out but not completed yet are still in the stages
+        if time_budget and not time_budget.allows_next(
+            monitor.current, in_flight=handed_out - monitor.current
+        ):
+            logger.warning(
+                f"Time budget of {time_budget.seconds}s reached after {monitor.current} questions."
             )
+            return
+        handed_out += 1
+        yield each_question
+
+
+def iter_unpaused(questions: Iterator[dict], pause_controller: PauseController):
+    """Hand out the next question only while the task is not paused."""
+    for each_question in questions:
+        with pause_controller.pause_check():
+            yield each_question
+
+
+@dataclass
+class QuestionWork:
+    """One question on its way through the stages of `StagedEvaluation`."""
+
+    question: dict
+    response_record: Optional[ResultRecordData] = None
+    model_response: Optional[str] = None
+    evaluation_response: Optional[str] = None
+    judge_details: Optional[Dict] = None
+    finished: bool = False  # judged or deferred by a previous delivery
+
+
+class StagedEvaluation:
+    """The ask, judge and persist stages of one exam, for a `StagedPipeline`.
+
+    The model response is still written by the ask stage, it is the checkpoint a
+    redelivered task resumes from. Stage threads keep their own sqlite3 connection
+    and their own `AnswerJudge`, whose statistics are merged once the exam is done.
+    """
 
-            input_text = (
-                f"RESPOND ONLY 'Correct' or 'Incorrect'."
-                f"Compare if the text content SEMANTICALLY contains or indicates the same answer as the correct answer,"
-                f"even if expressed differently or with additional explanation."
-                f"\n[Text Content]: {model_response}"
-                f"\n[Correct Answer]: {groundtruth_content}"
-                f"\nIf the text clearly indicates or concludes with the same answer, respond 'Correct', "
-                f"even if it includes additional explanation or reasoning."
+    def __init__(self, test_paper: dict, checkpoints: dict, deferred_judging: bool):
+        self.test_paper = test_paper
+        self.checkpoints = checkpoints
+        self.deferred_judging = deferred_judging
+        self.result_id = test_paper["result"]["result_id"]
+        self.worker_judges: List[AnswerJudge] = []
+        self._worker_state = threading.local()
+
+    def build_pipeline(self, judge_batch_size: int = 1) -> StagedPipeline:
+        workers = STAGED_PIPELINE_CONFIG.get("workers", {})
+        return StagedPipeline(
+            [
+                PipelineStage("ask", self.ask, workers.get("ask", 4)),
+                PipelineStage(
+                    "judge",
+                    self.judge,
+                    workers.get("judge", 2),
+                    batch_size=judge_batch_size,
+                ),
+                PipelineStage("persist", self.persist, workers.get("persist", 1)),
+            ],
+            queue_size=STAGED_PIPELINE_CONFIG.get("queue_size", 8),
+        )
+
+    def get_response_controller(self) -> BasicController:
+        if not hasattr(self._worker_state, "response_controller"):
+            self._worker_state.response_controller = (
+                ControllerContext.get_response_controller()
+            )
+        return self._worker_state.response_controller
+
+    def get_judge(self) -> AnswerJudge:
+        if not hasattr(self._worker_state, "judge"):
+            self._worker_state.judge = AnswerJudge.from_test_paper(self.test_paper)
+            self.worker_judges.append(self._worker_state.judge)
+        return self._worker_state.judge
+
+    def ask(self, each_question: dict) -> QuestionWork:
+        work = QuestionWork(question=each_question)
+        response_record = self.checkpoints.get(each_question["question_id"])
+
+        if response_record and response_record.status != RESPONSE_IN_PROGRESS:
+            work.response_record = response_record
+            work.finished = True
+            if response_record.status == RESPONSE_JUDGED:
+                work.evaluation_response = response_record.evaluation_response
+            return work
+
+        if response_record is None:
+            response_record = create_response_record(
+                self.result_id, each_question["question_id"]
+            )
+        if response_record.model_response is None:
+            response_record.model_response = call_model(
+                each_question=each_question,
+                model_endpoint=self.test_paper["model_endpoint"],
+            )
+            self.get_response_controller().update_data(request_data=response_record)
+
+        work.response_record = response_record
+        work.model_response = response_record.model_response
+        return work
+
+    def judge(self, works: List[QuestionWork]) -> List[QuestionWork]:
+        """Rules first, then one judge request for the ambiguous answers of the batch."""
+        if self.deferred_judging:
+            return works
+
+        judge = self.get_judge()
+        ambiguous_works = []
+        for work in works:
+            if work.finished:
+                continue
+            work.evaluation_response = judge.resolve_locally(
+                model_response=work.model_response, **get_answer_key(work.question)
+            )
+            if work.evaluation_response is None:
+                ambiguous_works.append(work)
+
+        if ambiguous_works:
+            judge_details: List[Optional[Dict]] = []
+            evaluation_responses = do_evaluate_batch(
+                [(work.question, work.model_response) for work in ambiguous_works],
+                test_paper=self.test_paper,
+                judge=judge,
+                judge_details=judge_details,
+            )
+            for work, evaluation_response, details in zip(
+                ambiguous_works, evaluation_responses, judge_details
+            ):
+                work.evaluation_response = evaluation_response
+                work.judge_details = details
+        return works
+
+    def persist(self, work: QuestionWork) -> QuestionWork:
+        if work.finished:
+            return work
+        if self.deferred_judging:
+            defer_evaluation_response(
+                self.get_response_controller(), work.response_record
             )
-            call_count = 0
-            evaluate_response = None
-            while call_count < max_retry and evaluate_response not in {
-                "Correct",
-                "Incorrect",
-            }:
-                evaluate_response = api_client.do_request(
-                    input_text=input_text,
-                    model_name="gpt-4o",
-                )
         else:
-            evaluate_response = (
-                "Correct" if model_response == groundtruth_content else "Incorrect"
+            save_evaluation_response(
+                self.get_response_controller(),
+                work.response_record,
+                work.evaluation_response,
+                judge_details=work.judge_details,
             )
-        return evaluate_response
-    except Exception as e:
-        logger.error(f"Error in do_evaluate: {e}")
-        return ""
+        return work
+
+
+def build_exam_chain(test_paper: dict) -> chain:
+    """Health check, questions, evaluation and score of one exam."""
+    return chain(
+        check_health.si(),
+        get_question_dataset.si(test_paper),
+        evaluation_pipeline.s(),
+        record_result.s(),
+    )
 
 
 @celery_app.task(bind=True, base=CeleryBaseTask)
 def start_evaluation_tasks(
-    self, test_papers: List[dict], sync: Optional[bool] = False
-) -> Dict:
+    self,
+    test_papers: List[dict],
+    sync: Optional[bool] = False,
+    fan_out: Optional[bool] = None,
+) -> Union[List[Dict], Dict]:
+    """Dispatch one chain per exam, or with `sync` one chain running them in order.
+
+    In `sync` mode exam N+1 only starts after the score of exam N is recorded,
+    and a failing exam stops the exams queued after it. With `fan_out` (default
+    from `evaluation_dispatch`) the exams run as one chord, see `dispatch_exam_batch`.
+    """
+    if fan_out is None:
+        fan_out = EVALUATION_DISPATCH_CONFIG.get("fan_out", False)
+
     results = []
-    task_sequence = []  # for single task
+    exam_chains = []
     for test_paper in test_papers:
         try:
             logger.info(f"Starting evaluation for model {test_paper['model_id']}")
             test_paper.update(
-                {
-                    "evaluation_model_endpoint": "https://api.openai.com/v1/chat/completions"
-                }
+                {"evaluation_model_endpoint": JUDGE_CONFIG.get("api_endpoint")}
             )
 
             create_evaluation_result(test_paper["result"])
-            if not sync:  # default use asynchronize
-                evaluation_chain = chain(
-                    check_health.si(),
-                    get_question_dataset.si(test_paper),
-                    evaluation_pipeline.s(),
-                    record_result.s(),
-                )
-                results.append(
-                    {"Categories": test_paper, "chain_result": evaluation_chain()}
-                )
+            evaluation_chain = build_exam_chain(test_paper)
+            if not (sync or fan_out):  # default use asynchronize
+                chain_result = evaluation_chain()
             else:
-                task = process_single_exam.signature(test_paper, immutable=True)
-                task_sequence.append(task)
-                if task_sequence:
-                    chain(task_sequence)()
+                # Task IDs are fixed now, the status page follows each exam on its own
+                chain_result = evaluation_chain.freeze()
+                exam_chains.append(evaluation_chain)
+            results.append({"Categories": test_paper, "chain_result": chain_result})
 
         except Exception as e:
             logger.error(f"Evaluation process failed: {str(e)}")
@@ -274,29 +930,285 @@ def start_evaluation_tasks(
                 }
             )
 
+    if exam_chains and sync:
+        # The immutable first tasks ignore the score handed over by the exam before
+        chain(*exam_chains).apply_async()
+    elif exam_chains:
+        return dispatch_exam_batch(exam_chains, results)
+
     return results
 
 
+def dispatch_exam_batch(exam_chains: List[chain], results: List[Dict]) -> Dict:
+    """Run every exam in parallel as one chord, `summarize_exam_batch` is its callback.
+
+    Only plain task IDs are returned, the status page reads the summary with one
+    backend lookup once the batch is done and never has to walk result parents.
+    When an exam fails, the errback `record_failed_exam_batch` writes the summary.
+    """
+    failed = [result for result in results if result.get("status") == "error"]
+    exams = [
+        {
+            "Categories": {
+                key: result["Categories"][key]
+                for key in ("model_id", "evaluation_type")
+            },
+            "task_ids": extract_chain_ids(result["chain_result"]),
+        }
+        for result in results
+        if "chain_result" in result
+    ]
+    summary = summarize_exam_batch.s(failed=failed)
+    summary_task_id = summary.freeze().id
+    summary.on_error(
+        record_failed_exam_batch.s(exams=exams, failed=failed).set(
+            task_id=get_batch_failure_task_id(summary_task_id)
+        )
+    )
+    chord(exam_chains)(summary)
+    return {"summary_task_id": summary_task_id, "exams": exams, "failed": failed}
+
+
+def build_batch_summary(exam_outcomes: List[Dict], failed: List[Dict]) -> Dict:
+    """One compact result for a whole batch of exams."""
+    scores = [
+        outcome["score"] for outcome in exam_outcomes if outcome["score"] is not None
+    ]
+    return {
+        "exams": exam_outcomes,
+        "failed": failed,
+        "total_exams": len(exam_outcomes) + len(failed),
+        "mean_score": sum(scores) / len(scores) if scores else None,
+        "longest_duration": max(
+            (outcome["duration"] or 0 for outcome in exam_outcomes), default=0
+        ),
+    }
+
+
+@celery_app.task(
+    bind=True, name="evaluation.tasks.summarize_exam_batch", base=CeleryBaseTask
+)
+def summarize_exam_batch(
+    self, exam_outcomes: List[Dict], failed: Optional[List[Dict]] = None
+) -> Dict:
+    """Chord callback, one compact result for the whole batch of exams."""
+    summary = build_batch_summary(exam_outcomes, failed or [])
+    logger.info(
+        f"Exam batch finished: {len(exam_outcomes)} exams, mean score {summary['mean_score']}"
+    )
+    return summary
+
+
+@celery_app.task(
+    bind=True, name="evaluation.tasks.record_failed_exam_batch", base=CeleryBaseTask
+)
+def record_failed_exam_batch(
+    self,
+    summary_task_id: str,
+    *,
+    exams: List[Dict],
+    failed: Optional[List[Dict]] = None,
+) -> Dict:
+    """Chord errback, the batch summary when one of its exams failed.
+
+    Exams that finished keep their `record_result` outcome, the others are listed
+    as failed with the error of the task they stopped at. `exams` is keyword-only,
+    so Celery sends this errback as a task with the failed summary task ID and
+    stores its result under the ID `get_batch_failure_task_id` gives.
+    """
+    exam_outcomes, failed = [], list(failed or [])
+    for exam in exams:
+        chain_results = [celery_app.AsyncResult(tid) for tid in exam["task_ids"]]
+        if chain_results[0].successful():
+            exam_outcomes.append(chain_results[0].result)
+            continue
+        error = next(
+            (str(result.result) for result in chain_results if result.failed()),
+            chain_results[0].state,
+        )
+        failed.append(
+            {
+                "status": "error",
+                "model_id": exam["Categories"]["model_id"],
+                "evaluation_type": exam["Categories"]["evaluation_type"],
+                "error": error,
+            }
+        )
+
+    summary = build_batch_summary(exam_outcomes, failed)
+    logger.error(
+        f"Exam batch {summary_task_id} failed: {len(failed)} of {summary['total_exams']} exams"
+    )
+    return summary
+
+
 @celery_app.task(bind=True, base=CeleryBaseTask)
-def process_single_exam(self, test_paper) -> Dict:
+def start_batch_evaluation(
+    self, test_papers: List[dict], max_concurrency: Optional[int] = None
+) -> Dict:
+    """Evaluate several models on the same exams, preparing each question set once.
+
+    `test_papers` holds one paper per model and exam, see
+    `EvaluationController.prepare_batch_exam`. The API health check and the
+    question sets run once for the whole batch, then `dispatch_prepared_exams`
+    hands the prepared questions to every model.
     """
-    Deal Single exam task
+    exams: Dict[Tuple, dict] = {}
+    batch_papers, failed = [], []
+    for test_paper in test_papers:
+        try:
+            test_paper.update(
+                {"evaluation_model_endpoint": JUDGE_CONFIG.get("api_endpoint")}
+            )
+            create_evaluation_result(test_paper["result"])
+        except Exception as e:
+            logger.error(f"Evaluation process failed: {str(e)}")
+            failed.append(
+                {"status": "error", "model_id": test_paper["model_id"], "error": str(e)}
+            )
+            continue
+
+        exam = exams.setdefault(
+            get_exam_key(test_paper),
+            {
+                "evaluation_type": test_paper["evaluation_type"],
+                "version": test_paper["version"],
+                "sampling": test_paper.get("sampling", {}),
+                "index": len(exams),
+                "task_id": uuid(),
+            },
+        )
+        # Fixed up front, the status page follows the tasks before they are sent
+        test_paper.update(
+            {
+                "exam_index": exam["index"],
+                "task_ids": {"evaluation_pipeline": uuid(), "record_result": uuid()},
+            }
+        )
+        batch_papers.append(test_paper)
+
+    health_id = uuid()
+    if batch_papers:
+        chain(
+            check_health.si().set(task_id=health_id),
+            chord(
+                [
+                    prepare_question_set.si(exam).set(task_id=exam["task_id"])
+                    for exam in exams.values()
+                ],
+                dispatch_prepared_exams.s(batch_papers, max_concurrency),
+            ),
+        ).apply_async()
+        logger.info(
+            f"Batch of {len(batch_papers)} exams: {len(exams)} question sets prepared once."
+        )
+
+    exam_task_ids = [exam["task_id"] for exam in exams.values()]
+    return {
+        "exams": [
+            {
+                "Categories": {
+                    "model_id": test_paper["model_id"],
+                    "evaluation_type": test_paper["evaluation_type"],
+                },
+                # Newest first, like `extract_chain_ids`
+                "task_ids": [
+                    test_paper["task_ids"]["record_result"],
+                    test_paper["task_ids"]["evaluation_pipeline"],
+                    exam_task_ids[test_paper["exam_index"]],
+                    health_id,
+                ],
+            }
+            for test_paper in batch_papers
+        ],
+        "failed": failed,
+    }
+
+
+def get_exam_key(test_paper: dict) -> Tuple:
+    """Papers with the same key share one prepared question set."""
+    return (
+        test_paper["evaluation_type"],
+        test_paper["version"],
+        *sorted(test_paper.get("sampling", {}).items()),
+    )
+
+
+@celery_app.task(
+    bind=True, name="evaluation.tasks.prepare_question_set", base=CeleryBaseTask
+)
+@with_progress("prepare_question_set")
+def prepare_question_set(self, exam: dict) -> Dict:
+    logger.info(f"Prepare the {exam['evaluation_type']} question set for a batch.")
+    return get_question_set(exam)
+
+
+@celery_app.task(
+    bind=True, name="evaluation.tasks.dispatch_prepared_exams", base=CeleryBaseTask
+)
+def dispatch_prepared_exams(
+    self,
+    question_sets: List[Dict],
+    test_papers: List[dict],
+    max_concurrency: Optional[int] = None,
+) -> int:
+    """Chord callback, start every model on its exams with the prepared questions.
+
+    A model runs at most `max_concurrency` of its exams at a time: its exams are
+    split over that many chains, and the chains of all models run in parallel.
     """
-    try:
-        check_health(test_paper["model_endpoint"])
+    evaluation_result_controller = ControllerContext.get_evaluation_controller()
+    exams_by_model: Dict[int, List[chain]] = {}
+    concurrency_by_model: Dict[int, int] = {}
+    for test_paper in map(dict, test_papers):
+        question_set = question_sets[test_paper.pop("exam_index")]
+        test_paper["result"]["question_version_id"] = question_set[
+            "question_version_id"
+        ]
+        evaluation_result_controller.update_data(
+            request_data=ResultData.from_dict(test_paper["result"])
+        )
+        test_paper.update(question_set)
 
-        dataset = get_question_dataset(test_paper)
-        if not dataset:
-            raise Exception("Failed to get question dataset")
+        task_ids = test_paper.pop("task_ids")
+        exams_by_model.setdefault(test_paper["model_id"], []).append(
+            chain(
+                evaluation_pipeline.si(test_paper).set(
+                    task_id=task_ids["evaluation_pipeline"]
+                ),
+                record_result.s().set(task_id=task_ids["record_result"]),
+            )
+        )
+        concurrency_by_model[test_paper["model_id"]] = (
+            test_paper.get("max_concurrency")
+            or max_concurrency
+            or BATCH_EVALUATION_CONFIG.get("max_concurrency", 1)
+        )
 
-        eval_result = evaluation_pipeline(dataset, test_paper)
+    lanes = []
+    for model_id, model_exams in exams_by_model.items():
+        lane_count = max(1, min(concurrency_by_model[model_id], len(model_exams)))
+        # The immutable pipelines ignore the score of the exam before them
+        lanes.extend(
+            chain(*model_exams[lane::lane_count]) for lane in range(lane_count)
+        )
+    group(lanes).apply_async()
 
-        return {
-            "status": "success",
-            "Categories": test_paper,
-            "chain_result": eval_result,
-        }
+    logger.info(
+        f"Dispatched {len(test_papers)} exams of {len(exams_by_model)} models in {len(lanes)} chains."
+    )
+    return len(lanes)
 
-    except Exception as e:
-        logger.error(f"Exam processing failed: {str(e)}")
-        raise
+
+@celery_app.task(bind=True, name="evaluation.tasks.prune_task_results")
+def prune_task_results(self) -> Dict:
+    """Scheduled clean-up of old task results and task chains, see `result_retention`."""
+    report = run_retention(
+        RESULT_RETENTION_CONFIG,
+        backend_url=self.app.conf.result_backend,
+        table_names=self.app.conf.database_table_names,
+    )
+    logger.info(
+        f"Result retention reclaimed {report['reclaimed_bytes']} bytes: {report}"
+    )
+    return report
@@ -0,0 +1,50 @@
+import os
+import sys
+from typing import Dict, List
+
+from kombu import Queue
+
+from src.utils.load_yaml import yaml_data as CONFIG
+
+WORKER_QUEUES: Dict[str, dict] = CONFIG.get("worker_queues", {})
+
+
+def build_task_routes(worker_queues: Dict[str, dict] = WORKER_QUEUES) -> Dict:
+    """Route every task listed under a queue in `worker_queues` to that queue."""
+    return {
+        task_name: {"queue": queue_name}
+        for queue_name, profile in worker_queues.items()
+        for task_name in profile.get("tasks", [])
+    }
+
+
+def build_task_queues(worker_queues: Dict[str, dict] = WORKER_QUEUES) -> List[Queue]:
+    # A worker started without -Q consumes every queue declared here
+    return [Queue(queue_name) for queue_name in worker_queues]
+
+
+def build_worker_argv(queue_name: str) -> List[str]:
+    """`celery worker` command line of the worker dedicated to one queue."""
+    profile = WORKER_QUEUES[queue_name]
+    argv = [
+        "celery",
+        "-A",
+        "app_run.celery_app",
+        "worker",
+        "-Q",
+        queue_name,
+        "-n",
+        f"{queue_name}@%h",
+        f"--concurrency={profile.get('concurrency', 1)}",
+        f"--prefetch-multiplier={profile.get('prefetch_multiplier', 1)}",
+        "--loglevel=info",
+    ]
+    if profile.get("pool"):
+        argv.append(f"--pool={profile['pool']}")
+    return argv
+
+
+if __name__ == "__main__":
+    # python -m src.celeryflow.worker_profiles <queue> [extra celery options]
+    worker_argv = build_worker_argv(sys.argv[1]) + sys.argv[2:]
+    os.execvp(worker_argv[0], worker_argv)
@@ -0,0 +1,149 @@
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Type
+
+from src.models.repository import (
+    STREAM_CHUNK_SIZE,
+    BaseRepository,
+    ReportsRepository,
+    ResultRepositroy,
+    SimplifiedRepository,
+)
+from src.utils.load_yaml import yaml_data as CONFIG
+
+ASYNC_REPOSITORY_CONFIG = CONFIG.get("async_repository", {})
+
+# Shared by every async repository, as many threads as requests hypercorn runs at
+# once (the default executor of its event loop) unless configured otherwise
+_executor = None
+_executor_lock = threading.Lock()
+# sqlite3 connections must stay on the thread that opened them, so every executor
+# thread keeps its own repositories
+_local = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=ASYNC_REPOSITORY_CONFIG.get("max_workers")
+                or min(32, (os.cpu_count() or 1) + 4),
+                thread_name_prefix="async-repository",
+            )
+        return _executor
+
+
+class AsyncRepository:
+    """Awaitable facade with the same API as the wrapped sqlite3 repository.
+
+    Every call runs on a thread of the shared executor, so coroutines await
+    database reads instead of blocking the event loop, and concurrent requests
+    read in parallel. Generator methods (`iter_*`) become async generators
+    fetching `STREAM_CHUNK_SIZE` rows per hop.
+    """
+
+    repository_class: Type[BaseRepository] = SimplifiedRepository
+
+    def __init__(self, config: dict):
+        self.config = config
+        self._executor = _get_executor()
+        self._metadata: dict = {}
+
+    @classmethod
+    def from_config(cls, config: dict, **kwargs):
+        return cls(config)
+
+    @property
+    def _repository_key(self) -> str:
+        return f"{self.repository_class.__name__}:{id(self.config)}"
+
+    def _get_repository(self) -> BaseRepository:
+        # Runs on an executor thread, its connection is reused by the thread's later calls
+        repositories: Dict[str, BaseRepository] = _local.__dict__.setdefault(
+            "repositories", {}
+        )
+        if self._repository_key not in repositories:
+            repositories[self._repository_key] = self.repository_class.from_config(
+                self.config
+            )
+        return repositories[self._repository_key]
+
+    def _call(self, name: str, *args, **kwargs) -> Any:
+        repository = self._get_repository()
+        try:
+            return getattr(repository, name)(*args, **kwargs)
+        finally:
+            self._metadata = repository.metadata
+
+    async def _run(
+        self,
+        func: Callable,
+        *args,
+        executor: Optional[ThreadPoolExecutor] = None,
+        **kwargs,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor or self._executor, partial(func, *args, **kwargs)
+        )
+
+    @property
+    def metadata(self) -> dict:
+        """Last operation run through this facade, read it right after an await."""
+        return self._metadata
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.repository_class, name)
+        if not callable(attribute):
+            raise AttributeError(name)
+
+        if inspect.isgeneratorfunction(attribute):
+            return partial(self._iterate, name)
+
+        async def method(*args, **kwargs):
+            return await self._run(self._call, name, *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
+    async def _iterate(self, name: str, *args, **kwargs) -> AsyncIterator[Any]:
+        # The generator's cursor cannot move between threads of the shared executor,
+        # so one iteration keeps a thread (and connection) of its own
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="async-repository-iter"
+        )
+        try:
+            generator = await self._run(
+                self._call, name, *args, executor=executor, **kwargs
+            )
+            try:
+                while rows := await self._run(
+                    lambda: list(islice(generator, STREAM_CHUNK_SIZE)),
+                    executor=executor,
+                ):
+                    for row in rows:
+                        yield row
+            finally:
+                await self._run(generator.close, executor=executor)
+        finally:
+            # Its repository lives in the thread, closed along with it
+            executor.shutdown(wait=False)
+
+
+class AsyncSimplifiedRepository(AsyncRepository):
+    repository_class = SimplifiedRepository
+
+
+class AsyncResultRepositroy(AsyncRepository):
+    repository_class = ResultRepositroy
+
+
+class AsyncReportsRepository(AsyncRepository):
+    repository_class = ReportsRepository
@@ -1,14 +1,17 @@
-from typing import Any, List
+from typing import Any, Iterator, List, Optional, Union
 
 import pandas as pd
 from flask import Request
 
+from src.models.async_repository import AsyncReportsRepository
 from src.models.db_schema import BaseSchema, PersonData
 from src.models.repository import (
+    STREAM_CHUNK_SIZE,
     ReportsRepository,
     ResultRepositroy,
     SimplifiedRepository,
 )
+from src.models.row_batch import ColumnarBatch
 from src.utils.data_handler import BaseHandler, RequestHandler
 from src.utils.load_yaml import yaml_data as CONFIG
 from src.utils.logger import logger
@@ -34,9 +37,11 @@ class BasicController:
         return self.repository.delete(db_schema)
 
     @staticmethod
-    def get_all_data(db_schema: BaseSchema) -> List[BaseSchema]:
+    def get_all_data(
+        db_schema: BaseSchema, columnar: bool = False
+    ) -> Union[List[BaseSchema], ColumnarBatch]:
         repository = SimplifiedRepository.from_config(CONFIG)
-        return repository.select_all(db_schema)
+        return repository.select_all(db_schema, columnar=columnar)
 
 
 class EvaluationController(BasicController):
@@ -66,9 +71,7 @@ class EvaluationController(BasicController):
 
         db_schema = request_handler.process_data(request_data)
 
-        all_db_data = self.repository.select_all(db_schema)
-
-        for db_data in all_db_data:
+        for db_data in self.repository.iter_all(db_schema):
             if db_data.user_id == db_schema.user_id:
                 return True
         return False
@@ -80,9 +83,7 @@ class EvaluationController(BasicController):
 
         db_schema = request_handler.process_data(request_data)
 
-        all_db_data = self.repository.select_all(db_schema)
-
-        for db_data in all_db_data:
+        for db_data in self.repository.iter_all(db_schema):
             if (
                 db_data.user_id == db_schema.user_id
                 and db_data.password == db_schema.password
@@ -107,12 +108,59 @@ class EvaluationController(BasicController):
         return question_version_id
 
     def get_question(
-        self, question_version_id: int, question_category: str
-    ) -> List[BaseSchema]:
-        all_questions = self.repository.get_question(
-            question_version_id, question_category
+        self,
+        question_version_id: int,
+        question_category: str,
+        sample_size: Optional[int] = EXPERIMENT_DATA_LENGTH,
+        sampling: str = "first",
+        seed: int = 0,
+        offset: int = 0,
+        columnar: bool = False,
+    ) -> Union[List[BaseSchema], ColumnarBatch]:
+        return self.repository.get_question(
+            question_version_id,
+            question_category,
+            sample_size=sample_size,
+            sampling=sampling,
+            seed=seed,
+            offset=offset,
+            columnar=columnar,
+        )
+
+    def iter_question(
+        self,
+        question_version_id: int,
+        question_category: str,
+        sample_size: Optional[int] = EXPERIMENT_DATA_LENGTH,
+        sampling: str = "first",
+        seed: int = 0,
+        offset: int = 0,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[BaseSchema]:
+        return self.repository.iter_question(
+            question_version_id,
+            question_category,
+            sample_size=sample_size,
+            sampling=sampling,
+            seed=seed,
+            offset=offset,
+            chunk_size=chunk_size,
+        )
+
+    def count_question(
+        self,
+        question_version_id: int,
+        question_category: str,
+        sample_size: Optional[int] = EXPERIMENT_DATA_LENGTH,
+        offset: int = 0,
+        **kwargs,
+    ) -> int:
+        return self.repository.count_question(
+            question_version_id,
+            question_category,
+            sample_size=sample_size,
+            offset=offset,
         )
-        return all_questions[:EXPERIMENT_DATA_LENGTH]
 
     def get_evaluation_version(self):
         return self.repository.get_evaluation_version()
@@ -122,30 +170,98 @@ class EvaluationController(BasicController):
         try:
             json_data = request_data.get_json()
             for each_exam in json_data["exam_info"]:
-                evaluation_result = {
-                    "model_id": json_data["model_id"],
-                    "user_id": session["user_basic_info"]["user_id"],
-                    "question_version_id": "TBD",
-                    "evaluation_type": each_exam["topic"],
-                    "status": 3,  # 評測正在進行中
-                }
-
                 test_papers.append(
-                    {
-                        "result": evaluation_result,
-                        "evaluation_type": each_exam["topic"],
-                        "version": each_exam["version"],
-                        "model_id": json_data["model_id"],
-                        "model_name": json_data["model_name"],
-                        "model_version": json_data["model_version"],
-                        "model_endpoint": json_data["model_endpoint"],
-                    }
+                    build_test_paper(
+                        json_data, each_exam, session["user_basic_info"]["user_id"]
+                    )
                 )
         except Exception as e:
             logger.error(f"Prepare Exam Error: {e}")
         finally:
             return test_papers
 
+    def prepare_batch_exam(self, request_data: Request, session: Any) -> List[dict]:
+        """One paper per model in `models` and exam in `exam_info`."""
+        test_papers: List[dict] = []
+        try:
+            json_data = request_data.get_json()
+            for model in json_data["models"]:
+                for each_exam in json_data["exam_info"]:
+                    test_paper = build_test_paper(
+                        {**json_data, **model},
+                        each_exam,
+                        session["user_basic_info"]["user_id"],
+                    )
+                    test_paper["max_concurrency"] = model.get("max_concurrency")
+                    test_papers.append(test_paper)
+        except Exception as e:
+            logger.error(f"Prepare Batch Exam Error: {e}")
+        finally:
+            return test_papers
+
+
+def build_test_paper(json_data: dict, each_exam: dict, user_id: str) -> dict:
+    evaluation_result = {
+        "model_id": json_data["model_id"],
+        "user_id": user_id,
+        "question_version_id": "TBD",
+        "evaluation_type": each_exam["topic"],
+        "status": 3,  # 評測正在進行中
+    }
+    # True, or a dict overriding `adaptive_evaluation` options, e.g. {"pass_threshold": 60}
+    adaptive = json_data.get(
+        "adaptive", CONFIG.get("adaptive_evaluation", {}).get("enabled", False)
+    )
+    time_budget_config = CONFIG.get("time_budget", {})
+
+    return {
+        "result": evaluation_result,
+        "evaluation_type": each_exam["topic"],
+        "version": each_exam["version"],
+        "model_id": json_data["model_id"],
+        "model_name": json_data["model_name"],
+        "model_version": json_data["model_version"],
+        "model_endpoint": json_data["model_endpoint"],
+        "sampling": {
+            # Adaptive exams stop early, any prefix of the questions must be a random sample
+            "sampling": each_exam.get("sampling", "random" if adaptive else "first"),
+            # The stop rule needs at least `min_questions`, adaptive exams default to the
+            # whole question set and end at the first confident look
+            "sample_size": each_exam.get(
+                "sample_size", None if adaptive else EXPERIMENT_DATA_LENGTH
+            ),
+            "seed": each_exam.get("seed", 0),
+            "offset": each_exam.get("offset", 0),
+        },
+        "judge_mode": json_data.get(
+            "judge_mode",
+            CONFIG.get("judge_config", {}).get("mode", "immediate"),
+        ),
+        "adaptive": adaptive,
+        # Seconds the exam may take, it then stops and records a partial score
+        "time_budget": json_data.get(
+            "time_budget",
+            time_budget_config.get("seconds")
+            if time_budget_config.get("enabled", False)
+            else None,
+        ),
+    }
+
+
+def group_models_by_project(
+    project_data: List[BaseSchema], model_data: List[BaseSchema], foreigner_key: str
+) -> List[BaseSchema]:
+    for project in project_data:
+        project.include_child = []
+        for model in model_data:
+            if (
+                model.__dict__.get(foreigner_key) == project.__dict__.get(foreigner_key)
+                and model.__dict__.get("status") == 1
+            ):
+                project.include_child.append(model)
+
+    return project_data
+
 
 class ReportsController:
     @staticmethod
@@ -159,19 +275,7 @@ class ReportsController:
     @staticmethod
     def get_project_model_data():
         repository = ReportsRepository.from_config(CONFIG)
-        project_data, model_data, foreigner_key = repository.get_project_model_data()
-
-        for project in project_data:
-            project.include_child = []
-            for model in model_data:
-                if (
-                    model.__dict__.get(foreigner_key)
-                    == project.__dict__.get(foreigner_key)
-                    and model.__dict__.get("status") == 1
-                ):
-                    project.include_child.append(model)
-
-        return project_data
+        return group_models_by_project(*repository.get_project_model_data())
 
     @staticmethod
     def get_manual_quesiton_data(evaluation_result_ids: List[int]) -> pd.DataFrame:
@@ -180,3 +284,17 @@ class ReportsController:
             evaluation_result_ids=evaluation_result_ids
         )
         return manual_quesiton_data
+
+
+class AsyncReportsController:
+    """`ReportsController` for async routes, reads run off the event loop."""
+
+    @staticmethod
+    async def get_project_history_data_by_id(project_id: int) -> pd.DataFrame:
+        repository = AsyncReportsRepository.from_config(CONFIG)
+        return await repository.get_project_history_data_by_id(project_id=project_id)
+
+    @staticmethod
+    async def get_project_model_data() -> List[BaseSchema]:
+        repository = AsyncReportsRepository.from_config(CONFIG)
+        return group_models_by_project(*await repository.get_project_model_data())
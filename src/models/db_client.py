@@ -1,8 +1,10 @@
 import sqlite3
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, Optional, Sequence
 
 from src.models.db_schema import BaseSchema
+from src.models.row_batch import ColumnarBatch
+from src.models.write_service import WriteClient, configure_connection, get_write_client
 
 
 class DatabaseClient(ABC):
@@ -27,17 +29,70 @@ class DatabaseClient(ABC):
     def process_to_dataclass(self, align_dataclass: BaseSchema, data: Any):
         pass
 
+    @abstractmethod
+    def process_to_columnar(self, align_dataclass: BaseSchema, data: Any):
+        pass
+
     @abstractmethod
     def process_to_dict(self, data: Any):
         pass
 
 
 class Sqlite3Client(DatabaseClient):
+    def __init__(
+        self,
+        db_path,
+        busy_timeout_ms: int = 5000,
+        single_writer: Optional[dict] = None,
+        **kwargs,
+    ):
+        self.busy_timeout_ms = busy_timeout_ms
+        super().__init__(db_path, **kwargs)
+
+        # Route writes through the node's single writer instead of this connection
+        self.write_client: Optional[WriteClient] = None
+        if single_writer and single_writer.get("enabled"):
+            self.write_client = get_write_client(
+                db_path, {"busy_timeout_ms": busy_timeout_ms, **single_writer}
+            )
+
     def connect(self):
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        configure_connection(conn, self.busy_timeout_ms)
         return conn
 
+    def execute_write(self, sql_command: str, parameters: Sequence = ()) -> int:
+        """Execute and commit one write statement, returns the row ID it inserted."""
+        if self.write_client:
+            return self.write_client.execute([(sql_command, parameters, False)])[0]
+
+        try:
+            self.table_handler.execute(sql_command, parameters)
+            self.conn.commit()
+        except Exception:
+            # Otherwise the next caller's commit would commit this failed write
+            self.conn.rollback()
+            raise
+        return self.table_handler.lastrowid
+
+    def execute_write_many(
+        self, sql_command: str, seq_of_parameters: Sequence[Sequence]
+    ) -> None:
+        """Execute one write statement per parameter set, in a single transaction."""
+        seq_of_parameters = list(seq_of_parameters)
+        if self.write_client:
+            self.write_client.execute([(sql_command, seq_of_parameters, True)])
+            return
+
+        try:
+            self.table_handler.executemany(sql_command, seq_of_parameters)
+            self.conn.commit()
+        except Exception:
+            # Drops the rows written before the failing one, the batch is all or nothing
+            self.conn.rollback()
+            raise
+
     def close_connection(self):
         self.conn.close()
 
@@ -49,5 +104,10 @@ class Sqlite3Client(DatabaseClient):
     ) -> List[BaseSchema]:
         return [align_dataclass(**row) for row in data]
 
+    def process_to_columnar(
+        self, align_dataclass: BaseSchema, data: List[sqlite3.Row]
+    ) -> ColumnarBatch:
+        return ColumnarBatch.from_rows(align_dataclass, data)
+
     def process_to_dict(self, data: List[sqlite3.Row]) -> List[dict]:
         return [dict(row) for row in data]
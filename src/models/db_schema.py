@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, fields
 from datetime import datetime
+from functools import lru_cache
+from typing import Tuple
+
+
+@lru_cache(maxsize=None)
+def _schema_field_names(schema: type) -> Tuple[str, ...]:
+    return tuple(field.name for field in fields(schema))
 
 
 @dataclass
@@ -8,10 +15,14 @@ class BaseSchema(ABC):
     created_at: datetime = None
     status: int = None
 
+    @classmethod
+    def field_names(cls) -> Tuple[str, ...]:
+        """Column names of the schema, in declaration order (computed once per class)."""
+        return _schema_field_names(cls)
+
     @classmethod
     def from_dict(cls, data: dict):
-        cls_key = {field.name for field in fields(cls)}
-        cls_fields = {key: data.get(key, None) for key in cls_key}
+        cls_fields = {key: data.get(key, None) for key in cls.field_names()}
         return cls(**cls_fields)
 
     @staticmethod
@@ -66,6 +77,10 @@ class ResultData(BaseSchema):
     evaluation_type: str = None
     result_score: int = None
     duration: int = None
+    questions_used: int = None
+    score_lower: float = None
+    score_upper: float = None
+    coverage: float = None
 
     @staticmethod
     def get_table_name():
@@ -100,6 +115,8 @@ class ResultRecordData(BaseSchema):
     result_id: int = None
     question_id: int = None
     model_response: str = None
+    evaluation_response: str = None
+    judge_details: str = None  # JSON, votes of the judge ensemble
 
     @staticmethod
     def get_table_name():
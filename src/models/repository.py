@@ -1,13 +1,44 @@
 from abc import ABC
 from collections import defaultdict
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import pandas as pd
 
 from src.models.db_client import DatabaseClient, Sqlite3Client
 from src.models.db_schema import BaseSchema, ModelData, ProjectData, QuestionData
+from src.models.row_batch import ColumnarBatch
+from src.models.schema_registry import SCHEMA_REGISTRY, get_table_schema
 from src.utils.logger import logger
 
+QUESTION_SAMPLING_METHODS = ("first", "random")
+STREAM_CHUNK_SIZE = 500
+
+ALL_TABLES: Set[str] = frozenset(SCHEMA_REGISTRY)
+TABLE_DATA: Dict[str, BaseSchema] = {
+    table_name: table_schema.schema
+    for table_name, table_schema in SCHEMA_REGISTRY.items()
+}
+
+# Reproducible random order, as SQLite has no seedable RANDOM(): a 32-bit hash of
+# `question_id * k + seed` mixed by two xorshift-multiply rounds, so the orders of
+# different seeds are unrelated. SQLite has no XOR operator, a ^ b is (a | b) - (a & b),
+# and the constants keep every product below 2^63.
+SEED_MODULUS = 4294967296
+SAMPLE_RANK_CTE = """
+WITH seeded AS (
+    SELECT question_id, (question_id * 2654435761 + :seed) % 4294967296 AS h
+    FROM Question WHERE {conditions}
+), mixed AS (
+    SELECT question_id, (((h | (h >> 16)) - (h & (h >> 16))) * 73244475) % 4294967296 AS h
+    FROM seeded
+), remixed AS (
+    SELECT question_id, (((h | (h >> 16)) - (h & (h >> 16))) * 73244475) % 4294967296 AS h
+    FROM mixed
+), sample_rank AS (
+    SELECT question_id, (h | (h >> 16)) - (h & (h >> 16)) AS rank FROM remixed
+)
+"""
+
 
 class BaseRepository(ABC):
     """Definition of Repository"""
@@ -27,23 +58,20 @@ class BaseRepository(ABC):
 
     @property
     def all_tables(self) -> Set[str]:
-        return {
-            table_schema.get_table_name()
-            for table_schema in BaseSchema.__subclasses__()
-        }
+        return ALL_TABLES
 
     @property
     def table_data(self) -> Dict[str, BaseSchema]:
-        return {
-            table_schema.get_table_name(): table_schema
-            for table_schema in BaseSchema.__subclasses__()
-        }
+        return TABLE_DATA
 
     @classmethod
     def from_config(cls, config: str, **kwargs):
         if config["active_database"] == "sqlite":
+            sqlite_config = config[config["active_database"]]
             client = Sqlite3Client(
-                db_path=config[config["active_database"]]["connect_args"]["database"]
+                db_path=sqlite_config["connect_args"]["database"],
+                busy_timeout_ms=sqlite_config.get("busy_timeout_ms", 5000),
+                single_writer=sqlite_config.get("single_writer"),
             )
         else:
             raise NotImplementedError(
@@ -57,9 +85,73 @@ class BaseRepository(ABC):
     def _record_user_operations(self, **kwargs):
         self.metadata["LastOperation"] = {**kwargs}
 
+    def _process_rows(
+        self, align_dataclass: BaseSchema, rows: List, columnar: bool = False
+    ) -> Union[List[BaseSchema], ColumnarBatch]:
+        if columnar:
+            return self.db_client.process_to_columnar(
+                align_dataclass=align_dataclass, data=rows
+            )
+        return self.db_client.process_to_dataclass(
+            align_dataclass=align_dataclass, data=rows
+        )
+
+    def _iter_query(
+        self,
+        sql_command: str,
+        parameters,
+        align_dataclass: BaseSchema,
+        operation_type: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[BaseSchema]:
+        """Yield query rows as dataclasses, reading `chunk_size` rows at a time."""
+        # A dedicated cursor, `table_handler` may be reused while this one is open
+        cursor = self.db_client.get_table_handler()
+        status = "Failed"
+        try:
+            cursor.execute(sql_command, parameters)
+            while rows := cursor.fetchmany(chunk_size):
+                yield from self.db_client.process_to_dataclass(
+                    align_dataclass=align_dataclass, data=rows
+                )
+            status = "Success"
+        except GeneratorExit:
+            # The caller stopped early, e.g. after finding what it was looking for
+            status = "Success"
+            raise
+        except Exception as e:
+            logger.error(e)
+        finally:
+            cursor.close()
+            self._record_user_operations(
+                OperationType=operation_type,
+                OperationTable=align_dataclass.get_table_name(),
+                Status=status,
+            )
+
 
 class SimplifiedRepository(BaseRepository):
-    def select_all(self, db_schema: BaseSchema) -> List[BaseSchema]:
+    def iter_all(
+        self, db_schema: BaseSchema, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[BaseSchema]:
+        """Streaming counterpart of `select_all`."""
+        table_name = db_schema.get_table_name()
+        if table_name not in self.all_tables:
+            logger.error(f"Table {table_name} is not in Database.")
+            return
+
+        logger.debug(f"Do streaming select all SQL command with {table_name}...")
+        yield from self._iter_query(
+            f"""SELECT * FROM {table_name}""",
+            (),
+            align_dataclass=self.table_data[table_name],
+            operation_type="iter_all",
+            chunk_size=chunk_size,
+        )
+
+    def select_all(
+        self, db_schema: BaseSchema, columnar: bool = False
+    ) -> Union[List[BaseSchema], ColumnarBatch]:
         results = defaultdict()
         table_name = db_schema.get_table_name()
 
@@ -70,11 +162,11 @@ class SimplifiedRepository(BaseRepository):
                 raise ValueError(f"Table {table_name} is not in Database.")
 
             results = self.db_client.table_handler.execute(
-                f"""SELECT * FROM {table_name}"""
+                get_table_schema(table_name).select_all_sql
             ).fetchall()
 
-            results = self.db_client.process_to_dataclass(
-                align_dataclass=self.table_data[table_name], data=results
+            results = self._process_rows(
+                self.table_data[table_name], results, columnar=columnar
             )
             status = "Success"
         except Exception as e:
@@ -91,18 +183,14 @@ class SimplifiedRepository(BaseRepository):
         try:
             logger.debug(f"Insert data into {table_name} table...")
             schema_data.status = schema_data.status or 1  # default
-            # get all variable which fit Database Schema
-            variable_data = schema_data.__dict__
-            variable_data.pop(schema_data.get_primary_key_name())
-            variable_data.pop("created_at")
-            attributes = ", ".join(i for i in variable_data)
-            values = ", ".join("?" for _ in variable_data)
-            sql_command = f"INSERT INTO {table_name} ({attributes}) VALUES ({values});"
-            self.db_client.table_handler.execute(
-                sql_command, tuple(variable_data.values())
-            )
-            self.db_client.conn.commit()
-            record_id = self.db_client.table_handler.lastrowid
+            table_schema = get_table_schema(table_name)
+            record_id = self.db_client.execute_write(
+                table_schema.insert_sql,
+                tuple(
+                    getattr(schema_data, column)
+                    for column in table_schema.insert_columns
+                ),
+            )
             status = "Success"
             logger.debug(f"{schema_data.get_table_name()} insert successfully.")
         except Exception as e:
@@ -122,17 +210,18 @@ class SimplifiedRepository(BaseRepository):
 
         try:
             logger.debug(f"Update data into {table_name} table...")
+            table_schema = get_table_schema(table_name)
             update_data = {
-                key: value for key, value in schema_data.__dict__.items() if value
+                # Unset and blank form fields are kept, 0 (e.g. a score) is written
+                key: value
+                for key, value in schema_data.__dict__.items()
+                if value not in (None, "")
             }
-            update_condition_name = schema_data.get_primary_key_name()
-            update_condition_value = update_data.pop(update_condition_name)
-            attributes = ", ".join(f"{i} = ?" for i in update_data.keys())
-            sql_command = f"UPDATE {table_name} SET {attributes} WHERE {update_condition_name} = ?;"
-            self.db_client.table_handler.execute(
-                sql_command, tuple(update_data.values()) + (update_condition_value,)
-            )
-            self.db_client.conn.commit()
+            update_condition_value = update_data.pop(table_schema.primary_key)
+            self.db_client.execute_write(
+                table_schema.update_sql(tuple(update_data)),
+                tuple(update_data.values()) + (update_condition_value,),
+            )
             status = "Success"
             logger.debug(f"{table_name} update successfully.")
         except Exception as e:
@@ -150,14 +239,11 @@ class SimplifiedRepository(BaseRepository):
 
         try:
             logger.debug(f"Delete {table_name} table data...")
-            delete_data = schema_data.__dict__
-            delete_condition_name = schema_data.get_primary_key_name()
-            delete_condition_value = delete_data.get(delete_condition_name)
-            sql_command = (
-                f"UPDATE {table_name} SET status = 0 WHERE {delete_condition_name} = ?;"
+            table_schema = get_table_schema(table_name)
+            self.db_client.execute_write(
+                table_schema.soft_delete_sql,
+                (getattr(schema_data, table_schema.primary_key),),
             )
-            self.db_client.table_handler.execute(sql_command, (delete_condition_value,))
-            self.db_client.conn.commit()
             status = "Success"
             logger.debug(f"{table_name} data delete successfully.")
         except Exception as e:
@@ -172,26 +258,72 @@ class SimplifiedRepository(BaseRepository):
 
 
 class ResultRepositroy(SimplifiedRepository):
+    @staticmethod
+    def _build_question_query(question_category: Optional[str], sampling: str) -> str:
+        if sampling not in QUESTION_SAMPLING_METHODS:
+            raise ValueError(
+                f"Unknown sampling '{sampling}', choose from {QUESTION_SAMPLING_METHODS}."
+            )
+
+        conditions = "question_version_id = :question_version_id"
+        if question_category is not None:
+            conditions += " AND question_category = :question_category"
+        columns = ", ".join(get_table_schema("Question").columns)
+
+        if sampling == "random":
+            return f"""
+            {SAMPLE_RANK_CTE.format(conditions=conditions)}
+            SELECT {columns} FROM Question JOIN sample_rank USING (question_id)
+            ORDER BY sample_rank.rank, question_id
+            LIMIT :limit OFFSET :offset;
+            """
+
+        return f"""
+        SELECT {columns} FROM Question WHERE {conditions}
+        ORDER BY question_id
+        LIMIT :limit OFFSET :offset;
+        """
+
     def get_question(
-        self, question_version_id: int, question_category: str
-    ) -> List[BaseSchema]:
-        results = []
+        self,
+        question_version_id: int,
+        question_category: Optional[str],
+        sample_size: Optional[int] = None,
+        sampling: str = "first",
+        seed: int = 0,
+        offset: int = 0,
+        columnar: bool = False,
+    ) -> Union[List[BaseSchema], ColumnarBatch]:
+        """Select the questions of an exam, sampled and limited inside SQLite.
+
+        sampling:
+            "first": the first `sample_size` questions by question_id.
+            "random": a deterministic pseudo-random sample, reproducible per `seed`.
+
+        With `columnar=True` the rows come back as a `ColumnarBatch`.
+        """
+        results = self._process_rows(QuestionData, [], columnar=columnar)
 
         try:
             logger.debug("Do filter SQL command with table Question...")
 
-            sql_command = """SELECT * FROM Question WHERE question_version_id = ? AND question_category = ?;"""
+            sql_command = self._build_question_query(question_category, sampling)
+            # SQLite treats a negative LIMIT as no limit
+            sample_size = -1 if sample_size is None else sample_size
 
             results = self.db_client.table_handler.execute(
                 sql_command,
-                (
-                    question_version_id,
-                    question_category,
-                ),
+                {
+                    "question_version_id": question_version_id,
+                    "question_category": question_category,
+                    "limit": sample_size,
+                    "seed": seed % SEED_MODULUS,
+                    "offset": offset,
+                },
             ).fetchall()
 
-            results = self.db_client.process_to_dataclass(
-                align_dataclass=self.table_data["Question"], data=results
+            results = self._process_rows(
+                self.table_data["Question"], results, columnar=columnar
             )
             status = "Success"
         except Exception as e:
@@ -205,6 +337,85 @@ class ResultRepositroy(SimplifiedRepository):
             )
             return results
 
+    def iter_question(
+        self,
+        question_version_id: int,
+        question_category: Optional[str],
+        sample_size: Optional[int] = None,
+        sampling: str = "first",
+        seed: int = 0,
+        offset: int = 0,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[BaseSchema]:
+        """Stream the same questions as `get_question`, one page of `chunk_size` at a time.
+
+        Each page is a separate short query, so no read transaction stays open
+        while the caller spends minutes on the questions of a page.
+        """
+        sql_command = self._build_question_query(question_category, sampling)
+        position = 0
+
+        while sample_size is None or position < sample_size:
+            limit = chunk_size
+            if sample_size is not None:
+                limit = min(chunk_size, sample_size - position)
+
+            page = list(
+                self._iter_query(
+                    sql_command,
+                    {
+                        "question_version_id": question_version_id,
+                        "question_category": question_category,
+                        "limit": limit,
+                        "seed": seed % SEED_MODULUS,
+                        "offset": offset + position,
+                    },
+                    align_dataclass=self.table_data["Question"],
+                    operation_type="iter_question",
+                    chunk_size=chunk_size,
+                )
+            )
+            yield from page
+
+            if len(page) < limit:
+                break
+            position += len(page)
+
+    def count_question(
+        self,
+        question_version_id: int,
+        question_category: Optional[str],
+        sample_size: Optional[int] = None,
+        offset: int = 0,
+        **kwargs,
+    ) -> int:
+        """Number of questions `iter_question` yields for the same arguments."""
+        count = 0
+        try:
+            sql_command = "SELECT COUNT(*) FROM Question WHERE question_version_id = ?"
+            parameters = (question_version_id,)
+            if question_category is not None:
+                sql_command += " AND question_category = ?"
+                parameters += (question_category,)
+
+            count = self.db_client.table_handler.execute(
+                sql_command, parameters
+            ).fetchone()[0]
+            count = max(count - offset, 0)
+            if sample_size is not None:
+                count = min(count, sample_size)
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="count_question",
+                OperationTable="Question",
+                Status=status,
+            )
+            return count
+
     def get_question_version_id(
         self, question_category: str, question_version: int
     ) -> List[BaseSchema]:
@@ -213,7 +424,7 @@ class ResultRepositroy(SimplifiedRepository):
         try:
             logger.debug("Do filter SQL command with table QuestionVersion...")
 
-            sql_command = """SELECT * FROM Question WHERE question_category = ? AND question_version_id = ?;"""
+            sql_command = """SELECT * FROM Question WHERE question_category = ? AND question_version_id = ? LIMIT 1;"""
 
             results = self.db_client.table_handler.execute(
                 sql_command, (question_category, question_version)
@@ -236,11 +447,27 @@ class ResultRepositroy(SimplifiedRepository):
 
     def get_evaluation_version(self) -> dict:
         result = defaultdict(list)
-        question_version_data: List[QuestionData] = self.select_all(QuestionData)
 
-        for each_data in question_version_data:
-            result[each_data.question_category].append(each_data.question_version_id)
-        return result
+        try:
+            sql_command = """
+            SELECT DISTINCT question_category, question_version_id FROM Question
+            ORDER BY question_category, question_version_id;
+            """
+            rows = self.db_client.table_handler.execute(sql_command).fetchall()
+
+            for question_category, question_version_id in rows:
+                result[question_category].append(question_version_id)
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="get_evaluation_version",
+                OperationTable="Question",
+                Status=status,
+            )
+            return result
 
     def get_latest_evaluation_result_by_model(self, model_id: int) -> bool:
         results = []
@@ -268,6 +495,172 @@ class ResultRepositroy(SimplifiedRepository):
             )
             return results
 
+    def get_pending_response_records(self, limit: int) -> List[dict]:
+        """Response records waiting for deferred judging, with their groundtruth."""
+        results = []
+        try:
+            logger.debug("Get response records waiting for the judge...")
+
+            sql_command = """
+            SELECT RR.result_record_id,
+                   RR.result_id,
+                   RR.model_response,
+                   Q.groundtruth_content,
+                   Q.groundtruth_type,
+                   Q.groundtruth_set
+            FROM ResultRecord AS RR
+            JOIN Question AS Q ON RR.question_id = Q.question_id
+            WHERE RR.status = 2
+            ORDER BY RR.result_record_id
+            LIMIT ?;
+            """
+
+            results = self.db_client.table_handler.execute(
+                sql_command, (limit,)
+            ).fetchall()
+
+            results = self.db_client.process_to_dict(data=results)
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="get_pending_response_records",
+                OperationTable="ResultRecord",
+                Status=status,
+            )
+            return results
+
+    def update_response_verdicts(
+        self, verdicts: List[Tuple[int, str, Optional[str]]]
+    ) -> None:
+        """Store (result_record_id, evaluation_response, judge_details) in one transaction."""
+        try:
+            sql_command = """
+            UPDATE ResultRecord SET evaluation_response = ?, judge_details = ?, status = 1
+            WHERE result_record_id = ?;
+            """
+            self.db_client.execute_write_many(
+                sql_command,
+                [
+                    (verdict, judge_details, record_id)
+                    for record_id, verdict, judge_details in verdicts
+                ],
+            )
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="update_response_verdicts",
+                OperationTable="ResultRecord",
+                Status=status,
+            )
+
+    def count_pending_response_records(self, result_id: int) -> int:
+        count = 0
+        try:
+            sql_command = (
+                "SELECT COUNT(*) FROM ResultRecord WHERE result_id = ? AND status = 2;"
+            )
+            count = self.db_client.table_handler.execute(
+                sql_command, (result_id,)
+            ).fetchone()[0]
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="count_pending_response_records",
+                OperationTable="ResultRecord",
+                Status=status,
+            )
+            return count
+
+    def get_result_verdicts(self, result_id: int) -> List[str]:
+        results = []
+        try:
+            sql_command = """
+            SELECT evaluation_response FROM ResultRecord
+            WHERE result_id = ? AND status = 1;
+            """
+            results = [
+                row[0]
+                for row in self.db_client.table_handler.execute(
+                    sql_command, (result_id,)
+                ).fetchall()
+            ]
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="get_result_verdicts",
+                OperationTable="ResultRecord",
+                Status=status,
+            )
+            return results
+
+    def get_response_checkpoints(self, result_id: int) -> Dict[int, BaseSchema]:
+        """Response records already written for a result, keyed by question_id."""
+        results = {}
+        try:
+            sql_command = f"""
+            SELECT {", ".join(get_table_schema("ResultRecord").columns)}
+            FROM ResultRecord WHERE result_id = ? AND status <> 0
+            ORDER BY result_record_id;
+            """
+            rows = self.db_client.table_handler.execute(
+                sql_command, (result_id,)
+            ).fetchall()
+
+            # Later rows win, older duplicates predate the checkpointing
+            results = {
+                record.question_id: record
+                for record in self.db_client.process_to_dataclass(
+                    align_dataclass=self.table_data["ResultRecord"], data=rows
+                )
+            }
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="get_response_checkpoints",
+                OperationTable="ResultRecord",
+                Status=status,
+            )
+            return results
+
+    def get_result_by_id(self, result_id: int) -> List[BaseSchema]:
+        results = []
+        try:
+            sql_command = "SELECT * FROM Result WHERE result_id = ?;"
+
+            results = self.db_client.table_handler.execute(
+                sql_command, (result_id,)
+            ).fetchall()
+
+            results = self.db_client.process_to_dataclass(
+                align_dataclass=self.table_data["Result"], data=results
+            )
+            status = "Success"
+        except Exception as e:
+            status = "Failed"
+            logger.error(e)
+        finally:
+            self._record_user_operations(
+                OperationType="get_result_by_id",
+                OperationTable="Result",
+                Status=status,
+            )
+            return results
+
 
 class ReportsRepository(SimplifiedRepository):
     def get_project_model_data(self) -> Tuple[List[BaseSchema], List[BaseSchema], str]:
@@ -320,7 +713,7 @@ class ReportsRepository(SimplifiedRepository):
             status = "Failed"
             logger.error(e)
         finally:
-            self._record_last_metadata(
+            self._record_user_operations(
                 OperationType="select_all",
                 OperationTable=["Project", "ExamineeModel"],
                 Status=status,
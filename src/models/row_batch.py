@@ -0,0 +1,90 @@
+from typing import Dict, Iterator, List, Sequence, Tuple, Type
+
+from src.models.db_schema import BaseSchema
+
+
+class RowView:
+    """Read-only view of one row of a `ColumnarBatch`.
+
+    Attribute access mirrors the schema dataclass (`row.question_id`), but a view
+    only stores its batch and index instead of a `__dict__` of values.
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: "ColumnarBatch", index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getattr__(self, name: str):
+        try:
+            return self._batch.columns[name][self._index]
+        except KeyError:
+            raise AttributeError(
+                f"{self._batch.schema.__name__} row has no column '{name}'"
+            ) from None
+
+    def to_dict(self) -> dict:
+        return {
+            name: column[self._index] for name, column in self._batch.columns.items()
+        }
+
+    def to_dataclass(self) -> BaseSchema:
+        return self._batch.schema.from_dict(self.to_dict())
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"{self._batch.schema.__name__}View({values})"
+
+
+class ColumnarBatch:
+    """Query result stored as one tuple per column, for bulk reads.
+
+    Opt in per query with `columnar=True` on the repository methods that support
+    it. Rows are materialized lazily as `RowView`s while iterating.
+    """
+
+    __slots__ = ("schema", "columns", "_length")
+
+    def __init__(
+        self, schema: Type[BaseSchema], columns: Dict[str, tuple], length: int
+    ):
+        self.schema = schema
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def from_rows(
+        cls,
+        schema: Type[BaseSchema],
+        rows: Sequence[Sequence],
+        column_names: Sequence[str] = None,
+    ) -> "ColumnarBatch":
+        if column_names is None:
+            column_names = rows[0].keys() if rows else schema.field_names()
+        # One pass transposing the rows, no per-row objects are created
+        column_values: List[Tuple] = list(zip(*rows)) or [()] * len(column_names)
+        return cls(schema, dict(zip(column_names, column_values)), len(rows))
+
+    def column(self, name: str) -> tuple:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> RowView:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ColumnarBatch index out of range")
+        return RowView(self, index)
+
+    def __iter__(self) -> Iterator[RowView]:
+        return (RowView(self, index) for index in range(self._length))
+
+    def to_dicts(self) -> List[dict]:
+        names = tuple(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+    def to_dataclasses(self) -> List[BaseSchema]:
+        return [self.schema.from_dict(row) for row in self.to_dicts()]
@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Type
+
+from src.models.db_schema import BaseSchema
+
+# Filled in by the database on insert
+INSERT_EXCLUDED_COLUMNS = ("created_at",)
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """Columns and precompiled, parameterized SQL of one table."""
+
+    schema: Type[BaseSchema]
+    table_name: str
+    primary_key: str
+    columns: Tuple[str, ...]
+    insert_columns: Tuple[str, ...]
+    insert_sql: str
+    select_all_sql: str
+    soft_delete_sql: str
+    _update_sql_cache: Dict[Tuple[str, ...], str] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+
+    @classmethod
+    def from_schema(cls, schema: Type[BaseSchema]) -> "TableSchema":
+        table_name = schema.get_table_name()
+        primary_key = schema.get_primary_key_name()
+        columns = schema.field_names()
+        insert_columns = tuple(
+            column
+            for column in columns
+            if column != primary_key and column not in INSERT_EXCLUDED_COLUMNS
+        )
+
+        return cls(
+            schema=schema,
+            table_name=table_name,
+            primary_key=primary_key,
+            columns=columns,
+            insert_columns=insert_columns,
+            insert_sql=(
+                f"INSERT INTO {table_name} ({', '.join(insert_columns)}) "
+                f"VALUES ({', '.join('?' for _ in insert_columns)});"
+            ),
+            select_all_sql=f"SELECT {', '.join(columns)} FROM {table_name};",
+            soft_delete_sql=f"UPDATE {table_name} SET status = 0 WHERE {primary_key} = ?;",
+        )
+
+    def update_sql(self, columns: Tuple[str, ...]) -> str:
+        """UPDATE statement for a subset of columns, compiled once per subset."""
+        sql_command = self._update_sql_cache.get(columns)
+        if sql_command is None:
+            attributes = ", ".join(f"{column} = ?" for column in columns)
+            sql_command = f"UPDATE {self.table_name} SET {attributes} WHERE {self.primary_key} = ?;"
+            self._update_sql_cache[columns] = sql_command
+        return sql_command
+
+
+def _build_registry() -> Dict[str, TableSchema]:
+    return {
+        table_schema.get_table_name(): TableSchema.from_schema(table_schema)
+        for table_schema in BaseSchema.__subclasses__()
+    }
+
+
+# Built once at import time, every schema is declared in `db_schema`
+SCHEMA_REGISTRY: Dict[str, TableSchema] = _build_registry()
+
+
+def get_table_schema(table_name: str) -> TableSchema:
+    try:
+        return SCHEMA_REGISTRY[table_name]
+    except KeyError:
+        raise ValueError(f"Table {table_name} is not in Database.") from None
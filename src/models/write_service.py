@@ -0,0 +1,249 @@
+import fcntl
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import logger
+
+# (sql_command, parameters, is_many): `is_many` statements run with executemany
+WriteStatement = Tuple[str, Any, bool]
+
+DEFAULT_AUTHKEY = b"sqlite-single-writer"
+
+
+def configure_connection(conn: sqlite3.Connection, busy_timeout_ms: int) -> None:
+    """WAL lets readers keep working on a snapshot while the writer commits."""
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)};")
+
+
+class SQLiteWriter:
+    """The only connection of a node that writes to the database.
+
+    Write requests from every client are queued and applied by one thread. Requests
+    that arrive together are grouped into one transaction, so a burst of writes
+    costs one commit (and one fsync) instead of one per request.
+    """
+
+    def __init__(
+        self, db_path: str, max_batch_size: int = 256, busy_timeout_ms: int = 5000
+    ):
+        self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._queue: "queue.Queue[Tuple[Future, Sequence[WriteStatement]]]" = (
+            queue.Queue()
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="sqlite-writer", daemon=True
+        )
+
+    def start(self) -> "SQLiteWriter":
+        self._thread.start()
+        return self
+
+    def submit(self, statements: Sequence[WriteStatement]) -> Future:
+        """Queue statements that must commit atomically, resolves to their row IDs."""
+        future = Future()
+        self._queue.put((future, statements))
+        return future
+
+    def _run(self) -> None:
+        # Autocommit mode, transactions are opened explicitly per group
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        configure_connection(conn, self.busy_timeout_ms)
+        conn.execute("PRAGMA synchronous=NORMAL;")
+
+        while True:
+            group = [self._queue.get()]
+            while len(group) < self.max_batch_size:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(conn, group)
+
+    @staticmethod
+    def _execute(
+        conn: sqlite3.Connection, statements: Sequence[WriteStatement]
+    ) -> List[Optional[int]]:
+        row_ids = []
+        for sql_command, parameters, is_many in statements:
+            if is_many:
+                conn.executemany(sql_command, parameters)
+                row_ids.append(None)
+            else:
+                row_ids.append(conn.execute(sql_command, parameters).lastrowid)
+        return row_ids
+
+    def _apply(
+        self,
+        conn: sqlite3.Connection,
+        group: List[Tuple[Future, Sequence[WriteStatement]]],
+    ) -> None:
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            results = [self._execute(conn, statements) for _, statements in group]
+            conn.execute("COMMIT;")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            if len(group) > 1:
+                # Replay one request per transaction, so only the failing one fails
+                for request in group:
+                    self._apply(conn, [request])
+                return
+            group[0][0].set_exception(e)
+            return
+
+        for (future, _), row_ids in zip(group, results):
+            future.set_result(row_ids)
+
+
+class WriteServer:
+    """Accepts write requests from local processes over a Unix socket."""
+
+    def __init__(self, writer: SQLiteWriter, address: str, authkey: bytes):
+        self.writer = writer
+        self.listener = Listener(address, family="AF_UNIX", authkey=authkey)
+
+    def start(self) -> "WriteServer":
+        threading.Thread(
+            target=self.serve_forever, name="sqlite-writer-server", daemon=True
+        ).start()
+        return self
+
+    def serve_forever(self) -> None:
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                logger.error(f"Single writer failed to accept a client: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    statements = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    conn.send(("ok", self.writer.submit(statements).result()))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class WriteClient:
+    """Sends writes to the node's single writer, starting it if no process serves yet.
+
+    The process that holds the lock file next to the socket runs the writer. When it
+    exits the lock is released and the next client to reconnect takes over.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        address: str,
+        max_batch_size: int = 256,
+        busy_timeout_ms: int = 5000,
+        authkey: bytes = DEFAULT_AUTHKEY,
+        connect_timeout: float = 10.0,
+    ):
+        self.db_path = db_path
+        self.address = address
+        self.max_batch_size = max_batch_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+
+        self._conn: Optional[Connection] = None
+        self._lock = threading.Lock()
+        self._server_lock_file = None
+
+    def _try_become_writer(self) -> None:
+        if self._server_lock_file is not None:
+            return
+
+        lock_file = open(f"{self.address}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return
+
+        # Left over by a writer that did not shut down cleanly
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        writer = SQLiteWriter(
+            self.db_path,
+            max_batch_size=self.max_batch_size,
+            busy_timeout_ms=self.busy_timeout_ms,
+        ).start()
+        WriteServer(writer, self.address, self.authkey).start()
+        self._server_lock_file = lock_file
+        logger.info(f"Single writer for {self.db_path} serving on {self.address}")
+
+    def _connect(self) -> Connection:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                self._try_become_writer()
+                time.sleep(0.05)
+
+    def execute(self, statements: Sequence[WriteStatement]) -> List[Optional[int]]:
+        """Commit the statements atomically through the writer, returns their row IDs."""
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = self._connect()
+                try:
+                    self._conn.send(list(statements))
+                    status, payload = self._conn.recv()
+                    break
+                except (EOFError, OSError):
+                    # The writer process went away, reconnect (or take over) once
+                    self._conn = None
+                    if attempt:
+                        raise
+
+        if status == "error":
+            raise sqlite3.DatabaseError(payload)
+        return payload
+
+
+_write_clients: Dict[Tuple[int, str], WriteClient] = {}
+_write_clients_lock = threading.Lock()
+
+
+def get_write_client(db_path: str, writer_config: dict) -> WriteClient:
+    """One client per process and database, re-created in forked worker processes."""
+    address = writer_config.get("address") or f"{db_path}.writer.sock"
+    key = (os.getpid(), address)
+
+    with _write_clients_lock:
+        if key not in _write_clients:
+            _write_clients[key] = WriteClient(
+                db_path=db_path,
+                address=address,
+                max_batch_size=writer_config.get("max_batch_size", 256),
+                busy_timeout_ms=writer_config.get("busy_timeout_ms", 5000),
+                authkey=os.environ.get(
+                    "SQLITE_WRITER_AUTHKEY", DEFAULT_AUTHKEY.decode()
+                ).encode(),
+            )
+        return _write_clients[key]
@@ -13,8 +13,8 @@ from flask import (  # make_response,
     url_for,
 )
 
-from src.celeryflow.chain_monitor import get_chain_progress
-from src.celeryflow.tasks import start_evaluation_tasks
+from src.celeryflow.chain_monitor import get_batch_summary, get_chain_progress
+from src.celeryflow.tasks import start_batch_evaluation, start_evaluation_tasks
 from src.models.controller import BasicController, EvaluationController
 
 # from src.controllers.reports_controller import ReportsController
@@ -51,7 +51,7 @@ def evaluation_home():
 
     # View Question Data and Evaluation Model Data
     exam_info = dict(controller.get_evaluation_version())
-    evaluation_model = BasicController.get_all_data(db_schema=ModelData)
+    evaluation_model = BasicController.get_all_data(db_schema=ModelData, columnar=True)
 
     return render_template(
         "evaluation.html",
@@ -86,6 +86,25 @@ def do_evaluate():
     return response
 
 
+@evaluation_routes.route("/do_batch_evaluate", methods=["POST"])
+@user_logger()
+def do_batch_evaluate():
+    """Evaluate several models on the same exams, the questions are prepared once."""
+    controller = EvaluationController()
+    test_papers = controller.prepare_batch_exam(request, session)
+    result = start_batch_evaluation.delay(test_papers)
+
+    response = jsonify(
+        {
+            "status": "success",
+            "message": "評測已開始",
+            "task_id": result.id,
+        }
+    )
+    response.headers.add("Access-Control-Allow-Origin", "*")  # 允許跨域請求
+    return response
+
+
 @evaluation_routes.route("/cancelled_evaluate", methods=["GET"])
 @user_logger()
 def cancelled_evaluate():
@@ -155,6 +174,16 @@ def evaluation_status(task_id):
     )
 
 
+@evaluation_routes.route("/evaluation_summary/<summary_task_id>", methods=["GET"])
+@user_logger()
+def evaluation_summary(summary_task_id: str):
+    """Scores of a fan-out exam batch, read from its chord callback or errback result."""
+    batch = get_batch_summary(summary_task_id)
+    if batch is None:
+        return jsonify({"state": "PROGRESS"}), 202
+    return jsonify(batch)
+
+
 @evaluation_routes.route("/terminate_task/<task_id>/terminate", methods=["POST"])
 @user_logger()
 def terminate_task(task_id: str):
@@ -1,6 +1,6 @@
 from flask import Blueprint, redirect, render_template, request, url_for
 
-from src.models.controller import BasicController, ReportsController
+from src.models.controller import AsyncReportsController, BasicController
 from src.models.db_schema import ProjectData
 from src.utils.data_handler import RequestHandler
 from src.utils.user_logger import user_logger
@@ -53,12 +53,14 @@ def return_home():
 
 @project_routes.route("/history_record", methods=["POST"])
 @user_logger()
-def history_record_project():
+async def history_record_project():
     action_type = request.form.get("button_action")
     project_id = int(request.args.get("from_project_id"))
 
     if action_type == "history_record":
-        result = ReportsController.get_project_history_data_by_id(project_id=project_id)
+        result = await AsyncReportsController.get_project_history_data_by_id(
+            project_id=project_id
+        )
         return render_template(
             "history.html",
             project_name=request.args.get("project_name"),
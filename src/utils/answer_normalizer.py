@@ -0,0 +1,124 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+# `db/add_model_and_data.py` stores MMMLU questions with the misspelled type
+CLASSIFICATION_TYPES = {"Classification", "Classfication"}
+MULTIPLE_CHOICE_TYPES = {"MultipleChoice"}
+MULTIPLE_CHOICE_SEPARATOR = "/"
+
+ANSWER_PREFIX_PATTERN = re.compile(
+    r"^(?:"
+    r"(?:the\s+)?(?:correct\s+|final\s+)?(?:answer|option|choice)s?\s*(?:is|are|:)?"
+    r"|(?:正确|正確|最终|最終)?答案\s*(?:是|為|为|:)?"
+    r"|(?:我)?(?:选|選)(?:项|項|择|擇)?\s*(?:是|為|为|:)?"
+    r")\s*",
+    re.IGNORECASE,
+)
+WRAPPER_CHARACTERS = "()[]{}<>\"'`*「」『』【】"
+TRAILING_PUNCTUATION = ".。!！,，;；:：、 "
+
+
+class AnswerNormalizer:
+    """Rule-based extraction of the selected option(s) from a free-form response.
+
+    Only responses whose answer can be read off unambiguously are resolved, e.g.
+    " B", "B.", "(B)", "答案：B", "b" or "B. Paris". Anything else returns None so
+    the caller can escalate the response to the LLM judge.
+    """
+
+    def __init__(self, groundtruth_type: str, groundtruth_set: Iterable[str]):
+        self.groundtruth_type = groundtruth_type
+        self.options = {
+            self._clean(option).casefold(): str(option) for option in groundtruth_set
+        }
+        # Options that collide after case folding cannot be matched case-insensitively
+        self.is_supported = len(self.options) == len(set(groundtruth_set)) and (
+            groundtruth_type in CLASSIFICATION_TYPES
+            or groundtruth_type in MULTIPLE_CHOICE_TYPES
+        )
+
+        option_pattern = "|".join(
+            re.escape(option)
+            for option in sorted(self.options, key=len, reverse=True)
+            if option
+        )
+        self.leading_option_pattern = re.compile(
+            rf"^[(\[]?({option_pattern})(?:[)\]]|[.:、)]\s)", re.IGNORECASE
+        )
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        text = unicodedata.normalize("NFKC", str(text)).strip()
+        previous = None
+        while previous != text:
+            previous = text
+            text = ANSWER_PREFIX_PATTERN.sub("", text, count=1)
+            text = text.strip(TRAILING_PUNCTUATION)
+            if (
+                len(text) > 1
+                and text[0] in WRAPPER_CHARACTERS
+                and text[-1] in WRAPPER_CHARACTERS
+            ):
+                text = text[1:-1].strip()
+        return text
+
+    def _match_single(self, text: str, allow_leading: bool) -> Optional[str]:
+        text = self._clean(text)
+        option = self.options.get(text.casefold())
+        if option is not None:
+            return option
+
+        if allow_leading and (match := self.leading_option_pattern.match(text + " ")):
+            option = self.options[match.group(1).casefold()]
+            remainder = text[match.end() - 1 :]
+            # "A. ... but B is also ..." mentions a second option, leave it to the judge
+            if any(
+                re.search(rf"(?<![^\W_]){re.escape(other)}(?![^\W_])", remainder)
+                for other in self.options.values()
+                if other != option
+            ):
+                return None
+            return option
+        return None
+
+    def extract(self, response: str) -> Optional[FrozenSet[str]]:
+        """Return the selected options, or None when the response is ambiguous."""
+        if not self.is_supported or response is None:
+            return None
+
+        if self.groundtruth_type in CLASSIFICATION_TYPES:
+            option = self._match_single(response, allow_leading=True)
+            return frozenset([option]) if option is not None else None
+
+        parts = self._clean(response).split(MULTIPLE_CHOICE_SEPARATOR)
+        options = [self._match_single(part, allow_leading=False) for part in parts]
+        if not parts or any(option is None for option in options):
+            return None
+        return frozenset(options)
+
+    def decide(self, model_response: str, groundtruth_content: str) -> Optional[bool]:
+        """Return whether the response is correct, or None if the judge must decide."""
+        selected = self.extract(model_response)
+        if selected is None:
+            return None
+
+        expected = self.extract(groundtruth_content)
+        if expected is None:
+            return None
+        return selected == expected
+
+
+@lru_cache(maxsize=256)
+def _get_normalizer(
+    groundtruth_type: str, groundtruth_set: Tuple[str, ...]
+) -> AnswerNormalizer:
+    return AnswerNormalizer(groundtruth_type, groundtruth_set)
+
+
+def get_normalizer(
+    groundtruth_type: str, groundtruth_set: Iterable[str]
+) -> AnswerNormalizer:
+    """Reuse normalizers across questions that share the same option set."""
+    return _get_normalizer(groundtruth_type, tuple(groundtruth_set))
@@ -1,7 +1,7 @@
 import os
 from abc import ABC, abstractmethod
 
-import requests
+from src.utils.http_session import REQUEST_TIMEOUT, get_http_session
 
 
 class APIClient(ABC):
@@ -46,12 +46,14 @@ class APIClient(ABC):
     def check_health(self):
         self.do_request("Say your Name")
 
-    def do_request(self, input_text, model_name=None):
+    def do_request(self, input_text, model_name=None, session=None):
         formatted_input = self.format_input(input_text, model_name)
-        response = requests.post(
+        # The keep-alive session of the calling thread unless the caller has its own
+        response = (session or get_http_session()).post(
             self.api_endpoint,
             headers=self.headers,
             json=formatted_input,
+            timeout=REQUEST_TIMEOUT,
         )
 
         if response.status_code == 200:
@@ -0,0 +1,119 @@
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.load_yaml import yaml_data as CONFIG
+
+HTTP_CLIENT_CONFIG = CONFIG.get("http_client", {})
+# Seconds to wait on a model endpoint before giving up on a request
+REQUEST_TIMEOUT = HTTP_CLIENT_CONFIG.get("request_timeout", 60)
+
+_local = threading.local()
+
+
+def get_http_session() -> requests.Session:
+    """Keep-alive session of the calling thread.
+
+    `requests.Session` is not thread-safe, so every worker thread (threads pool)
+    gets its own, and reuses its connections from one call to the next.
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_CLIENT_CONFIG.get("pool_connections", 10),
+            pool_maxsize=HTTP_CLIENT_CONFIG.get("pool_maxsize", 10),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+class RequestCancelled(requests.exceptions.RequestException):
+    """Request of a `CancellableSession` sent after it was cancelled."""
+
+
+def shutdown_socket(conn) -> None:
+    """Abort the connection from another thread, its blocked reads fail at once."""
+    try:
+        # The plain socket call, it also wakes a thread blocked in an SSL read
+        socket.socket.shutdown(conn.sock, socket.SHUT_RDWR)
+    except (AttributeError, OSError, TypeError):
+        pass
+
+
+class _CancellableAdapter(HTTPAdapter):
+    """Adapter whose connections are recorded once connected, to be shut down."""
+
+    def __init__(self, cancelled: threading.Event, **kwargs):
+        self.cancelled = cancelled
+        self.lock = threading.Lock()
+        self.connections = set()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = self.poolmanager.pool_classes_by_scheme
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: type(
+                pool_class.__name__,
+                (pool_class,),
+                {"ConnectionCls": self._recorded(pool_class.ConnectionCls)},
+            )
+            for scheme, pool_class in pool_classes.items()
+        }
+
+    def _recorded(self, connection_class):
+        adapter = self
+
+        class RecordedConnection(connection_class):
+            def connect(self):
+                super().connect()
+                with adapter.lock:
+                    adapter.connections.add(self)
+                    cancelled = adapter.cancelled.is_set()
+                if cancelled:
+                    shutdown_socket(self)
+
+            def close(self):
+                with adapter.lock:
+                    adapter.connections.discard(self)
+                super().close()
+
+        return RecordedConnection
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        with self.lock:
+            connections = list(self.connections)
+        for conn in connections:
+            shutdown_socket(conn)
+
+
+class CancellableSession(requests.Session):
+    """Session whose requests can be aborted from another thread.
+
+    `cancel` shuts down the sockets of the requests waiting on a response, they
+    fail at once instead of after `REQUEST_TIMEOUT`, and later requests raise
+    `RequestCancelled`. Meant for one call, it does not keep connections alive
+    from one call to the next like `get_http_session`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._cancelled = threading.Event()
+        self._adapter = _CancellableAdapter(self._cancelled)
+        self.mount("http://", self._adapter)
+        self.mount("https://", self._adapter)
+
+    def request(self, *args, **kwargs):
+        if self._cancelled.is_set():
+            raise RequestCancelled("The session was cancelled.")
+        return super().request(*args, **kwargs)
+
+    def cancel(self) -> None:
+        self._adapter.cancel()
+        self.close()
@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.utils.load_yaml import yaml_data as CONFIG
+from src.utils.logger import logger
+
+# Celery's READY_STATES, tasks still running are never pruned by count
+READY_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+SQLITE_BACKEND_PREFIX = "db+sqlite:///"
+INCREMENTAL_AUTO_VACUUM = 2
+
+
+def format_cutoff(max_age_days: float) -> str:
+    """Cutoff in the format SQLAlchemy stores `DateTime` columns with on SQLite."""
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    return cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def sqlite_path_from_backend(backend_url: str) -> Optional[str]:
+    if backend_url and backend_url.startswith(SQLITE_BACKEND_PREFIX):
+        return backend_url[len(SQLITE_BACKEND_PREFIX) :]
+    return None
+
+
+class SQLiteRetention:
+    """Prune rows of one SQLite database in short batches, then give space back.
+
+    Every batch is its own transaction, so Celery workers and the Flask app only
+    wait for one batch at a time instead of the whole clean-up.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 500,
+        batch_pause: float = 0.05,
+        vacuum_pages: int = 1000,
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def table_exists(self, table_name: str) -> bool:
+        return (
+            self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;",
+                (table_name,),
+            ).fetchone()
+            is not None
+        )
+
+    def column_exists(self, table_name: str, column_name: str) -> bool:
+        return any(
+            row[1] == column_name
+            for row in self.conn.execute(f"PRAGMA table_info({table_name});")
+        )
+
+    def database_size(self) -> int:
+        (page_count,) = self.conn.execute("PRAGMA page_count;").fetchone()
+        (page_size,) = self.conn.execute("PRAGMA page_size;").fetchone()
+        return page_count * page_size
+
+    def delete_in_batches(
+        self, table_name: str, key: str, condition: str, parameters=()
+    ) -> int:
+        """DELETE rows matching `condition`, `batch_size` rows per transaction."""
+        sql_command = f"""
+        DELETE FROM {table_name} WHERE {key} IN (
+            SELECT {key} FROM {table_name} WHERE {condition} LIMIT {int(self.batch_size)}
+        );
+        """
+        deleted = 0
+        while True:
+            self.conn.execute("BEGIN IMMEDIATE;")
+            removed = self.conn.execute(sql_command, parameters).rowcount
+            self.conn.execute("COMMIT;")
+            deleted += removed
+            if removed < self.batch_size:
+                return deleted
+            time.sleep(self.batch_pause)
+
+    def uses_incremental_vacuum(self) -> bool:
+        (auto_vacuum,) = self.conn.execute("PRAGMA auto_vacuum;").fetchone()
+        return auto_vacuum == INCREMENTAL_AUTO_VACUUM
+
+    def enable_incremental_vacuum(self) -> bool:
+        """One-off switch to incremental auto_vacuum, returns False if it was already on.
+
+        The switch only takes effect after a full VACUUM, which rewrites the whole
+        file under an exclusive lock. Run it as maintenance, see `__main__` below.
+        """
+        if self.uses_incremental_vacuum():
+            return False
+        logger.info(f"Enabling incremental auto_vacuum on {self.db_path}")
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        self.conn.execute("VACUUM;")
+        return True
+
+    def compact(self) -> None:
+        """Return free pages to the file system a few pages at a time, then ANALYZE."""
+        if self.uses_incremental_vacuum():
+            while self.conn.execute("PRAGMA freelist_count;").fetchone()[0]:
+                self.conn.execute(
+                    f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});"
+                )
+                time.sleep(self.batch_pause)
+        else:
+            # Free pages are still reused by new rows, the file just does not shrink
+            logger.warning(
+                f"{self.db_path} does not use incremental auto_vacuum, skipped giving "
+                "space back. Run `python -m src.utils.retention` during maintenance."
+            )
+
+        # Limited ANALYZE, only re-samples tables whose statistics went stale
+        self.conn.execute("PRAGMA analysis_limit = 1000;")
+        self.conn.execute("PRAGMA optimize;")
+
+    def compact_and_report(self, size_before: int, deleted: int) -> Dict:
+        self.compact()
+        size_after = self.database_size()
+        return {
+            "deleted_rows": deleted,
+            "size_before": size_before,
+            "size_after": size_after,
+            "reclaimed_bytes": size_before - size_after,
+        }
+
+
+def prune_celery_results(
+    db_path: str,
+    max_age_days: Optional[float] = None,
+    max_count: Optional[int] = None,
+    task_table: str = "celery_taskmeta",
+    group_table: str = "celery_tasksetmeta",
+    **kwargs,
+) -> Dict:
+    """Apply the age and count policies to Celery's database result backend."""
+    retention = SQLiteRetention(db_path, **kwargs)
+    try:
+        size_before = retention.database_size()
+        deleted = 0
+        ready_states = ", ".join(f"'{state}'" for state in READY_STATES)
+
+        if retention.table_exists(task_table):
+            if max_age_days is not None:
+                deleted += retention.delete_in_batches(
+                    task_table,
+                    "id",
+                    f"status IN ({ready_states}) AND date_done < ?",
+                    (format_cutoff(max_age_days),),
+                )
+            if max_count is not None:
+                # Keep the newest `max_count` finished tasks, ids grow with insertion
+                oldest_kept = retention.conn.execute(
+                    f"""
+                    SELECT id FROM {task_table} WHERE status IN ({ready_states})
+                    ORDER BY id DESC LIMIT 1 OFFSET ?;
+                    """,
+                    (max(int(max_count) - 1, 0),),
+                ).fetchone()
+                if oldest_kept:
+                    deleted += retention.delete_in_batches(
+                        task_table,
+                        "id",
+                        f"status IN ({ready_states}) AND id < ?",
+                        (oldest_kept[0],),
+                    )
+
+        if retention.table_exists(group_table) and max_age_days is not None:
+            deleted += retention.delete_in_batches(
+                group_table, "id", "date_done < ?", (format_cutoff(max_age_days),)
+            )
+
+        return retention.compact_and_report(size_before, deleted)
+    finally:
+        retention.close()
+
+
+def prune_task_status(db_path: str, max_age_days: float, **kwargs) -> Dict:
+    """Drop whole task chains whose root has not been touched for `max_age_days`."""
+    retention = SQLiteRetention(db_path, **kwargs)
+    try:
+        size_before = retention.database_size()
+        deleted = 0
+
+        # `updated_at` is added by `ensure_task_status_schema` when the app starts
+        if retention.column_exists("task_status", "updated_at"):
+            deleted = retention.delete_in_batches(
+                "task_status",
+                "task_id",
+                """
+                COALESCE(root_task_id, task_id) IN (
+                    SELECT task_id FROM task_status
+                    WHERE COALESCE(root_task_id, task_id) = task_id AND updated_at < ?
+                )
+                """,
+                (format_cutoff(max_age_days),),
+            )
+
+        return retention.compact_and_report(size_before, deleted)
+    finally:
+        retention.close()
+
+
+def retention_database_paths(retention_config: dict, backend_url: str) -> List[str]:
+    """The SQLite files `run_retention` prunes, those that exist."""
+    paths = [
+        sqlite_path_from_backend(backend_url),
+        retention_config.get("task_status_database"),
+    ]
+    return [path for path in paths if path and os.path.exists(path)]
+
+
+def run_retention(
+    retention_config: dict, backend_url: str, table_names: dict = None
+) -> Dict:
+    """Prune the result backend and the task status database, report reclaimed bytes."""
+    table_names = table_names or {}
+    options = {
+        key: retention_config[key]
+        for key in ("batch_size", "batch_pause", "vacuum_pages")
+        if key in retention_config
+    }
+    report = {}
+
+    backend_path = sqlite_path_from_backend(backend_url)
+    if backend_path and os.path.exists(backend_path):
+        report["result_backend"] = prune_celery_results(
+            backend_path,
+            max_age_days=retention_config.get("max_age_days"),
+            max_count=retention_config.get("max_count"),
+            task_table=table_names.get("task", "celery_taskmeta"),
+            group_table=table_names.get("group", "celery_tasksetmeta"),
+            **options,
+        )
+    else:
+        logger.warning(
+            f"Result backend {backend_url} is not a local SQLite file, skipped."
+        )
+
+    task_status_path = retention_config.get("task_status_database")
+    task_status_age = retention_config.get(
+        "task_status_max_age_days", retention_config.get("max_age_days")
+    )
+    if (
+        task_status_path
+        and task_status_age is not None
+        and os.path.exists(task_status_path)
+    ):
+        report["task_status"] = prune_task_status(
+            task_status_path, max_age_days=task_status_age, **options
+        )
+
+    report["reclaimed_bytes"] = sum(
+        database_report["reclaimed_bytes"]
+        for database_report in report.values()
+        if isinstance(database_report, dict)
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # python -m src.utils.retention: switch the pruned databases to incremental
+    # auto_vacuum once, while the workers are stopped
+    for db_path in retention_database_paths(
+        CONFIG.get("result_retention", {}),
+        CONFIG.get("celery_config", {}).get("backend", ""),
+    ):
+        retention = SQLiteRetention(db_path)
+        try:
+            if not retention.enable_incremental_vacuum():
+                logger.info(f"{db_path} already uses incremental auto_vacuum.")
+        finally:
+            retention.close()
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from src.utils.http_session import REQUEST_TIMEOUT
+from src.utils.load_yaml import yaml_data as CONFIG
+from src.utils.logger import logger
+
+PENDING = "pending"
+DONE = "done"
+
+
+class ModelCallSingleFlight:
+    """Shares one in-flight examinee model call between identical work items.
+
+    Calls are keyed by model endpoint and prompt. The first caller records a
+    pending flight in SQLite and calls the model; every worker asking
+    for the same key meanwhile waits for that flight and reuses its response.
+    Only callers that saw the flight pending share its response, a caller that
+    arrives once it is done calls the model again. A flight whose owner died is
+    taken over once its lease runs out, so the lease has to outlast a model request.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 120,
+        poll_interval: float = 0.2,
+        result_ttl_seconds: float = 60,
+        cleanup_interval: int = 500,
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.result_ttl_seconds = result_ttl_seconds
+        self.cleanup_interval = cleanup_interval
+
+        self.calls = 0
+        self.shared = 0
+        self.takeovers = 0
+        self._calls_since_cleanup = 0
+
+        # Shared by every thread of a threads pool worker, used under `_lock`
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            db_path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self._create_table()
+
+    def _create_table(self) -> None:
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ModelCallFlight (
+                flight_key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                response TEXT,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+            """
+        )
+
+    @staticmethod
+    def make_key(model_endpoint: str, prompt: str) -> str:
+        raw_key = "\x1f".join([model_endpoint, prompt])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _owner() -> str:
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def do(self, model_endpoint: str, prompt: str, call: Callable[[], Any]) -> Any:
+        """Return the response of `call`, or of the identical call already in flight."""
+        flight_key = self.make_key(model_endpoint, prompt)
+        with self._lock:
+            self.calls += 1
+            self._calls_since_cleanup += 1
+            if self._calls_since_cleanup >= self.cleanup_interval:
+                self.cleanup()
+
+        waited = False
+        while True:
+            try:
+                if self._acquire(flight_key):
+                    return self._lead(flight_key, call)
+                with self._lock:
+                    row = self.conn.execute(
+                        "SELECT status, response, started_at, finished_at FROM ModelCallFlight WHERE flight_key = ?;",
+                        (flight_key,),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Single flight lookup failed, calling the model: {e}")
+                return call()
+
+            if row is None:
+                # Finished and cleaned up, or failed, in the meantime
+                continue
+
+            status, response, started_at, finished_at = row
+            now = time.time()
+            if (
+                status == DONE
+                and waited
+                and now - finished_at <= self.result_ttl_seconds
+            ):
+                with self._lock:
+                    self.shared += 1
+                return json.loads(response)
+            if (status == DONE) or now - started_at > self.lease_seconds:
+                # Not waited for, stale, or an owner that never finished
+                if self._take_over(flight_key, started_at):
+                    with self._lock:
+                        self.takeovers += 1
+                    return self._lead(flight_key, call)
+                continue
+            waited = True
+            time.sleep(self.poll_interval)
+
+    def _acquire(self, flight_key: str) -> bool:
+        try:
+            with self._lock:
+                self.conn.execute(
+                    """
+                    INSERT INTO ModelCallFlight (flight_key, status, owner, started_at)
+                    VALUES (?, ?, ?, ?);
+                    """,
+                    (flight_key, PENDING, self._owner(), time.time()),
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def _take_over(self, flight_key: str, started_at: float) -> bool:
+        # Only one of the waiters wins, the flight is compared by its start time
+        with self._lock:
+            return (
+                self.conn.execute(
+                    """
+                    UPDATE ModelCallFlight
+                    SET status = ?, response = NULL, owner = ?, started_at = ?, finished_at = NULL
+                    WHERE flight_key = ? AND started_at = ?;
+                    """,
+                    (PENDING, self._owner(), time.time(), flight_key, started_at),
+                ).rowcount
+                == 1
+            )
+
+    def _lead(self, flight_key: str, call: Callable[[], Any]) -> Any:
+        try:
+            response = call()
+        except BaseException:
+            # Waiters retry and one of them becomes the next leader
+            with self._lock:
+                self.conn.execute(
+                    "DELETE FROM ModelCallFlight WHERE flight_key = ? AND owner = ?;",
+                    (flight_key, self._owner()),
+                )
+            raise
+
+        try:
+            with self._lock:
+                self.conn.execute(
+                    """
+                    UPDATE ModelCallFlight SET status = ?, response = ?, finished_at = ?
+                    WHERE flight_key = ? AND owner = ?;
+                    """,
+                    (
+                        DONE,
+                        json.dumps(response),
+                        time.time(),
+                        flight_key,
+                        self._owner(),
+                    ),
+                )
+        except (sqlite3.Error, TypeError) as e:
+            logger.error(f"Single flight could not share a response: {e}")
+        return response
+
+    def cleanup(self) -> int:
+        """Drop finished flights no waiter can still be polling for."""
+        self._calls_since_cleanup = 0
+        try:
+            with self._lock:
+                return self.conn.execute(
+                    "DELETE FROM ModelCallFlight WHERE status = ? AND finished_at < ?;",
+                    (DONE, time.time() - self.result_ttl_seconds),
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Single flight cleanup failed: {e}")
+            return 0
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "takeovers": self.takeovers,
+            "dedup_ratio": (self.shared / self.calls) if self.calls else 0.0,
+        }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_model_call_single_flight() -> Optional[ModelCallSingleFlight]:
+    """Return the process-wide single flight, or None when it is disabled in config."""
+    global _single_flight
+
+    dedup_config = CONFIG.get("model_call_dedup", {})
+    if not dedup_config.get("enabled", False):
+        return None
+
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = ModelCallSingleFlight(
+                db_path=dedup_config["database"],
+                # A leader still inside its model request is never taken over
+                lease_seconds=REQUEST_TIMEOUT
+                + dedup_config.get("lease_margin_seconds", 10),
+                poll_interval=dedup_config.get("poll_interval", 0.2),
+                result_ttl_seconds=dedup_config.get("result_ttl_seconds", 60),
+            )
+    return _single_flight
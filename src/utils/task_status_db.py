@@ -1,12 +1,17 @@
 import json
-from typing import List
+from datetime import datetime
+from typing import Dict, List
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from src.utils.logger import logger
 
 task_status_db = SQLAlchemy()
 
+UPSERT_CHUNK_SIZE = 2000
+
 
 class TaskStatus(task_status_db.Model):
     __tablename__ = "task_status"
@@ -15,10 +20,16 @@ class TaskStatus(task_status_db.Model):
     is_paused = task_status_db.Column(task_status_db.Boolean, default=False)
     child_task_id = task_status_db.Column(task_status_db.String(50), nullable=True)
     child_task_ids = task_status_db.Column(task_status_db.Text, nullable=True)
-    root_task_id = task_status_db.Column(task_status_db.String(50), nullable=True)
+    root_task_id = task_status_db.Column(
+        task_status_db.String(50), nullable=True, index=True
+    )
     evaluation_result_id = task_status_db.Column(
         task_status_db.String(50), nullable=True
     )  # 新增此行
+    # Used by the retention job to find stale chains
+    updated_at = task_status_db.Column(
+        task_status_db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
 
     @property
     def child_tasks(self) -> List[str]:
@@ -31,40 +42,101 @@ class TaskStatus(task_status_db.Model):
         self.child_task_ids = json.dumps(task_ids) if task_ids else None
 
 
+def ensure_task_status_schema() -> None:
+    """`create_all` skips tables that already exist, add newer columns and indexes here."""
+    columns = {
+        column["name"]
+        for column in inspect(task_status_db.engine).get_columns(
+            TaskStatus.__tablename__
+        )
+    }
+    if "updated_at" not in columns:
+        with task_status_db.engine.begin() as connection:
+            connection.execute(
+                text("ALTER TABLE task_status ADD COLUMN updated_at DATETIME;")
+            )
+            # Existing chains get a full retention period from now on
+            connection.execute(
+                update(TaskStatus.__table__).values(updated_at=datetime.utcnow())
+            )
+
+    for index in TaskStatus.__table__.indexes:
+        index.create(bind=task_status_db.engine, checkfirst=True)
+
+
+def save_task_chains(chains: Dict[str, List[str]]) -> None:
+    """Register root tasks and their child tasks in one upsert statement.
+
+    Existing rows keep their status, pause flag and evaluation result, only the
+    chain links are (re)written.
+    """
+    rows = []
+    for root_id, task_ids in chains.items():
+        rows.append(
+            {
+                "task_id": root_id,
+                "root_task_id": root_id,
+                "child_task_ids": json.dumps(task_ids) if task_ids else None,
+            }
+        )
+        rows.extend(
+            {"task_id": task_id, "root_task_id": root_id, "child_task_ids": None}
+            for task_id in task_ids
+            if task_id != root_id
+        )
+    if not rows:
+        return
+
+    # Chunked only to stay below SQLite's bound parameter limit
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        statement = sqlite_insert(TaskStatus).values(
+            rows[start : start + UPSERT_CHUNK_SIZE]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[TaskStatus.task_id],
+            set_={
+                "root_task_id": statement.excluded.root_task_id,
+                "child_task_ids": func.coalesce(
+                    statement.excluded.child_task_ids, TaskStatus.child_task_ids
+                ),
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+        task_status_db.session.execute(statement)
+    task_status_db.session.commit()
+
+
 def save_task_chain(root_id: str, task_ids: List[str]):
-    root_status = TaskStatus.query.get(root_id) or TaskStatus(task_id=root_id)
-    root_status.child_tasks = task_ids
-    root_status.root_task_id = root_id
-    task_status_db.session.merge(root_status)
+    save_task_chains({root_id: task_ids})
 
-    for task_id in task_ids:
-        child_status = TaskStatus.query.get(task_id) or TaskStatus(task_id=task_id)
-        child_status.root_task_id = root_id
-        task_status_db.session.merge(child_status)
 
+def update_task_states(task_ids: List[str], status: str, is_paused: bool) -> int:
+    """Update the whole chain of every given task in one statement, returns the row count."""
+    root_task_ids = select(
+        func.coalesce(TaskStatus.root_task_id, TaskStatus.task_id)
+    ).where(TaskStatus.task_id.in_(task_ids))
+
+    updated_rows = task_status_db.session.execute(
+        update(TaskStatus)
+        .where(
+            TaskStatus.task_id.in_(root_task_ids)
+            | TaskStatus.root_task_id.in_(root_task_ids)
+        )
+        .values(status=status, is_paused=is_paused)
+        .execution_options(synchronize_session=False)
+    ).rowcount
     task_status_db.session.commit()
+    return updated_rows
 
 
 def update_task_state(task_id: str, status: str, is_paused: bool) -> bool:
     """Update task state and all related tasks"""
     try:
-        task = TaskStatus.query.get(task_id)
-        if not task:
+        updated_rows = update_task_states([task_id], status, is_paused)
+        if not updated_rows:
             logger.error(f"Task not found: {task_id}")
             return False
 
-        root_task_id = task.root_task_id or task_id
-
-        logger.info(f"Current task status: {task.status}, is_paused: {task.is_paused}")
-
-        # 執行更新
-        updated_rows = TaskStatus.query.filter(
-            (TaskStatus.task_id == root_task_id)
-            | (TaskStatus.root_task_id == root_task_id)
-        ).update({"status": status, "is_paused": is_paused}, synchronize_session=False)
-
-        task_status_db.session.commit()
-
         logger.info(f"Updated {updated_rows} task records")
 
         return True
@@ -1,3 +1,4 @@
+import inspect
 from datetime import datetime
 from enum import Enum
 from functools import wraps
@@ -6,9 +7,11 @@ from typing import Any, Callable, Dict, Optional
 from flask import current_app, request, session
 from user_agents import parse
 
+from src.models.async_repository import AsyncSimplifiedRepository
 from src.models.controller import BasicController
 from src.models.db_schema import OperationHistoryData
 from src.utils.data_handler import IdentityHandler
+from src.utils.load_yaml import yaml_data as CONFIG
 from src.utils.logger import logger
 
 
@@ -74,25 +77,37 @@ class ActionMapper:
             return OperationType.OTHER.value
 
 
+def build_log_entry(func: Callable, kwargs: dict) -> OperationHistoryData:
+    if request.form.get("user_id"):
+        current_app.user_session_manager.initialize_session(request.form.get("user_id"))
+    # current_app.user_session_manager.clear_user_session()
+    user_info = current_app.user_session_manager.get_user_info()
+    operation_type = request.form.get("button_action", "unknown")
+    return OperationHistoryData(
+        user_id=user_info["user_id"],
+        operation_type=ActionMapper.get_operation_type(operation_type),
+        device_info=user_info["device_info"],
+        ip_address=user_info["ip_address"],
+        description=f"Function: {func.__name__}, Args: {str(kwargs)}, Operation: {operation_type}",
+    )
+
+
 def user_logger():
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                log_entry = build_log_entry(func, kwargs)
+                await AsyncSimplifiedRepository.from_config(CONFIG).add(log_entry)
+
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            log_entry = None
-            if request.form.get("user_id"):
-                current_app.user_session_manager.initialize_session(
-                    request.form.get("user_id")
-                )
-            # current_app.user_session_manager.clear_user_session()
-            user_info = current_app.user_session_manager.get_user_info()
-            operation_type = request.form.get("button_action", "unknown")
-            log_entry = OperationHistoryData(
-                user_id=user_info["user_id"],
-                operation_type=ActionMapper.get_operation_type(operation_type),
-                device_info=user_info["device_info"],
-                ip_address=user_info["ip_address"],
-                description=f"Function: {func.__name__}, Args: {str(kwargs)}, Operation: {operation_type}",
-            )
+            log_entry = build_log_entry(func, kwargs)
 
             controller = BasicController(
                 request_handler=IdentityHandler(align_dataclass=OperationHistoryData)
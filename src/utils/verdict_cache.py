@@ -0,0 +1,229 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from src.utils.load_yaml import yaml_data as CONFIG
+from src.utils.logger import logger
+
+
+class VerdictCache:
+    """Persistent cache of LLM judge verdicts.
+
+    Entries are keyed by judge model, prompt template version, groundtruth content
+    and the normalized examinee response, so a cached verdict is only reused when
+    the judge would have been asked exactly the same question.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 100000,
+        ttl_seconds: Optional[float] = None,
+        evict_interval: int = 500,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = evict_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes_since_eviction = 0
+
+        # Shared by every thread of a threads pool worker, used under `_lock`
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self._create_table()
+
+    def _create_table(self) -> None:
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS JudgeVerdictCache (
+                cache_key TEXT PRIMARY KEY,
+                judge_model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            );
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_judge_verdict_cache_last_used
+            ON JudgeVerdictCache (last_used_at);
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def normalize_response(model_response: str) -> str:
+        """Collapse whitespace and case so trivially different answers share an entry."""
+        return re.sub(r"\s+", " ", str(model_response)).strip().casefold()
+
+    def make_key(
+        self,
+        judge_model: str,
+        prompt_version: str,
+        groundtruth_content: str,
+        model_response: str,
+    ) -> str:
+        raw_key = "\x1f".join(
+            [
+                judge_model,
+                prompt_version,
+                str(groundtruth_content).strip(),
+                self.normalize_response(model_response),
+            ]
+        )
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        judge_model: str,
+        prompt_version: str,
+        groundtruth_content: str,
+        model_response: str,
+    ) -> Optional[str]:
+        cache_key = self.make_key(
+            judge_model, prompt_version, groundtruth_content, model_response
+        )
+        with self._lock:
+            try:
+                row = self.conn.execute(
+                    "SELECT verdict, created_at FROM JudgeVerdictCache WHERE cache_key = ?;",
+                    (cache_key,),
+                ).fetchone()
+
+                now = time.time()
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    self.conn.execute(
+                        "DELETE FROM JudgeVerdictCache WHERE cache_key = ?;",
+                        (cache_key,),
+                    )
+                    self.conn.commit()
+                    self.evictions += 1
+                    row = None
+
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                self.conn.execute(
+                    """
+                    UPDATE JudgeVerdictCache
+                    SET hit_count = hit_count + 1, last_used_at = ?
+                    WHERE cache_key = ?;
+                    """,
+                    (now, cache_key),
+                )
+                self.conn.commit()
+                self.hits += 1
+                return row[0]
+            except sqlite3.Error as e:
+                logger.error(f"Verdict cache lookup failed: {e}")
+                self.misses += 1
+                return None
+
+    def put(
+        self,
+        judge_model: str,
+        prompt_version: str,
+        groundtruth_content: str,
+        model_response: str,
+        verdict: str,
+    ) -> None:
+        cache_key = self.make_key(
+            judge_model, prompt_version, groundtruth_content, model_response
+        )
+        now = time.time()
+        with self._lock:
+            try:
+                self.conn.execute(
+                    """
+                    INSERT OR REPLACE INTO JudgeVerdictCache
+                        (cache_key, judge_model, prompt_version, verdict, hit_count, created_at, last_used_at)
+                    VALUES (?, ?, ?, ?, 0, ?, ?);
+                    """,
+                    (cache_key, judge_model, prompt_version, verdict, now, now),
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Verdict cache write failed: {e}")
+                return
+
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.evict_interval:
+                self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above `max_entries`."""
+        with self._lock:
+            self._writes_since_eviction = 0
+            removed = 0
+            try:
+                if self.ttl_seconds:
+                    removed += self.conn.execute(
+                        "DELETE FROM JudgeVerdictCache WHERE created_at < ?;",
+                        (time.time() - self.ttl_seconds,),
+                    ).rowcount
+
+                (total,) = self.conn.execute(
+                    "SELECT COUNT(*) FROM JudgeVerdictCache;"
+                ).fetchone()
+                if total > self.max_entries:
+                    removed += self.conn.execute(
+                        """
+                        DELETE FROM JudgeVerdictCache WHERE cache_key IN (
+                            SELECT cache_key FROM JudgeVerdictCache
+                            ORDER BY last_used_at ASC LIMIT ?
+                        );
+                        """,
+                        (total - self.max_entries,),
+                    ).rowcount
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Verdict cache eviction failed: {e}")
+
+            self.evictions += removed
+            if removed:
+                logger.info(f"Verdict cache evicted {removed} entries.")
+            return removed
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_verdict_cache = None
+_verdict_cache_lock = threading.Lock()
+
+
+def get_verdict_cache() -> Optional[VerdictCache]:
+    """Return the process-wide verdict cache, or None when it is disabled in config."""
+    global _verdict_cache
+
+    cache_config = CONFIG.get("judge_config", {}).get("verdict_cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+
+    with _verdict_cache_lock:
+        if _verdict_cache is None:
+            ttl_days = cache_config.get("ttl_days")
+            _verdict_cache = VerdictCache(
+                db_path=cache_config["database"],
+                max_entries=cache_config.get("max_entries", 100000),
+                ttl_seconds=ttl_days * 24 * 60 * 60 if ttl_days else None,
+            )
+    return _verdict_cache
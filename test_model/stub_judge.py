@@ -0,0 +1,66 @@
+import json
+import os
+import re
+import time
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+STUB_JUDGE_NAME = "stub-judge"
+
+# Seconds every judge request takes, stands in for the latency of the LLM judge
+STUB_JUDGE_LATENCY = float(os.getenv("STUB_JUDGE_LATENCY", "0"))
+
+
+def judge_answer(text_content: str, correct_answer: str) -> str:
+    """Deterministic stand-in for the LLM judge: the answer must appear in the text."""
+    pattern = rf"(?<![^\W_]){re.escape(str(correct_answer).strip())}(?![^\W_])"
+    return "Correct" if re.search(pattern, str(text_content)) else "Incorrect"
+
+
+def respond(prompt: str) -> str:
+    # Batch prompt from `build_batch_judge_prompt`
+    if "[Items]:" in prompt:
+        items = json.loads(prompt.split("[Items]:", 1)[1])
+        return json.dumps(
+            [
+                judge_answer(item["text_content"], item["correct_answer"])
+                for item in items
+            ]
+        )
+
+    # Single prompt from `build_judge_prompt`
+    match = re.search(
+        r"\[Text Content\]: (.*)\n\[Correct Answer\]: (.*?)\n", prompt, re.DOTALL
+    )
+    if match:
+        return judge_answer(match.group(1), match.group(2))
+
+    # e.g. the API client health check
+    return f"I am {STUB_JUDGE_NAME}."
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    """OpenAI compatible endpoint for running the judge stages against a local server."""
+    data = request.get_json()
+    prompt = data["messages"][-1]["content"]
+    time.sleep(STUB_JUDGE_LATENCY)
+
+    return jsonify(
+        {
+            "model": data.get("model", STUB_JUDGE_NAME),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": respond(prompt)},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+    )
+
+
+if __name__ == "__main__":
+    app.run(debug=True, host="0.0.0.0", port=int(os.getenv("STUB_JUDGE_PORT", "8889")))
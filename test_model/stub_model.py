@@ -0,0 +1,33 @@
+import os
+import re
+import time
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+# Seconds every answer takes, stands in for the latency of a real model
+STUB_MODEL_LATENCY = float(os.getenv("STUB_MODEL_LATENCY", "0.2"))
+# Wrap answers in prose the rule-based judge cannot decide, so they reach the LLM judge
+STUB_MODEL_HEDGE = os.getenv("STUB_MODEL_HEDGE", "") == "1"
+
+
+def answer(prompt: str) -> str:
+    """Deterministic stand-in for an examinee model: repeat the example answer."""
+    match = re.search(r"For example, answer: (.*?)\. ", prompt)
+    option = match.group(1) if match else "A"
+    if STUB_MODEL_HEDGE:
+        return f"I believe it is {option}, though I am not sure"
+    return option
+
+
+@app.route("/", methods=["POST"])
+def generate_text():
+    """Same API as test_model.py, without calling OpenAI."""
+    data = request.get_json()
+    time.sleep(STUB_MODEL_LATENCY)
+    return jsonify({"output": answer(data.get("input", ""))})
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8890, threaded=True)
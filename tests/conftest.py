@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+QUESTION_COUNT = 6
+
+
+@pytest.fixture(scope="session")
+def workspace(tmp_path_factory):
+    """The app running from a scratch directory, with its own config.yaml and databases.
+
+    `config.yaml` is read from the working directory when `src` is first imported,
+    so the test modules only import `src` once this fixture has run.
+    """
+    workdir = tmp_path_factory.mktemp("workspace")
+    database = str(workdir / "example.db")
+
+    with open(ROOT / "config.yaml", encoding="utf-8") as f:
+        config = yaml.load(f, Loader=yaml.Loader)
+    config["sqlite"]["connect_args"]["database"] = database
+    config["sqlite"]["single_writer"]["enabled"] = False
+    config["database_location"] = database
+    config["model_call_dedup"]["enabled"] = False
+    config["staged_pipeline"]["enabled"] = False
+    config["judge_config"]["verdict_cache"]["enabled"] = False
+    config["judge_config"]["ensemble"]["enabled"] = False
+    config["celery_config"].update(
+        {"broker": "memory://", "backend": "cache+memory://"}
+    )
+    with open(workdir / "config.yaml", "w", encoding="utf-8") as f:
+        yaml.dump(config, f, allow_unicode=True)
+
+    os.chdir(workdir)
+    sys.path[:0] = [str(ROOT), str(ROOT / "db")]
+
+    from drivers.sqlite_driver import SQLiteDriver
+
+    SQLiteDriver(config["sqlite"]).create_all_tables()
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        """
+        INSERT INTO Question (question_version_id, question_category, question_content,
+            groundtruth_content, groundtruth_set, groundtruth_type, status)
+        VALUES (1, 'bio', ?, ?, '["A", "B", "C", "D"]', 'Classfication', 1);
+        """,
+        [(f"question {idx}", "ABCD"[idx % 4]) for idx in range(QUESTION_COUNT)],
+    )
+    conn.commit()
+    conn.close()
+
+    from src.app import create_app
+    from src.celeryflow import celery_app
+    from src.utils.task_status_db import ensure_task_status_schema, task_status_db
+
+    app, _ = create_app()
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{workdir / 'task_status.db'}"
+    task_status_db.init_app(app)
+    context = app.app_context()
+    context.push()
+    task_status_db.create_all()
+    ensure_task_status_schema()
+
+    # `chain_monitor` reads results through `app_run`, whose import starts another app
+    sys.modules["app_run"] = SimpleNamespace(app=app, celery_app=celery_app)
+    celery_app.conf.update(
+        broker_url="memory://",
+        task_always_eager=True,
+        task_eager_propagates=True,
+    )
+    yield workdir
+    context.pop()
+
+
+@pytest.fixture
+def model_calls(workspace, monkeypatch):
+    """Stub examinee model answering every question right, records the prompts it got."""
+    from src.celeryflow import tasks
+
+    calls = []
+
+    def request_model(model_endpoint: str, question: str):
+        calls.append(question)
+        return answer_of(question)
+
+    monkeypatch.setattr(tasks, "request_model", request_model)
+    # The API health check at the head of every exam chain
+    monkeypatch.setattr(
+        tasks,
+        "get_http_session",
+        lambda: SimpleNamespace(get=lambda url: SimpleNamespace(status_code=200)),
+    )
+    return calls
+
+
+def start_exam(judge_mode: str = "immediate") -> dict:
+    """Test paper of a new exam over every question inserted by `workspace`."""
+    from src.celeryflow import tasks
+    from src.celeryflow.celery_controller import create_evaluation_result
+
+    result = {
+        "model_id": 1,
+        "user_id": "tester",
+        "question_version_id": 1,
+        "evaluation_type": "bio",
+        "status": 3,
+    }
+    create_evaluation_result(result)
+    question_set = tasks.get_question_set(
+        {
+            "evaluation_type": "bio",
+            "version": 1,
+            "sampling": {"sampling": "first", "sample_size": QUESTION_COUNT},
+        }
+    )
+    return {
+        "result": result,
+        "model_id": 1,
+        "evaluation_type": "bio",
+        "model_endpoint": "http://examinee.invalid/",
+        "judge_mode": judge_mode,
+        **question_set,
+    }
+
+
+def answer_of(prompt: str) -> str:
+    """Groundtruth of the questions inserted by `workspace`, read from the prompt."""
+    idx = int(prompt.split("question ")[1].split()[0].strip(",.:"))
+    return "ABCD"[idx % 4]
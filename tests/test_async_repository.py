@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from conftest import QUESTION_COUNT
+
+READ_SECONDS = 0.2
+CONCURRENT_READS = 4
+
+
+def test_concurrent_reads_run_in_parallel(workspace):
+    from src.models.async_repository import AsyncRepository
+    from src.models.repository import SimplifiedRepository
+    from src.utils.load_yaml import yaml_data as CONFIG
+
+    class SlowRepository(SimplifiedRepository):
+        def slow_read(self) -> str:
+            time.sleep(READ_SECONDS)
+            return threading.current_thread().name
+
+    class AsyncSlowRepository(AsyncRepository):
+        repository_class = SlowRepository
+
+    async def read_concurrently():
+        return await asyncio.gather(
+            *(
+                AsyncSlowRepository.from_config(CONFIG).slow_read()
+                for _ in range(CONCURRENT_READS)
+            )
+        )
+
+    started_at = time.monotonic()
+    thread_names = asyncio.run(read_concurrently())
+    elapsed = time.monotonic() - started_at
+
+    assert len(set(thread_names)) == CONCURRENT_READS
+    assert elapsed < READ_SECONDS * CONCURRENT_READS / 2
+
+
+def test_iteration_keeps_its_cursor_on_one_thread(workspace):
+    from src.models.async_repository import AsyncSimplifiedRepository
+    from src.models.db_schema import QuestionData
+    from src.utils.load_yaml import yaml_data as CONFIG
+
+    async def read_questions():
+        repository = AsyncSimplifiedRepository.from_config(CONFIG)
+        return [
+            question
+            async for question in repository.iter_all(QuestionData, chunk_size=2)
+        ]
+
+    questions = asyncio.run(read_questions())
+    assert len(questions) == QUESTION_COUNT
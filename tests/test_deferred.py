@@ -0,0 +1,51 @@
+import sqlite3
+
+from conftest import QUESTION_COUNT, start_exam
+
+
+def read_result(workspace, result_id: int):
+    conn = sqlite3.connect(str(workspace / "example.db"))
+    row = conn.execute(
+        "SELECT status, result_score FROM Result WHERE result_id = ?;", (result_id,)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def collect_responses(tasks) -> dict:
+    """A deferred exam whose responses are collected, before its `record_result`."""
+    test_paper = tasks.evaluation_pipeline.apply(
+        args=(start_exam(judge_mode="deferred"),)
+    ).get()
+    assert test_paper["evaluation_response_list"] == []
+    return test_paper
+
+
+def test_drain_before_record_result_still_finalizes(workspace, model_calls):
+    from src.celeryflow import tasks
+
+    test_paper = collect_responses(tasks)
+    result_id = test_paper["result"]["result_id"]
+
+    # The drain judges every response while the exam is still in progress
+    drain = tasks.judge_deferred_responses.apply().get()
+    assert drain["judged"] >= QUESTION_COUNT
+    assert result_id not in drain["finalized_result_ids"]
+    assert read_result(workspace, result_id) == (3, None)
+
+    tasks.record_result.apply(args=(test_paper,)).get()
+    assert read_result(workspace, result_id) == (1, 100)
+
+
+def test_record_result_before_drain_finalizes(workspace, model_calls):
+    from src.celeryflow import tasks
+
+    test_paper = collect_responses(tasks)
+    result_id = test_paper["result"]["result_id"]
+
+    tasks.record_result.apply(args=(test_paper,)).get()
+    assert read_result(workspace, result_id) == (2, None)
+
+    drain = tasks.judge_deferred_responses.apply().get()
+    assert result_id in drain["finalized_result_ids"]
+    assert read_result(workspace, result_id) == (1, 100)
@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+
+import pytest
+
+EXAM_COUNT = 3
+
+
+@pytest.fixture
+def task_runs(workspace):
+    """Counts the task executions per task name while a test runs."""
+    from celery.signals import task_prerun
+
+    runs = Counter()
+
+    def count_run(sender=None, **kwargs):
+        runs[sender.name] += 1
+
+    task_prerun.connect(count_run, weak=False)
+    yield runs
+    task_prerun.disconnect(count_run)
+
+
+def build_test_papers():
+    from src.models.controller import build_test_paper
+
+    json_data = {
+        "model_id": 1,
+        "model_name": "stub",
+        "model_version": "1",
+        "model_endpoint": "http://examinee.invalid/",
+    }
+    return [
+        build_test_paper(json_data, {"topic": "bio", "version": 1}, "tester")
+        for _ in range(EXAM_COUNT)
+    ]
+
+
+def expected_exam_runs() -> Counter:
+    """Every exam runs each link of `build_exam_chain` exactly once."""
+    from src.celeryflow import tasks
+
+    return Counter(
+        {
+            task.name: EXAM_COUNT
+            for task in (
+                tasks.check_health,
+                tasks.get_question_dataset,
+                tasks.evaluation_pipeline,
+                tasks.record_result,
+            )
+        }
+    )
+
+
+def test_sync_mode_runs_one_chain_of_exam_chains(model_calls, task_runs):
+    from src.celeryflow import tasks
+
+    tasks.start_evaluation_tasks.apply(
+        args=(build_test_papers(),), kwargs={"sync": True, "fan_out": False}
+    ).get()
+
+    assert task_runs == Counter(
+        {tasks.start_evaluation_tasks.name: 1, **expected_exam_runs()}
+    )
+    assert len(model_calls) == EXAM_COUNT * 3  # default sample size
+
+
+def test_fan_out_mode_adds_one_summary(model_calls, task_runs):
+    from src.celeryflow import tasks
+
+    batch = tasks.start_evaluation_tasks.apply(
+        args=(build_test_papers(),), kwargs={"fan_out": True}
+    ).get()
+
+    assert task_runs == Counter(
+        {
+            tasks.start_evaluation_tasks.name: 1,
+            tasks.summarize_exam_batch.name: 1,
+            **expected_exam_runs(),
+        }
+    )
+    assert len(batch["exams"]) == EXAM_COUNT
+    assert all(len(exam["task_ids"]) == 4 for exam in batch["exams"])
+
+
+@pytest.fixture
+def worker(workspace, monkeypatch):
+    """A worker thread instead of eager mode, chords only call their errback there."""
+    from celery.contrib.testing.worker import start_worker
+    from flask import current_app
+
+    from src.celeryflow import celery_app
+
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", False)
+    # Pushed by `CeleryBaseTask` in the worker thread, see `configure_celery`
+    monkeypatch.setattr(
+        celery_app, "flask_app", current_app._get_current_object(), raising=False
+    )
+    with start_worker(celery_app, pool="solo", perform_ping_check=False):
+        yield
+
+
+def test_failed_exam_still_summarizes_the_batch(model_calls, worker, monkeypatch):
+    from src.celeryflow import tasks
+    from src.celeryflow.chain_monitor import get_batch_summary
+
+    compute_score = tasks.compute_score
+    scored = []
+
+    def fail_first_exam(evaluation_response_list):
+        scored.append(evaluation_response_list)
+        if len(scored) == 1:
+            raise RuntimeError("scoring failed")
+        return compute_score(evaluation_response_list)
+
+    monkeypatch.setattr(tasks, "compute_score", fail_first_exam)
+    batch = tasks.start_evaluation_tasks.run(build_test_papers(), fan_out=True)
+
+    deadline = time.monotonic() + 30
+    while (state := get_batch_summary(batch["summary_task_id"])) is None or state[
+        "summary"
+    ] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+    assert state["state"] == "FAILURE"
+    summary = state["summary"]
+    assert len(summary["exams"]) == EXAM_COUNT - 1
+    assert all(exam["score"] == 100 for exam in summary["exams"])
+    assert [exam["error"] for exam in summary["failed"]] == ["scoring failed"]
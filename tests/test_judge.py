@@ -0,0 +1,189 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SLOW_JUDGE_SECONDS = 10
+
+
+class StubJudgeClient:
+    """Judge API answering 'Correct' when the response names the groundtruth."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def do_request(self, input_text: str, model_name=None, session=None):
+        self.prompts.append(input_text)
+        if input_text.startswith("RESPOND ONLY with a JSON array"):
+            items = json.loads(re.search(r"\[Items\]: (.*)", input_text).group(1))
+            return json.dumps(
+                [
+                    verdict(item["text_content"], item["correct_answer"])
+                    for item in items
+                ]
+            )
+        return verdict(*self.parse_single(input_text))
+
+    @staticmethod
+    def parse_single(input_text: str):
+        """(response, groundtruth) of a single-answer prompt."""
+        response = re.search(r"\[Text Content\]: (.*)", input_text).group(1)
+        groundtruth = re.search(r"\[Correct Answer\]: (.*)", input_text).group(1)
+        return response, groundtruth
+
+
+def verdict(response: str, groundtruth: str) -> str:
+    return "Correct" if groundtruth in response else "Incorrect"
+
+
+@pytest.fixture
+def verdict_cache(workspace, tmp_path):
+    from src.utils.verdict_cache import VerdictCache
+
+    return VerdictCache(str(tmp_path / "judge_cache.db"))
+
+
+def make_judge(batch_size: int, verdict_cache):
+    from src.celeryflow.judge import AnswerJudge
+
+    judge = AnswerJudge(
+        api_endpoint="http://judge.invalid/",
+        batch_size=batch_size,
+        verdict_cache=verdict_cache,
+    )
+    judge._api_client = StubJudgeClient()
+    return judge
+
+
+def test_verdicts_are_cached_under_the_prompt_sent(verdict_cache):
+    from src.celeryflow.judge import JUDGE_BATCH_PROMPT_VERSION, JUDGE_PROMPT_VERSION
+
+    batch_judge = make_judge(8, verdict_cache)
+    # A batch of one is asked with the single-answer prompt
+    assert batch_judge.judge_many([("it is B", "B")]) == ["Correct"]
+    assert batch_judge.judge_many([("it is C", "A"), ("it is D", "D")]) == [
+        "Incorrect",
+        "Correct",
+    ]
+
+    def cached(prompt_version, groundtruth, response):
+        return verdict_cache.get(
+            batch_judge.model_name, prompt_version, groundtruth, response
+        )
+
+    assert cached(JUDGE_PROMPT_VERSION, "B", "it is B") == "Correct"
+    assert cached(JUDGE_BATCH_PROMPT_VERSION, "B", "it is B") is None
+    assert cached(JUDGE_BATCH_PROMPT_VERSION, "D", "it is D") == "Correct"
+    assert cached(JUDGE_PROMPT_VERSION, "D", "it is D") is None
+
+    # A single-answer judge only reuses verdicts of the single-answer prompt
+    single_judge = make_judge(1, verdict_cache)
+    assert single_judge.judge_many([("it is B", "B"), ("it is D", "D")]) == [
+        "Correct",
+        "Correct",
+    ]
+    assert single_judge.stats.cache_hits == 1
+    assert len(single_judge.api_client.prompts) == 1
+
+
+class JudgeAPIHandler(BaseHTTPRequestHandler):
+    """OpenAI compatible judge, the "slow" model takes SLOW_JUDGE_SECONDS to judge."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        if "[Correct Answer]" in prompt:
+            if body["model"] == "slow":
+                time.sleep(SLOW_JUDGE_SECONDS)
+            content = verdict(*StubJudgeClient.parse_single(prompt))
+        else:
+            content = "I am a judge."  # the API client health check
+        payload = json.dumps({"choices": [{"message": {"content": content}}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload.encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def judge_endpoint(workspace, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JudgeAPIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    server.shutdown()
+    server.server_close()
+
+
+def make_ensemble(judge_endpoint: str):
+    from src.celeryflow.judge import AnswerJudge, JudgeEnsemble
+
+    return JudgeEnsemble(
+        {
+            model_name: AnswerJudge(api_endpoint=judge_endpoint, model_name=model_name)
+            for model_name in ("fast-1", "fast-2", "slow")
+        },
+        quorum=2,
+    )
+
+
+def ensemble_threads():
+    return [
+        thread
+        for thread in threading.enumerate()
+        if thread.name.startswith("judge-ensemble")
+    ]
+
+
+def wait_for_ensemble_threads(seconds: float) -> bool:
+    deadline = time.monotonic() + seconds
+    while ensemble_threads():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_ensemble_aborts_the_judge_it_no_longer_waits_for(judge_endpoint):
+    ensemble = make_ensemble(judge_endpoint)
+
+    started_at = time.monotonic()
+    verdicts, details = ensemble.judge_many([("it is B", "B")])
+    assert verdicts == ["Correct"]
+    assert details[0]["judges"]["slow"] == {"status": "cancelled"}
+    # The request of the slow judge is aborted, not left running in the background
+    assert wait_for_ensemble_threads(2)
+    assert time.monotonic() - started_at < SLOW_JUDGE_SECONDS / 2
+
+
+def test_concurrent_ensemble_calls_keep_their_own_stats(judge_endpoint):
+    ensemble = make_ensemble(judge_endpoint)
+    calls = 8
+
+    with ThreadPoolExecutor(max_workers=calls) as executor:
+        results = list(
+            executor.map(
+                ensemble.judge_many,
+                [[(f"it is {idx}", str(idx))] for idx in range(calls)],
+            )
+        )
+    assert all(verdicts == ["Correct"] for verdicts, _ in results)
+    assert wait_for_ensemble_threads(2)
+
+    stats = ensemble.stats_dict()
+    for name in ("fast-1", "fast-2"):
+        assert (stats[name]["calls"], stats[name]["votes"]) == (calls, calls)
+        assert stats[name]["judge_requests"] == calls
+    assert stats["slow"]["cancelled"] == calls
+    assert stats["slow"]["calls"] == 0
+    # The ensemble's judges are only copied per call, never asked themselves
+    assert all(judge.stats.judge_calls == 0 for judge in ensemble.judges.values())
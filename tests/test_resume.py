@@ -0,0 +1,51 @@
+import sqlite3
+from collections import Counter
+
+import pytest
+from conftest import QUESTION_COUNT, answer_of, start_exam
+
+CRASH_AT = 3
+
+
+class WorkerCrash(Exception):
+    pass
+
+
+def test_redelivered_exam_evaluates_each_question_once(workspace, monkeypatch):
+    from src.celeryflow import tasks
+
+    answered = []
+    crashed = []
+
+    def request_model(model_endpoint: str, question: str):
+        # The first delivery dies while asking question CRASH_AT
+        if len(answered) == CRASH_AT and not crashed:
+            crashed.append(question)
+            raise WorkerCrash(question)
+        answered.append(question)
+        return answer_of(question)
+
+    monkeypatch.setattr(tasks, "request_model", request_model)
+
+    test_paper = start_exam()
+    result = test_paper["result"]
+
+    with pytest.raises(WorkerCrash):
+        tasks.evaluation_pipeline.apply(args=(dict(test_paper),)).get()
+    # Redelivery of the same message
+    outcome = tasks.evaluation_pipeline.apply(args=(dict(test_paper),)).get()
+
+    assert crashed
+    assert Counter(answered) == Counter(
+        question["prompt"] for question in test_paper["data"]
+    )
+    assert outcome["evaluation_response_list"] == ["Correct"] * QUESTION_COUNT
+
+    conn = sqlite3.connect(str(workspace / "example.db"))
+    records = conn.execute(
+        "SELECT question_id, COUNT(*) FROM ResultRecord WHERE result_id = ? GROUP BY question_id;",
+        (result["result_id"],),
+    ).fetchall()
+    conn.close()
+    assert len(records) == QUESTION_COUNT
+    assert all(count == 1 for _, count in records)
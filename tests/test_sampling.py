@@ -0,0 +1,59 @@
+import sqlite3
+from statistics import mean
+
+import pytest
+
+BANK_SIZE = 5000
+SAMPLE_SIZE = 250
+
+
+@pytest.fixture
+def sample(workspace):
+    """Question ids of the "random" sample of a seed, over a bank of BANK_SIZE."""
+    from src.models.repository import SEED_MODULUS, ResultRepositroy
+    from src.models.schema_registry import get_table_schema
+
+    columns = list(get_table_schema("Question").columns)
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE Question ({', '.join(columns)});")
+    conn.executemany(
+        "INSERT INTO Question (question_id, question_version_id, question_category) VALUES (?, 1, 'bio');",
+        [(idx,) for idx in range(1, BANK_SIZE + 1)],
+    )
+    sql_command = ResultRepositroy._build_question_query("bio", "random")
+    question_id = columns.index("question_id")
+
+    def sample_ids(seed: int):
+        return [
+            row[question_id]
+            for row in conn.execute(
+                sql_command,
+                {
+                    "question_version_id": 1,
+                    "question_category": "bio",
+                    "limit": SAMPLE_SIZE,
+                    "seed": seed % SEED_MODULUS,
+                    "offset": 0,
+                },
+            )
+        ]
+
+    yield sample_ids
+    conn.close()
+
+
+def test_random_sample_is_reproducible(sample):
+    assert sample(7) == sample(7)
+    assert len(set(sample(7))) == SAMPLE_SIZE
+
+
+def test_samples_of_different_seeds_are_unrelated(sample):
+    samples = [set(sample(seed)) for seed in range(40)]
+    overlaps = [
+        len(samples[i] & samples[j])
+        for i in range(len(samples))
+        for j in range(i + 1, len(samples))
+    ]
+    # Independent samples share SAMPLE_SIZE^2 / BANK_SIZE = 12.5 questions on average
+    assert 10 < mean(overlaps) < 15
+    assert max(overlaps) < 30